@@ -0,0 +1,69 @@
+# EthoGrid_App/core/batch_manifest.py
+
+import os
+import json
+import hashlib
+import traceback
+
+from core.detection_cache import csv_identity
+
+MANIFEST_NAME = "ethogrid_batch_manifest.json"
+MANIFEST_VERSION = 1  # bump when the export code changes in a way that should invalidate old outputs
+
+# Output file suffix -> the batch options (besides the shared ones) that affect that output
+OUTPUT_OPTIONS = {
+    "with_tanks.csv": (),
+    "centroids_wide.csv": (),
+    "by_tank.xlsx": (),
+    "trajectory.png": ('time_gap_seconds', 'frame_sample_rate'),
+    "heatmap.png": ('time_gap_seconds', 'frame_sample_rate'),
+    "annotated.mp4": ('draw_overlays',),
+}
+SHARED_OPTIONS = ('max_animals_per_tank',)
+
+def _digest(data):
+    return hashlib.blake2b(json.dumps(data, sort_keys=True).encode('utf-8'), digest_size=16).hexdigest()
+
+def input_fingerprints(video_path, csv_path, grid_settings, transform_settings):
+    """Hashes the inputs every output of a video depends on: the video, the detection CSV and the grid settings."""
+    return {'video': csv_identity(video_path)['hash'], 'csv': csv_identity(csv_path)['hash'],
+            'settings': _digest({'grid_settings': grid_settings, 'grid_transform': transform_settings})}
+
+def output_inputs(suffix, fingerprints, options):
+    """Returns (key, inputs) for one output: the recorded inputs and the content address derived from them."""
+    inputs = dict(fingerprints, version=MANIFEST_VERSION)
+    for name in SHARED_OPTIONS + OUTPUT_OPTIONS[suffix]: inputs[name] = options[name]
+    return _digest(inputs), inputs
+
+class BatchManifest:
+    """
+    Records, for every file in a batch output folder, the hash of the inputs it was built from,
+    so that a rerun can skip outputs whose inputs have not changed.
+    """
+    def __init__(self, output_dir):
+        self.path = os.path.join(output_dir, MANIFEST_NAME); self.outputs = {}
+        if os.path.exists(self.path):
+            try:
+                with open(self.path, 'r', encoding='utf-8') as f: data = json.load(f)
+                if data.get('version') == MANIFEST_VERSION: self.outputs = data.get('outputs', {})
+            except Exception:
+                print(f"Warning: ignoring unreadable batch manifest at '{self.path}'.")
+
+    def keys(self):
+        """Returns {output filename: key}, the part of the manifest the workers need to decide what to skip."""
+        return {name: entry['key'] for name, entry in self.outputs.items()}
+
+    def record(self, filename, key, inputs):
+        self.outputs[filename] = {'key': key, 'inputs': inputs}
+
+    def save(self):
+        tmp_path = f"{self.path}.tmp{os.getpid()}"
+        try:
+            with open(tmp_path, 'w', encoding='utf-8') as f: json.dump({'version': MANIFEST_VERSION, 'outputs': self.outputs}, f, indent=1, sort_keys=True)
+            os.replace(tmp_path, self.path)
+        except Exception:
+            print(f"Warning: could not write batch manifest '{self.path}'."); print(traceback.format_exc())
+
+def is_up_to_date(previous_keys, output_path, key):
+    """True if the manifest already has this output with the same key and the file still exists."""
+    return previous_keys.get(os.path.basename(output_path)) == key and os.path.exists(output_path)
@@ -0,0 +1,172 @@
+# EthoGrid_App/core/csv_frame_index.py
+
+import os
+import io
+import csv
+import traceback
+import numpy as np
+
+from core.detection_cache import csv_identity, sidecar_path, remove_stale_sidecars, COORD_COLS, NUMERIC_COLS
+from core.detection_ops import attach_polygon_points
+
+try:
+    import pandas as pd
+    PANDAS_AVAILABLE = True
+except ImportError:
+    PANDAS_AVAILABLE = False
+
+INDEX_SUFFIX = ".frameidx.npz"
+DEFAULT_BLOCK_SIZE = 256  # frames per indexed block
+PROGRESS_INTERVAL_BYTES = 8 * 1024 * 1024  # how often build_frame_index reports progress
+
+class FrameIndex:
+    """
+    Byte offsets of frame blocks inside a detection CSV that is sorted by frame_idx.
+
+    `block_ids[i]` is a block number (frame_idx // block_size) and `block_offsets[i]` the byte
+    offset of the first line of that block. `end_offset` is the size of the file.
+    """
+    def __init__(self, csv_path, headers, block_size, block_ids, block_offsets, end_offset, is_sorted, first_frame, last_frame):
+        self.csv_path = csv_path; self.headers = headers; self.block_size = block_size
+        self.block_ids = block_ids; self.block_offsets = block_offsets; self.end_offset = end_offset
+        self.is_sorted = is_sorted; self.first_frame = first_frame; self.last_frame = last_frame
+
+    def byte_range(self, start_frame, end_frame):
+        """Returns the (begin, end) byte offsets covering frames start_frame..end_frame (inclusive)."""
+        if len(self.block_ids) == 0: return self.end_offset, self.end_offset
+        first = max(0, np.searchsorted(self.block_ids, start_frame // self.block_size, side='right') - 1)
+        last = np.searchsorted(self.block_ids, end_frame // self.block_size, side='right')
+        end = self.block_offsets[last] if last < len(self.block_offsets) else self.end_offset
+        return int(self.block_offsets[first]), int(end)
+
+    def _read_bytes(self, start_frame, end_frame):
+        if not self.is_sorted: raise ValueError("Detection CSV is not sorted by frame_idx; random access is unavailable.")
+        begin, end = self.byte_range(start_frame, end_frame)
+        with open(self.csv_path, 'rb') as f:
+            f.seek(begin); return f.read(end - begin)
+
+    def read_range(self, start_frame, end_frame):
+        """Parses only the lines for frames start_frame..end_frame into {frame_idx: [row dict, ...]}."""
+        data = self._read_bytes(start_frame, end_frame)
+        detections = {}
+        for row in csv.DictReader(io.StringIO(data.decode('utf-8'), newline=''), fieldnames=self.headers):
+            frame_idx = _convert_row(row)
+            if frame_idx is None or frame_idx < start_frame: continue
+            if frame_idx > end_frame: break
+            detections.setdefault(frame_idx, []).append(row)
+        if 'polygon' in self.headers: attach_polygon_points(det for dets in detections.values() for det in dets)
+        return detections
+
+    def read_columns(self, start_frame, end_frame, columns):
+        """
+        Parses frames start_frame..end_frame into {column: ndarray} without building row dicts:
+        frame_idx and coordinate/confidence columns as float64 (NaN if empty or unparsable), the
+        others as object arrays of str. frame_idx is always included; columns not in the file are left out.
+        """
+        data = self._read_bytes(start_frame, end_frame)
+        wanted = [c for c in dict.fromkeys(['frame_idx'] + list(columns)) if c in self.headers]
+        if not data.strip(): return {c: np.zeros(0, dtype=np.float64 if c in NUMERIC_COLS else object) for c in wanted}
+        if PANDAS_AVAILABLE:
+            df = pd.read_csv(io.BytesIO(data), header=None, names=self.headers, usecols=wanted, dtype=str, keep_default_na=False, encoding='utf-8')
+            values = {c: pd.to_numeric(df[c], errors='coerce').to_numpy(dtype=np.float64) if c in NUMERIC_COLS else df[c].to_numpy(dtype=object) for c in wanted}
+        else:
+            positions = [self.headers.index(c) for c in wanted]
+            rows = [[row[i] if i < len(row) else '' for i in positions] for row in csv.reader(io.StringIO(data.decode('utf-8'), newline='')) if row]
+            table = np.array(rows, dtype=object).reshape(-1, len(wanted))
+            values = {c: np.array([_float_or_nan(v) for v in table[:, j]], dtype=np.float64) if c in NUMERIC_COLS else table[:, j] for j, c in enumerate(wanted)}
+        in_range = (values['frame_idx'] >= start_frame) & (values['frame_idx'] <= end_frame)
+        return {c: v[in_range] for c, v in values.items()}
+
+    def split(self, parts):
+        """Splits the indexed file into up to `parts` contiguous (start_frame, end_frame) ranges of similar byte size."""
+        if len(self.block_ids) == 0 or parts <= 1: return [(self.first_frame, self.last_frame)]
+        targets = np.linspace(self.block_offsets[0], self.end_offset, parts + 1)[1:-1]
+        cut_blocks = np.unique(np.searchsorted(self.block_offsets, targets))
+        cut_blocks = cut_blocks[(cut_blocks > 0) & (cut_blocks < len(self.block_ids))]
+        starts = [self.first_frame] + [int(self.block_ids[b]) * self.block_size for b in cut_blocks]
+        ends = [s - 1 for s in starts[1:]] + [self.last_frame]
+        return list(zip(starts, ends))
+
+def _float_or_nan(text):
+    try: return float(text)
+    except (ValueError, TypeError): return np.nan
+
+def _convert_row(row):
+    """Applies the same value conversion as a full load (floats for coordinate columns) and returns the row's frame number, or None."""
+    for col in COORD_COLS:
+        if row.get(col):
+            try: row[col] = float(row[col])
+            except (ValueError, TypeError): row[col] = None
+    try:
+        return int(float(row['frame_idx']))
+    except (ValueError, TypeError, KeyError):
+        return None
+
+def _parse_frame(line, frame_col):
+    if frame_col == 0 or b'"' not in line:
+        return int(float(line.split(b',', frame_col + 1)[frame_col]))
+    return int(float(next(csv.reader([line.decode('utf-8')]))[frame_col]))
+
+def build_frame_index(csv_path, block_size=DEFAULT_BLOCK_SIZE, progress_callback=None):
+    """
+    Scans a detection CSV once and records the byte offset at which every block of frames starts.
+    progress_callback, if given, is called as progress_callback(bytes_read, total_bytes) every
+    PROGRESS_INTERVAL_BYTES; an exception it raises aborts the scan.
+    """
+    block_ids, block_offsets = [], []
+    is_sorted, prev_frame, first_frame, last_frame = True, None, 0, -1
+    total_bytes = os.path.getsize(csv_path)
+    with open(csv_path, 'rb') as f:
+        header_line = f.readline()
+        headers = next(csv.reader([header_line.decode('utf-8-sig')]))
+        frame_col = headers.index('frame_idx'); offset = len(header_line); next_report = offset + PROGRESS_INTERVAL_BYTES
+        for line in f:
+            if progress_callback and offset >= next_report:
+                progress_callback(offset, total_bytes); next_report = offset + PROGRESS_INTERVAL_BYTES
+            if line.strip():
+                try:
+                    frame = _parse_frame(line, frame_col)
+                except (ValueError, IndexError):
+                    offset += len(line); continue
+                if prev_frame is None: first_frame = frame
+                elif frame < prev_frame: is_sorted = False
+                block = frame // block_size
+                if not block_ids or block != block_ids[-1]:
+                    block_ids.append(block); block_offsets.append(offset)
+                prev_frame = frame; last_frame = max(last_frame, frame)
+            offset += len(line)
+    if progress_callback: progress_callback(offset, total_bytes)
+    return FrameIndex(csv_path, headers, block_size, np.array(block_ids, dtype=np.int64), np.array(block_offsets, dtype=np.int64), offset, is_sorted, first_frame, last_frame)
+
+def _save_index(index, path, identity):
+    tmp_path = f"{path}.tmp{os.getpid()}.npz"
+    np.savez(tmp_path, block_ids=index.block_ids, block_offsets=index.block_offsets,
+             scalars=np.array([index.block_size, index.end_offset, int(index.is_sorted), index.first_frame, index.last_frame], dtype=np.int64),
+             headers=np.array(index.headers, dtype=str), identity=np.array([identity['hash']], dtype=str))
+    os.replace(tmp_path, path)
+
+def _read_index(csv_path, path, identity):
+    with np.load(path) as data:
+        if data['identity'][0] != identity['hash']: return None
+        block_size, end_offset, is_sorted, first_frame, last_frame = data['scalars'].tolist()
+        return FrameIndex(csv_path, data['headers'].tolist(), block_size, data['block_ids'], data['block_offsets'], end_offset, bool(is_sorted), first_frame, last_frame)
+
+def load_frame_index(csv_path, block_size=DEFAULT_BLOCK_SIZE, progress_callback=None):
+    """
+    Returns the FrameIndex for a CSV, reading the sidecar when it matches the CSV identity and building it
+    otherwise. progress_callback is passed to build_frame_index and is not called when the sidecar is used.
+    """
+    identity = csv_identity(csv_path); path = sidecar_path(csv_path, identity, INDEX_SUFFIX)
+    if os.path.exists(path):
+        try:
+            index = _read_index(csv_path, path, identity)
+            if index is not None and index.block_size == block_size: return index
+        except Exception:
+            print(f"Warning: ignoring unreadable frame index at '{path}'.")
+    index = build_frame_index(csv_path, block_size, progress_callback)
+    try:
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        _save_index(index, path, identity); remove_stale_sidecars(csv_path, path, INDEX_SUFFIX)
+    except Exception:
+        print(f"Warning: could not write frame index for '{csv_path}'."); print(traceback.format_exc())
+    return index
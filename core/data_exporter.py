@@ -7,24 +7,28 @@ import cv2
 import numpy as np
 from PyQt5.QtCore import QPointF
 
+from core.detection_ops import POLYGON_POINTS_KEY
+
 try:
     import pandas as pd
     PANDAS_AVAILABLE = True
 except ImportError:
     PANDAS_AVAILABLE = False
 
-def export_heatmap_image(processed_detections, video_path, output_path, time_gap_seconds, video_fps, frame_sample_rate):
+def export_heatmap_image(processed_detections, video_path, output_path, time_gap_seconds, video_fps, frame_sample_rate, base_image=None):
     """
     Creates and saves a heatmap image superimposed on the first frame of the video,
-    using only a subsample of the frames.
+    using only a subsample of the frames. Pass `base_image` (the already decoded first
+    frame) to avoid opening the video again.
     """
     try:
-        cap = cv2.VideoCapture(video_path)
-        if not cap.isOpened(): return f"Could not open video file: {video_path}"
-        ret, base_image = cap.read()
-        if not ret: cap.release(); return f"Could not read the first frame of video: {video_path}"
+        if base_image is None:
+            cap = cv2.VideoCapture(video_path)
+            if not cap.isOpened(): return f"Could not open video file: {video_path}"
+            ret, base_image = cap.read()
+            if not ret: cap.release(); return f"Could not read the first frame of video: {video_path}"
+            cap.release()
         video_h, video_w, _ = base_image.shape
-        cap.release()
 
         # ### NEW: Filter detections based on the frame sample rate ###
         sampled_detections = {k: v for k, v in processed_detections.items() if k % frame_sample_rate == 0}
@@ -211,7 +215,7 @@ def export_to_excel_sheets(processed_detections, output_path):
                 sheet_name = f'Tank_{tank_num}'; tank_df = pd.DataFrame(tank_data[tank_num])
                 for col in ['x1', 'y1', 'x2', 'y2', 'cx', 'cy', 'conf']:
                     if col in tank_df.columns: tank_df[col] = pd.to_numeric(tank_df[col], errors='coerce')
-                if 'tank_number' in tank_df.columns: tank_df = tank_df.drop(columns=['tank_number'])
+                tank_df = tank_df.drop(columns=[col for col in ['tank_number', POLYGON_POINTS_KEY] if col in tank_df.columns])
                 tank_df.to_excel(writer, sheet_name=sheet_name, index=False, float_format='%.4f')
         return None
     except Exception as e:
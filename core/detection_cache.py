@@ -0,0 +1,250 @@
+# EthoGrid_App/core/detection_cache.py
+
+import io
+import os
+import csv
+import json
+import shutil
+import hashlib
+import traceback
+import numpy as np
+
+from core.detection_ops import attach_polygon_points
+
+try:
+    import pandas as pd
+    PANDAS_AVAILABLE = True
+except ImportError:
+    PANDAS_AVAILABLE = False
+
+# --- Cache Configuration ---
+# By default the cache lives in a hidden folder next to each CSV. Set ETHOGRID_CACHE_DIR
+# (or call configure_cache) to keep all sidecars in one place instead.
+CACHE_FORMAT_VERSION = 1
+ENTRY_FORMAT_VERSION = 3  # layout of a column cache entry; entries written by another version are rebuilt
+SIDECAR_DIR_NAME = ".ethogrid_cache"
+CACHE_DIR = os.environ.get("ETHOGRID_CACHE_DIR") or None
+MAX_CACHE_BYTES = int(float(os.environ.get("ETHOGRID_CACHE_MAX_MB", 4096)) * 1024 * 1024)
+CACHE_ENABLED = os.environ.get("ETHOGRID_CACHE_DISABLED", "") == ""
+
+COORD_COLS = ['x1', 'y1', 'x2', 'y2', 'cx', 'cy', 'conf']
+NUMERIC_COLS = COORD_COLS + ['frame_idx']  # stored as numbers when their values parse (see _coerce_column); all other columns keep their text
+_HASH_SAMPLE_BYTES = 1024 * 1024
+_MAX_CATEGORIES = 1024
+_STRING_SEPARATOR = "\x00"
+
+def configure_cache(cache_dir=None, max_bytes=None, enabled=None):
+    """Overrides the cache directory, the size cap (bytes) and/or switches caching on or off."""
+    global CACHE_DIR, MAX_CACHE_BYTES, CACHE_ENABLED
+    CACHE_DIR = cache_dir or None
+    if max_bytes is not None: MAX_CACHE_BYTES = int(max_bytes)
+    if enabled is not None: CACHE_ENABLED = bool(enabled)
+
+def csv_identity(csv_path):
+    """
+    Identifies a CSV by size, mtime and a fast content hash (blake2b over the head,
+    middle and tail of the file), without reading the whole file.
+    """
+    stat = os.stat(csv_path)
+    hasher = hashlib.blake2b(digest_size=16)
+    hasher.update(f"{CACHE_FORMAT_VERSION}:{stat.st_size}:{stat.st_mtime_ns}".encode())
+    with open(csv_path, 'rb') as f:
+        for offset in sorted({0, max(0, stat.st_size // 2 - _HASH_SAMPLE_BYTES // 2), max(0, stat.st_size - _HASH_SAMPLE_BYTES)}):
+            f.seek(offset); hasher.update(f.read(_HASH_SAMPLE_BYTES))
+    return {'size': stat.st_size, 'mtime_ns': stat.st_mtime_ns, 'hash': hasher.hexdigest()}
+
+def _cache_root_for(csv_path):
+    return CACHE_DIR or os.path.join(os.path.dirname(os.path.abspath(csv_path)), SIDECAR_DIR_NAME)
+
+def _entry_prefix(csv_path):
+    path_hash = hashlib.blake2b(os.path.abspath(csv_path).encode('utf-8'), digest_size=4).hexdigest()
+    return f"{os.path.basename(csv_path)}.{path_hash}."
+
+def _entry_path(csv_path, identity):
+    return os.path.join(_cache_root_for(csv_path), _entry_prefix(csv_path) + identity['hash'])
+
+def sidecar_path(csv_path, identity, suffix):
+    """Path of a single-file sidecar (e.g. an index) stored alongside the column cache for this CSV identity."""
+    return _entry_path(csv_path, identity) + suffix
+
+def remove_stale_sidecars(csv_path, keep_path, suffix):
+    """Deletes sidecars with the given suffix that belong to older versions of this CSV."""
+    cache_root = _cache_root_for(csv_path); prefix = _entry_prefix(csv_path)
+    if not os.path.isdir(cache_root): return
+    for name in os.listdir(cache_root):
+        path = os.path.join(cache_root, name)
+        if name.startswith(prefix) and name.endswith(suffix) and path != keep_path:
+            try: os.remove(path)
+            except OSError: pass
+
+def _coerce_column(values, floats=True):
+    """
+    Converts a column of strings to int64 if every value is a plain integer ("12", "-3"; the text
+    is then exactly str() of the number), otherwise, if `floats`, to float64 (NaN for empty cells)
+    when every non-empty value is numeric. Anything else is returned unchanged.
+    """
+    try:
+        ints = values.astype(np.int64)
+        if np.array_equal(ints.astype(str).astype(object), values): return ints
+    except (ValueError, TypeError, OverflowError):
+        pass
+    if not floats: return values
+    try:
+        return np.where(values == '', 'nan', values).astype(np.float64)
+    except (ValueError, TypeError):
+        return values
+
+def _parse_csv(csv_path):
+    if PANDAS_AVAILABLE:
+        df = pd.read_csv(csv_path, dtype=str, keep_default_na=False, encoding='utf-8')
+        headers = [str(c) for c in df.columns]
+        raw = {c: df[c].to_numpy(dtype=object) for c in headers}
+    else:
+        with open(csv_path, newline="", encoding='utf-8') as f:
+            reader = csv.reader(f); headers = next(reader, []); rows = list(reader)
+        raw = {c: np.array([r[i] if i < len(r) else '' for r in rows], dtype=object) for i, c in enumerate(headers)}
+    return headers, {c: _coerce_column(v, floats=c in COORD_COLS) if c in NUMERIC_COLS else v for c, v in raw.items()}
+
+def _write_entry(entry_path, identity, headers, columns):
+    tmp_path = f"{entry_path}.tmp{os.getpid()}"
+    os.makedirs(tmp_path, exist_ok=True)
+    meta = {'version': ENTRY_FORMAT_VERSION, 'identity': identity, 'headers': headers, 'columns': {}}
+    for i, name in enumerate(headers):
+        values = columns[name]; stem = f"col{i}"
+        if values.dtype != object:
+            np.save(os.path.join(tmp_path, stem + ".npy"), values); meta['columns'][name] = {'kind': 'numeric', 'file': stem + ".npy"}
+            continue
+        categories, codes = np.unique(values.astype(str), return_inverse=True)
+        if len(categories) <= _MAX_CATEGORIES:
+            np.save(os.path.join(tmp_path, stem + ".npy"), codes.reshape(-1).astype(np.int32))
+            meta['columns'][name] = {'kind': 'category', 'file': stem + ".npy", 'categories': categories.tolist()}
+        else:
+            with open(os.path.join(tmp_path, stem + ".txt"), 'w', encoding='utf-8', newline='') as f: f.write(_STRING_SEPARATOR.join(values.tolist()))
+            meta['columns'][name] = {'kind': 'string', 'file': stem + ".txt", 'count': len(values)}
+    with open(os.path.join(tmp_path, "meta.json"), 'w') as f: json.dump(meta, f)
+    try:
+        os.replace(tmp_path, entry_path)
+    except OSError:
+        # Another worker published the same entry first; keep theirs.
+        shutil.rmtree(tmp_path, ignore_errors=True)
+
+def _read_entry(entry_path, identity):
+    meta_path = os.path.join(entry_path, "meta.json")
+    if not os.path.exists(meta_path): return None
+    with open(meta_path) as f: meta = json.load(f)
+    if meta.get('version') != ENTRY_FORMAT_VERSION or meta.get('identity') != identity: return None
+    columns = {}
+    for name in meta['headers']:
+        info = meta['columns'][name]; file_path = os.path.join(entry_path, info['file'])
+        if info['kind'] == 'numeric':
+            columns[name] = np.load(file_path, mmap_mode='r')
+        elif info['kind'] == 'category':
+            columns[name] = np.array(info['categories'] or [''], dtype=object)[np.load(file_path, mmap_mode='r')]
+        else:
+            with open(file_path, encoding='utf-8', newline='') as f: text = f.read()
+            values = text.split(_STRING_SEPARATOR) if info['count'] else []
+            columns[name] = np.array(values, dtype=object)
+    os.utime(meta_path)  # mark as recently used for LRU eviction
+    return meta['headers'], columns
+
+def _entry_size(entry_path):
+    return sum(os.path.getsize(os.path.join(entry_path, f)) for f in os.listdir(entry_path))
+
+def evict_cache(cache_root, max_bytes=None):
+    """Deletes least recently used entries from a cache folder until it fits under max_bytes."""
+    max_bytes = MAX_CACHE_BYTES if max_bytes is None else max_bytes
+    if not os.path.isdir(cache_root): return
+    entries = []
+    for name in os.listdir(cache_root):
+        path = os.path.join(cache_root, name); meta_path = os.path.join(path, "meta.json")
+        if os.path.isdir(path) and os.path.exists(meta_path): entries.append((os.path.getmtime(meta_path), _entry_size(path), path))
+    total = sum(size for _, size, _ in entries)
+    for _, size, path in sorted(entries):
+        if total <= max_bytes: break
+        shutil.rmtree(path, ignore_errors=True); total -= size
+
+def _remove_stale_entries(csv_path, keep_path):
+    cache_root = _cache_root_for(csv_path); prefix = _entry_prefix(csv_path)
+    for name in os.listdir(cache_root):
+        path = os.path.join(cache_root, name)
+        if name.startswith(prefix) and path != keep_path and len(name) - len(prefix) == 32:
+            shutil.rmtree(path, ignore_errors=True)
+
+def load_detection_columns(csv_path, use_cache=True):
+    """
+    Loads a detection CSV as (headers, {column: ndarray}). Coordinate and confidence columns are
+    int64 or float64 (NaN for empty cells) if all their values are numeric, frame_idx is int64 if
+    it holds plain integers; every other column is an object array of str, exactly as in the file.
+
+    The first load writes a binary sidecar keyed by the CSV identity; later loads memory-map it.
+    Caching failures (e.g. a read-only folder) silently fall back to parsing the CSV.
+    """
+    if not (use_cache and CACHE_ENABLED): return _parse_csv(csv_path)
+    identity = csv_identity(csv_path); entry_path = _entry_path(csv_path, identity)
+    try:
+        cached = _read_entry(entry_path, identity)
+        if cached is not None: return cached
+    except Exception:
+        print(f"Warning: ignoring unreadable detection cache at '{entry_path}'."); shutil.rmtree(entry_path, ignore_errors=True)
+    headers, columns = _parse_csv(csv_path)
+    try:
+        shutil.rmtree(entry_path, ignore_errors=True)  # an entry in an older format
+        os.makedirs(os.path.dirname(entry_path), exist_ok=True)
+        _write_entry(entry_path, identity, headers, columns)
+        _remove_stale_entries(csv_path, entry_path)
+        evict_cache(os.path.dirname(entry_path))
+    except Exception:
+        print(f"Warning: could not write detection cache for '{csv_path}'."); print(traceback.format_exc())
+    return headers, columns
+
+def _to_coord(text):
+    try: return float(text) if text else text
+    except (ValueError, TypeError): return None
+
+def _column_values(name, values):
+    if name in COORD_COLS:
+        if values.dtype == object: return [_to_coord(v) for v in values.tolist()]
+        return ['' if v != v else float(v) for v in values.tolist()]  # NaN marks an empty cell
+    if values.dtype != object: return [str(v) for v in values.tolist()]  # a plain-integer frame_idx column, see _coerce_column
+    return values.tolist()
+
+def _frame_numbers(values):
+    if values.dtype != object: return values.astype(np.int64).tolist()
+    return [int(float(v)) for v in values.tolist()]
+
+def columns_to_detections(headers, columns):
+    """
+    Rebuilds the {frame_idx: [row dict, ...]} structure used by the GUI and batch workers.
+    Rows match a csv.DictReader load: coordinate/confidence values become floats (None if
+    unparsable, '' if empty) and every other value, frame_idx included, stays a str. Rows are
+    keyed by int(float(frame_idx)).
+    """
+    detections = {}
+    if 'frame_idx' not in columns: raise KeyError("frame_idx")
+    frame_list = _frame_numbers(np.asarray(columns['frame_idx']))
+    value_lists = [_column_values(name, np.asarray(columns[name])) for name in headers]
+    for frame_idx, values in zip(frame_list, zip(*value_lists)):
+        detections.setdefault(frame_idx, []).append(dict(zip(headers, values)))
+    return detections
+
+def load_detections_csv(csv_path, use_cache=True):
+    """Loads a detection CSV into ({frame_idx: [row dict, ...]}, headers), with segmentation polygons pre-parsed."""
+    headers, columns = load_detection_columns(csv_path, use_cache)
+    detections = columns_to_detections(headers, columns)
+    if 'polygon' in columns: attach_polygon_points(det for dets in detections.values() for det in dets)
+    return detections, headers
+
+def _infer_like_read_csv(values):
+    """
+    Converts a text column exactly as pd.read_csv would (int64, float64, bool or text, with its
+    default NA strings): only the distinct values are parsed by pandas, then expanded.
+    """
+    distinct, codes = np.unique(values.astype(str), return_inverse=True)
+    buffer = io.StringIO(); csv.writer(buffer, lineterminator='\n').writerows([value] for value in distinct.tolist())
+    parsed = pd.read_csv(io.StringIO(buffer.getvalue()), header=None, names=['value'], encoding='utf-8')['value'] if len(distinct) else pd.Series([], dtype=object)
+    return parsed.take(codes.reshape(-1)).reset_index(drop=True)
+
+def load_detection_dataframe(csv_path, use_cache=True):
+    """Loads a detection CSV as a pandas DataFrame backed by the binary cache, with the same column dtypes as pd.read_csv."""
+    headers, columns = load_detection_columns(csv_path, use_cache)
+    return pd.DataFrame({name: _infer_like_read_csv(values) if values.dtype == object else values for name, values in ((name, np.asarray(columns[name])) for name in headers)}, columns=headers)
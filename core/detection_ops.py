@@ -0,0 +1,178 @@
+# EthoGrid_App/core/detection_ops.py
+
+import numpy as np
+from collections import defaultdict
+
+def _to_float(value, default=0.0):
+    try:
+        return float(value)
+    except (ValueError, TypeError):
+        return default
+
+POLYGON_POINTS_KEY = 'polygon_points'  # parsed (N, 2) int32 view of a detection's 'polygon' string
+
+def _parse_polygon(text):
+    try:
+        points = np.array([list(map(int, p.split(','))) for p in text.split(';')], dtype=np.int32)
+        return points if points.ndim == 2 and points.shape[1] == 2 else None
+    except (ValueError, TypeError):
+        return None
+
+def parse_polygons(polygon_strings):
+    """
+    Parses 'x,y;x,y;...' polygon strings into a ragged layout: one (P, 2) int32 point array and
+    int64 offsets (len n + 1), so polygon i is points[offsets[i]:offsets[i + 1]]. Empty or
+    malformed polygons get zero points. All well-formed strings are converted in one NumPy call.
+    """
+    texts = [text if isinstance(text, str) else '' for text in polygon_strings]
+    counts = np.fromiter((text.count(';') + 1 if text else 0 for text in texts), dtype=np.int64, count=len(texts))
+    try:
+        # Every point must have exactly one comma, or points would shift between polygons in the joined parse
+        if any(text and text.count(',') != text.count(';') + 1 for text in texts): raise ValueError("malformed point")
+        values = np.array(",".join(text.replace(';', ',') for text in texts if text).split(','), dtype=np.int32) if counts.any() else np.zeros(0, dtype=np.int32)
+        points = values.reshape(-1, 2)
+    except ValueError:
+        # Some polygon is malformed: fall back to parsing them one by one
+        parsed = [_parse_polygon(text) if text else None for text in texts]
+        counts = np.fromiter((0 if poly is None else len(poly) for poly in parsed), dtype=np.int64, count=len(parsed))
+        points = np.concatenate([poly for poly in parsed if poly is not None]) if counts.any() else np.zeros((0, 2), dtype=np.int32)
+    offsets = np.zeros(len(texts) + 1, dtype=np.int64); np.cumsum(counts, out=offsets[1:])
+    return points, offsets
+
+def attach_polygon_points(rows):
+    """Parses the 'polygon' of every detection dict in `rows` once and stores it under POLYGON_POINTS_KEY (None if absent or malformed)."""
+    rows = [det for det in rows if det.get('polygon')]
+    if not rows: return
+    points, offsets = parse_polygons([det['polygon'] for det in rows])
+    for det, start, end in zip(rows, offsets[:-1].tolist(), offsets[1:].tolist()):
+        det[POLYGON_POINTS_KEY] = points[start:end] if end > start else None
+
+def polygon_points(det):
+    """Returns the detection's polygon as an (N, 2) int32 array, parsing and caching it if it was not attached at load time."""
+    if POLYGON_POINTS_KEY not in det: det[POLYGON_POINTS_KEY] = _parse_polygon(det['polygon']) if det.get('polygon') else None
+    return det[POLYGON_POINTS_KEY]
+
+def flatten_detections(detections):
+    """
+    Flattens a {frame_idx: [det, ...]} dictionary into columnar form.
+
+    Returns the list of detection dicts (row order) together with int64 frame and
+    tank arrays and a float64 confidence array. Detections without a tank get -1.
+    """
+    rows = [det for dets in detections.values() for det in dets]
+    counts = np.fromiter((len(dets) for dets in detections.values()), dtype=np.int64, count=len(detections))
+    frame_arr = np.repeat(np.fromiter(detections.keys(), dtype=np.int64, count=len(detections)), counts)
+    tank_arr = np.fromiter((-1 if det.get('tank_number') is None else int(det['tank_number']) for det in rows), dtype=np.int64, count=len(rows))
+    conf_arr = np.fromiter((_to_float(det.get('conf', 0.0)) for det in rows), dtype=np.float64, count=len(rows))
+    return rows, frame_arr, tank_arr, conf_arr
+
+def top_k_order(frame_arr, tank_arr, conf_arr, k):
+    """
+    Vectorized per-(frame, tank) top-k selection by confidence.
+
+    Rows are lexsorted by (frame, tank, -conf); the rank of a row inside its group is its
+    distance from the group start. Returns the sorted row indices whose rank is below k,
+    skipping rows that are not assigned to a tank (tank < 0).
+    """
+    n = len(frame_arr)
+    if n == 0: return np.empty(0, dtype=np.int64)
+    order = np.lexsort((-conf_arr, tank_arr, frame_arr))
+    f, t = frame_arr[order], tank_arr[order]
+    group_start = np.ones(n, dtype=bool)
+    group_start[1:] = (f[1:] != f[:-1]) | (t[1:] != t[:-1])
+    positions = np.arange(n)
+    rank = positions - np.maximum.accumulate(np.where(group_start, positions, 0))
+    return order[(rank < k) & (t >= 0)]
+
+def filter_top_k_per_tank(detections, k):
+    """
+    Keeps at most k detections per tank in every frame, highest confidence first.
+    'conf' is normalised to float on every detection. Returns a defaultdict(list)
+    keyed by frame index, ordered by frame, then tank, then descending confidence.
+    """
+    rows, frame_arr, tank_arr, conf_arr = flatten_detections(detections)
+    for det, conf in zip(rows, conf_arr.tolist()): det['conf'] = conf
+    filtered_detections = defaultdict(list)
+    kept = top_k_order(frame_arr, tank_arr, conf_arr, k)
+    for frame_idx, row_idx in zip(frame_arr[kept].tolist(), kept.tolist()):
+        filtered_detections[frame_idx].append(rows[row_idx])
+    return filtered_detections
+
+class BehaviorTimeline:
+    """
+    Compact run-length encoded behavior timeline.
+
+    `names` lists the behavior labels and `runs` maps tank_id -> (starts, ends, codes),
+    three int arrays where each run covers frames start..end (inclusive) and `codes`
+    index into `names`.
+    """
+    def __init__(self, names=None, runs=None):
+        self.names = list(names) if names is not None else []
+        self.runs = runs if runs is not None else {}
+
+    def __contains__(self, tank_id):
+        return tank_id in self.runs
+
+    def __bool__(self):
+        return bool(self.runs)
+
+    def tank_ids(self):
+        return sorted(self.runs.keys())
+
+def encode_behavior_runs(frame_arr, tank_arr, class_names):
+    """
+    Vectorized run-length encoder for per-tank behavior timelines.
+
+    Class names are factorized to integer codes and rows are sorted by (tank, frame);
+    only the first row of every (tank, frame) pair is used. A new run starts wherever the
+    tank changes, the frame is not contiguous or the behavior code changes.
+    Rows with tank < 0 are ignored. Returns a BehaviorTimeline.
+    """
+    frame_arr, tank_arr = np.asarray(frame_arr, dtype=np.int64), np.asarray(tank_arr, dtype=np.int64)
+    names, codes = np.unique(np.asarray(class_names, dtype=str), return_inverse=True)
+    valid = tank_arr >= 0
+    frame_arr, tank_arr, codes = frame_arr[valid], tank_arr[valid], codes.reshape(-1)[valid]
+    if len(frame_arr) == 0: return BehaviorTimeline(names.tolist())
+
+    order = np.lexsort((frame_arr, tank_arr))
+    f, t, c = frame_arr[order], tank_arr[order], codes[order]
+    first_of_frame = np.ones(len(f), dtype=bool)
+    first_of_frame[1:] = (t[1:] != t[:-1]) | (f[1:] != f[:-1])
+    f, t, c = f[first_of_frame], t[first_of_frame], c[first_of_frame]
+
+    run_start = np.ones(len(f), dtype=bool)
+    run_start[1:] = (t[1:] != t[:-1]) | (np.diff(f) != 1) | (np.diff(c) != 0)
+    start_idx = np.flatnonzero(run_start)
+    end_idx = np.append(start_idx[1:] - 1, len(f) - 1)
+    starts, ends, run_codes, run_tanks = f[start_idx], f[end_idx], c[start_idx].astype(np.int32), t[start_idx]
+
+    tank_ids, tank_first = np.unique(run_tanks, return_index=True)
+    bounds = np.append(tank_first, len(run_tanks))
+    runs = {int(tank_id): (starts[bounds[i]:bounds[i + 1]], ends[bounds[i]:bounds[i + 1]], run_codes[bounds[i]:bounds[i + 1]]) for i, tank_id in enumerate(tank_ids.tolist())}
+    return BehaviorTimeline(names.tolist(), runs)
+
+def build_behavior_timeline(detections):
+    """Builds a BehaviorTimeline from a {frame_idx: [det, ...]} dictionary of tank-assigned detections."""
+    rows, frame_arr, tank_arr, _ = flatten_detections(detections)
+    return encode_behavior_runs(frame_arr, tank_arr, [str(det.get('class_name', '')) for det in rows])
+
+def assign_tanks(cx, cy, inverse_affine, video_size, cols, rows):
+    """
+    Vectorized tank lookup for centroid arrays.
+
+    `inverse_affine` holds (m11, m12, m21, m22, dx, dy) of the inverted grid QTransform.
+    Returns int64 tank numbers (row * cols + col + 1), or -1 for points outside the grid.
+    """
+    m11, m12, m21, m22, dx, dy = inverse_affine; w, h = video_size
+    cx, cy = np.asarray(cx, dtype=np.float64), np.asarray(cy, dtype=np.float64)
+    tx = m11 * cx + m21 * cy + dx; ty = m12 * cx + m22 * cy + dy
+    inside = (tx >= 0) & (tx < w) & (ty >= 0) & (ty < h)
+    col = np.clip((np.where(inside, tx, 0) / (w / cols)).astype(np.int64), 0, cols - 1)
+    row = np.clip((np.where(inside, ty, 0) / (h / rows)).astype(np.int64), 0, rows - 1)
+    return np.where(inside, row * cols + col + 1, -1)
+
+def expand_timeline(timeline, stride, last_frame):
+    """Maps a timeline encoded on frame bins of `stride` frames back onto frame numbers."""
+    if stride == 1: return timeline
+    runs = {tank_id: (starts * stride, np.minimum(ends * stride + stride - 1, last_frame), codes) for tank_id, (starts, ends, codes) in timeline.runs.items()}
+    return BehaviorTimeline(timeline.names, runs)
@@ -0,0 +1,86 @@
+# EthoGrid_App/core/frame_bus.py
+
+import threading
+import cv2
+
+class FrameConsumer:
+    """
+    Subscriber of a FrameBus.
+
+    `wants(frame_idx)` selects the frames it needs and `consume(frame_idx, frame)` receives them.
+    Frames are shared between consumers, so a consumer must copy a frame before modifying it.
+    Once `is_done()` returns True the consumer no longer keeps the decoder running, and
+    `finish()` is always called once decoding stops (also on errors or cancellation).
+    """
+    def wants(self, frame_idx):
+        return True
+
+    def consume(self, frame_idx, frame):
+        pass
+
+    def is_done(self):
+        return False
+
+    def finish(self):
+        pass
+
+class FrameGrabber(FrameConsumer):
+    """Keeps a copy of a single frame (e.g. the heatmap background) that other threads can wait for."""
+    def __init__(self, frame_idx=0):
+        self.frame_idx = frame_idx; self.frame = None; self._ready = threading.Event()
+
+    def wants(self, frame_idx):
+        return frame_idx == self.frame_idx
+
+    def consume(self, frame_idx, frame):
+        self.frame = frame.copy(); self._ready.set()
+
+    def is_done(self):
+        return self._ready.is_set()
+
+    def finish(self):
+        self._ready.set()
+
+    def wait(self, timeout=None):
+        """Blocks until the frame was decoded or the bus stopped; returns the frame or None."""
+        self._ready.wait(timeout)
+        return self.frame
+
+class FrameBus:
+    """
+    Decodes a video once and hands every frame to the subscribed consumers, in subscription order.
+    Frames no consumer wants are only grabbed (not decoded to BGR), and decoding stops as soon as
+    every consumer is done.
+    """
+    def __init__(self, video_path, frame_count=None):
+        self.video_path = video_path; self.frame_count = frame_count; self.consumers = []
+
+    def subscribe(self, consumer):
+        self.consumers.append(consumer)
+        return consumer
+
+    def run(self, is_running=lambda: True):
+        """Runs the decode loop and returns the number of frames read."""
+        cap = cv2.VideoCapture(self.video_path); frame_idx = 0
+        try:
+            if not cap.isOpened(): raise IOError(f"Could not open video: {self.video_path}")
+            while is_running() and (self.frame_count is None or frame_idx < self.frame_count):
+                active = [consumer for consumer in self.consumers if not consumer.is_done()]
+                if not active: break
+                receivers = [consumer for consumer in active if consumer.wants(frame_idx)]
+                if not receivers:
+                    if not cap.grab(): break
+                else:
+                    ret, frame = cap.read()
+                    if not ret: break
+                    for consumer in receivers: consumer.consume(frame_idx, frame)
+                frame_idx += 1
+        finally:
+            cap.release(); finish_error = None
+            for consumer in self.consumers:
+                try:
+                    consumer.finish()
+                except Exception as e:
+                    finish_error = finish_error or e  # still finish the others so nobody waits forever
+            if finish_error is not None: raise finish_error
+        return frame_idx
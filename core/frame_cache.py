@@ -0,0 +1,56 @@
+# EthoGrid_App/core/frame_cache.py
+
+import os
+import threading
+from collections import OrderedDict
+
+# Memory budget for decoded frames kept by the video player (override with ETHOGRID_FRAME_CACHE_MB)
+FRAME_CACHE_BYTES = int(float(os.environ.get("ETHOGRID_FRAME_CACHE_MB", 512)) * 1024 * 1024)
+
+class FrameCache:
+    """
+    Thread-safe LRU cache of decoded frames, bounded by total bytes rather than frame count.
+
+    Cached frames are marked read-only and handed out without copying, so callers that want to
+    draw on a frame must copy it first.
+    """
+    def __init__(self, max_bytes=FRAME_CACHE_BYTES):
+        self.max_bytes = max_bytes; self.nbytes = 0; self.hits = 0; self.misses = 0
+        self._frames = OrderedDict(); self._lock = threading.Lock()
+
+    def __contains__(self, frame_idx):
+        with self._lock:
+            return frame_idx in self._frames
+
+    def __len__(self):
+        with self._lock:
+            return len(self._frames)
+
+    def get(self, frame_idx):
+        """Returns the frame (marking it most recently used) or None."""
+        with self._lock:
+            frame = self._frames.get(frame_idx)
+            if frame is None: self.misses += 1; return None
+            self._frames.move_to_end(frame_idx); self.hits += 1
+            return frame
+
+    def put(self, frame_idx, frame):
+        """Stores a frame (the cache takes ownership of the array) and evicts the least recently used frames over budget."""
+        if frame.nbytes > self.max_bytes: return frame
+        frame.setflags(write=False)
+        with self._lock:
+            previous = self._frames.pop(frame_idx, None)
+            if previous is not None: self.nbytes -= previous.nbytes
+            self._frames[frame_idx] = frame; self.nbytes += frame.nbytes
+            while self.nbytes > self.max_bytes:
+                _, evicted = self._frames.popitem(last=False); self.nbytes -= evicted.nbytes
+        return frame
+
+    def missing(self, frame_indices):
+        """Returns the indices from `frame_indices` that are not cached, in the given order, without touching the LRU order."""
+        with self._lock:
+            return [frame_idx for frame_idx in frame_indices if frame_idx not in self._frames]
+
+    def clear(self):
+        with self._lock:
+            self._frames.clear(); self.nbytes = 0
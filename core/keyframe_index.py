@@ -0,0 +1,116 @@
+# EthoGrid_App/core/keyframe_index.py
+
+import time
+import shutil
+import sqlite3
+import threading
+import subprocess
+import traceback
+import numpy as np
+import cv2
+
+from core import video_index, video_probe
+from core.video_index import file_key, subprocess_kwargs, BackgroundPool
+
+GRAB_FORWARD_FRAMES = 64  # short forward gaps are skipped with grab() (no retrieve/conversion) rather than a seek
+
+_index_cache = {}
+_index_lock = threading.Lock()
+_builder_pool = BackgroundPool(2, "keyframe-index")
+
+class KeyframeIndex:
+    """
+    Frame numbers of a video's keyframes, from one ffprobe packet scan. This is the only full scan
+    of a file; its packet count also becomes the exact frame count in the video metadata index.
+
+    Seeking with CAP_PROP_POS_FRAMES to an arbitrary frame of a long-GOP H.264 file is slow and can
+    land a few frames off; seeking to the preceding keyframe and grabbing forward is exact and
+    costs at most one GOP of decoding.
+    """
+    def __init__(self, keyframes, frame_count):
+        self.keyframes = np.asarray(keyframes, dtype=np.int64); self.frame_count = int(frame_count)
+
+    def keyframe_before(self, frame_idx):
+        """The last keyframe at or before frame_idx (0 if there is none)."""
+        pos = np.searchsorted(self.keyframes, frame_idx, side='right') - 1
+        return int(self.keyframes[pos]) if pos >= 0 else 0
+
+def _scan_keyframes(video_path):
+    cmd = ["ffprobe", "-v", "error", "-select_streams", "v:0", "-show_entries", "packet=flags", "-of", "csv=p=0", video_path]
+    result = subprocess.run(cmd, stdout=subprocess.PIPE, stderr=subprocess.PIPE, text=True, check=True, **subprocess_kwargs())
+    flags = result.stdout.split()
+    return KeyframeIndex(np.flatnonzero(np.fromiter((flag.startswith('K') for flag in flags), dtype=bool, count=len(flags))), len(flags))
+
+def _stored_index(key):
+    if not video_index.INDEX_PATH: return None
+    try:
+        conn = video_index.connect()
+        try:
+            row = conn.execute("SELECT frame_count, keyframes FROM keyframes WHERE path = ? AND size = ? AND mtime_ns = ?", key).fetchone()
+        finally:
+            conn.close()
+    except (sqlite3.Error, OSError):
+        print(f"Warning: could not read keyframes from the video index '{video_index.INDEX_PATH}'."); return None
+    return KeyframeIndex(np.frombuffer(row[1], dtype=np.int64), row[0]) if row else None
+
+def _store_index(key, index):
+    if not video_index.INDEX_PATH: return
+    try:
+        conn = video_index.connect()
+        try:
+            with conn:
+                conn.execute("INSERT OR REPLACE INTO keyframes (path, size, mtime_ns, frame_count, keyframes, scanned_at) VALUES (?, ?, ?, ?, ?, ?)",
+                             key + (index.frame_count, index.keyframes.astype(np.int64).tobytes(), time.time()))
+        finally:
+            conn.close()
+    except (sqlite3.Error, OSError):
+        print(f"Warning: could not store keyframes in the video index '{video_index.INDEX_PATH}'."); print(traceback.format_exc())
+
+def load_keyframe_index(video_path):
+    """
+    Returns the KeyframeIndex of a video, or None without ffprobe or for unreadable files.
+    Built once per file version (path, size, mtime) and kept in memory and in the video index.
+    """
+    try:
+        key = file_key(video_path)
+    except OSError:
+        return None
+    with _index_lock:
+        if key in _index_cache: return _index_cache[key]
+    index = _stored_index(key)
+    if index is None:
+        if shutil.which("ffprobe") is None: return None
+        try:
+            index = _scan_keyframes(video_path)
+        except (subprocess.CalledProcessError, OSError, ValueError):
+            print(f"Warning: could not scan keyframes of '{video_path}'."); return None
+        if len(index.keyframes) == 0: return None
+        _store_index(key, index); video_probe.record_exact_frame_count(key, index.frame_count)
+    with _index_lock: _index_cache[key] = index
+    return index
+
+def load_keyframe_index_async(video_path):
+    """Builds the index on a background thread; returns a Future (its result is the index or None)."""
+    return _builder_pool.submit(load_keyframe_index, video_path)
+
+def seek_exact(cap, frame_idx, index, current_pos=None):
+    """
+    Positions `cap` so that the next read() returns frame_idx. Gaps of up to GRAB_FORWARD_FRAMES
+    ahead of `current_pos` (the frame the next read() would return) are grabbed through. Otherwise,
+    with an index it seeks to the preceding keyframe (or keeps decoding from `current_pos` when that
+    is already inside the same GOP) and grabs forward; without one it falls back to
+    CAP_PROP_POS_FRAMES. Returns False if the video ended while grabbing.
+    """
+    if current_pos is not None and current_pos >= 0 and 0 <= frame_idx - current_pos <= GRAB_FORWARD_FRAMES:
+        for _ in range(frame_idx - current_pos):
+            if not cap.grab(): return False
+        return True
+    if index is None:
+        if current_pos != frame_idx: cap.set(cv2.CAP_PROP_POS_FRAMES, frame_idx)
+        return True
+    keyframe = index.keyframe_before(frame_idx)
+    if current_pos is None or not keyframe <= current_pos <= frame_idx:
+        cap.set(cv2.CAP_PROP_POS_FRAMES, keyframe); current_pos = keyframe
+    for _ in range(frame_idx - current_pos):
+        if not cap.grab(): return False
+    return True
@@ -0,0 +1,47 @@
+# EthoGrid_App/core/render_pool.py
+
+import os
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+
+# OpenCV drawing and NumPy blending release the GIL, so a few threads render frames in parallel
+RENDER_THREADS = max(1, min(4, (os.cpu_count() or 1) - 1))
+
+class OrderedRenderPool:
+    """
+    Renders frames on a thread pool and hands the results to `write(frame_idx, rendered)` strictly
+    in submission order.
+
+    `submit(frame_idx, frame)` queues `render(frame, frame_idx)`; finished frames at the head of the
+    queue are written from the submitting thread, and submitting blocks once `max_pending` frames
+    are in flight, so memory stays bounded however slow the writer is. `close()` writes what is
+    left. With a single thread frames are rendered inline and nothing is buffered.
+    """
+    def __init__(self, render, write, num_threads=RENDER_THREADS, max_pending=None):
+        self.render = render; self.write = write; self.num_threads = max(1, int(num_threads))
+        self.max_pending = max_pending or 2 * self.num_threads; self._pending = deque()
+        self._pool = ThreadPoolExecutor(max_workers=self.num_threads, thread_name_prefix="render") if self.num_threads > 1 else None
+
+    def submit(self, frame_idx, frame):
+        if self._pool is None: self.write(frame_idx, self.render(frame, frame_idx)); return
+        self._pending.append((frame_idx, self._pool.submit(self.render, frame, frame_idx)))
+        while self._pending and (len(self._pending) >= self.max_pending or self._pending[0][1].done()): self._write_next()
+
+    def _write_next(self):
+        frame_idx, future = self._pending.popleft(); self.write(frame_idx, future.result())
+
+    def close(self, discard=False):
+        """Writes every pending frame (or drops them with `discard`) and shuts the threads down."""
+        try:
+            while self._pending:
+                if discard: self._pending.popleft()[1].cancel()
+                else: self._write_next()
+        finally:
+            self._pending.clear()
+            if self._pool is not None: self._pool.shutdown(wait=True)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close(discard=exc_type is not None)
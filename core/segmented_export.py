@@ -0,0 +1,108 @@
+# EthoGrid_App/core/segmented_export.py
+
+import os
+import time
+import queue
+import shutil
+import tempfile
+import traceback
+import subprocess
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+import numpy as np
+
+from core.keyframe_index import load_keyframe_index
+from core.video_index import subprocess_kwargs
+
+MIN_SEGMENT_FRAMES = 600  # shorter segments are not worth a process start and an extra decoder seek
+PROGRESS_INTERVAL_SECONDS = 0.25
+
+def segmented_export_available():
+    """Splitting needs ffprobe (keyframe positions) and ffmpeg (lossless concatenation)."""
+    return shutil.which("ffmpeg") is not None and shutil.which("ffprobe") is not None
+
+def plan_segments(keyframes, total_frames, num_segments):
+    """
+    Splits 0..total_frames into at most `num_segments` (start, end) ranges whose starts are source
+    keyframes, so every segment decoder can seek exactly. Returns a single range if the video is
+    too short or has no usable keyframes.
+    """
+    num_segments = min(num_segments, max(1, total_frames // MIN_SEGMENT_FRAMES))
+    keyframes = np.asarray(keyframes, dtype=np.int64); keyframes = keyframes[(keyframes > 0) & (keyframes < total_frames)]
+    if num_segments <= 1 or len(keyframes) == 0: return [(0, total_frames)]
+    targets = np.arange(1, num_segments) * total_frames / num_segments
+    starts = keyframes[np.clip(np.searchsorted(keyframes, targets, side='right') - 1, 0, len(keyframes) - 1)]
+    bounds = [0] + sorted(set(starts.tolist())) + [total_frames]
+    return [(start, end) for start, end in zip(bounds[:-1], bounds[1:]) if end > start]
+
+def concat_segments(segment_paths, output_path):
+    """Joins the segment files with ffmpeg's concat demuxer (stream copy, no re-encoding)."""
+    list_path = f"{output_path}.segments.txt"
+    with open(list_path, 'w', encoding='utf-8') as f:
+        for path in segment_paths: f.write("file '{}'\n".format(os.path.abspath(path).replace("'", "'\\''")))
+    try:
+        cmd = ["ffmpeg", "-y", "-v", "error", "-f", "concat", "-safe", "0", "-i", list_path, "-c", "copy", output_path]
+        subprocess.run(cmd, stdout=subprocess.PIPE, stderr=subprocess.PIPE, text=True, check=True, **subprocess_kwargs())
+    finally:
+        os.remove(list_path)
+
+class SegmentProgress:
+    """Passed to a segment renderer as `progress(frames_done)`; throttles the reports sent to the parent."""
+    def __init__(self, event_queue, segment_idx):
+        self.event_queue = event_queue; self.segment_idx = segment_idx; self.last_sent = 0.0
+
+    def __call__(self, frames_done, force=False):
+        now = time.monotonic()
+        if force or now - self.last_sent >= PROGRESS_INTERVAL_SECONDS:
+            self.last_sent = now; self.event_queue.put((self.segment_idx, frames_done))
+
+def _run_segment(render_segment, segment_path, start, end, event_queue, cancel_event, segment_idx):
+    progress = SegmentProgress(event_queue, segment_idx)
+    try:
+        return render_segment(segment_path, start, end, progress, lambda: not cancel_event.is_set())
+    finally:
+        progress(end - start, force=True)
+
+def export_in_segments(render_segment, video_path, output_path, total_frames, num_processes, on_progress=None, is_running=lambda: True, log=print):
+    """
+    Renders a video in keyframe-aligned segments (from the cached KeyframeIndex), one process per segment, and concatenates them.
+
+    `render_segment(segment_path, start, end, progress, is_running)` must be picklable (module level
+    or a functools.partial of one); it encodes frames start..end-1 to `segment_path` and returns an
+    error message or None. `on_progress(frames_done)` receives the combined frame count.
+    Returns an error message or None; nothing is written to `output_path` unless every segment succeeded.
+    """
+    keyframe_index = load_keyframe_index(video_path)
+    segments = plan_segments(keyframe_index.keyframes if keyframe_index is not None else [], total_frames, num_processes)
+    log(f"Rendering {len(segments)} segments in parallel: " + ", ".join(f"{start}-{end - 1}" for start, end in segments))
+    extension = os.path.splitext(output_path)[1] or ".mp4"
+    segment_dir = tempfile.mkdtemp(prefix=".ethogrid_segments_", dir=os.path.dirname(os.path.abspath(output_path)))
+    segment_paths = [os.path.join(segment_dir, f"segment_{i:04d}{extension}") for i in range(len(segments))]
+    ctx = multiprocessing.get_context('spawn'); errors = []
+    try:
+        with multiprocessing.Manager() as manager:
+            event_queue, cancel_event = manager.Queue(), manager.Event(); frames_done = [0] * len(segments)
+            with ProcessPoolExecutor(max_workers=min(num_processes, len(segments)), mp_context=ctx) as pool:
+                futures = [pool.submit(_run_segment, render_segment, path, start, end, event_queue, cancel_event, i) for i, (path, (start, end)) in enumerate(zip(segment_paths, segments))]
+                while not all(future.done() for future in futures) or not event_queue.empty():
+                    if not is_running(): cancel_event.set()
+                    try:
+                        segment_idx, done = event_queue.get(timeout=0.1)
+                    except queue.Empty:
+                        continue
+                    frames_done[segment_idx] = done
+                    if on_progress: on_progress(sum(frames_done))
+                for future in futures:
+                    try:
+                        error_msg = future.result()
+                    except Exception as e:
+                        error_msg = f"{e}\n{traceback.format_exc()}"
+                    if error_msg: errors.append(error_msg)
+        if errors: return errors[0]
+        if not is_running(): return None
+        concat_segments(segment_paths, output_path)
+        return None
+    except subprocess.CalledProcessError as e:
+        return f"FFmpeg could not join the segments: {e.stderr}"
+    finally:
+        shutil.rmtree(segment_dir, ignore_errors=True)
@@ -0,0 +1,60 @@
+# EthoGrid_App/core/timeline_pyramid.py
+
+import numpy as np
+
+MAX_BASE_BINS = 65536  # bins in the finest pyramid level; views finer than that are summarised from the runs
+BINS_PER_INTERVAL = 8  # minimum bins read per pixel, so bins straddling a pixel edge shift at most 1/8 of a pixel
+
+def class_frames_before(runs, num_classes, points):
+    """
+    For one tank's runs (starts, ends, codes; inclusive ends, sorted and non-overlapping), the number
+    of frames of each class before each frame number in `points`. Returns int64 (len(points), num_classes).
+    """
+    starts, ends, codes = runs; points = np.asarray(points, dtype=np.int64)
+    before = np.zeros((len(points), num_classes), dtype=np.int64)
+    for code in range(num_classes):
+        selected = codes == code
+        if not selected.any(): continue
+        class_starts, class_ends = starts[selected], ends[selected]
+        cumulative = np.concatenate(([0], np.cumsum(class_ends - class_starts + 1)))
+        k = np.searchsorted(class_starts, points, side='left')  # runs starting before each point
+        overshoot = np.where(k > 0, np.maximum(0, class_ends[np.maximum(k - 1, 0)] + 1 - points), 0)  # part of the last such run at or after the point
+        before[:, code] = cumulative[k] - overshoot
+    return before
+
+class TimelinePyramid:
+    """
+    Multi-resolution summary of a BehaviorTimeline, built once from its runs: for every tank, the
+    frames of each behavior class in bins of `base_bin * 2**level` frames. The dominant class of a
+    bin is the argmax of its counts and its occupancy the counted frames over the bin length.
+
+    summarize() answers "frames per class in each of these pixel intervals" from the coarsest level
+    with at least BINS_PER_INTERVAL bins in the narrowest interval, reading only the bins in view,
+    so drawing cost follows the pixel count rather than the number of segments.
+    """
+    def __init__(self, timeline, total_frames, max_base_bins=MAX_BASE_BINS):
+        self.timeline = timeline; self.total_frames = max(1, int(total_frames)); self.num_classes = max(1, len(timeline.names))
+        self.base_bin = 1 << max(0, int(np.ceil(np.log2(self.total_frames / max_base_bins))))
+        self.levels = {}  # tank_id -> [counts per level], each uint32 (n_bins, num_classes)
+        edges = np.append(np.arange(0, self.total_frames, self.base_bin), self.total_frames)
+        for tank_id in timeline.tank_ids():
+            counts = np.diff(class_frames_before(timeline.runs[tank_id], self.num_classes, edges), axis=0).astype(np.uint32); levels = [counts]
+            while len(counts) > 1:
+                if len(counts) % 2: counts = np.vstack([counts, np.zeros((1, self.num_classes), np.uint32)])
+                counts = counts[0::2] + counts[1::2]; levels.append(counts)
+            self.levels[tank_id] = levels
+
+    def summarize(self, tank_id, lo, hi):
+        """Frames of each class in the intervals [lo[i], hi[i]) (increasing frame numbers) as int64 (len(lo), num_classes)."""
+        lo, hi = np.asarray(lo, dtype=np.int64), np.asarray(hi, dtype=np.int64)
+        if tank_id not in self.levels or len(lo) == 0: return np.zeros((len(lo), self.num_classes), dtype=np.int64)
+        narrowest = int((hi - lo).min())
+        if narrowest < self.base_bin * BINS_PER_INTERVAL:  # zoomed in past the finest level: count exactly from the runs
+            runs = self.timeline.runs[tank_id]
+            return class_frames_before(runs, self.num_classes, hi) - class_frames_before(runs, self.num_classes, lo)
+        levels = self.levels[tank_id]; level = min(int(np.log2(narrowest // (self.base_bin * BINS_PER_INTERVAL))), len(levels) - 1); bin_frames = self.base_bin << level; counts = levels[level]
+        # Each interval takes the bins that start inside it; only the bins in view are accumulated
+        first_lo, first_hi = np.minimum(-(-lo // bin_frames), len(counts)), np.minimum(-(-hi // bin_frames), len(counts))
+        begin, end = int(first_lo[0]), int(first_hi[-1])
+        cumulative = np.zeros((end - begin + 1, self.num_classes), dtype=np.int64); np.cumsum(counts[begin:end], axis=0, out=cumulative[1:])
+        return cumulative[first_hi - begin] - cumulative[first_lo - begin]
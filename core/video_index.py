@@ -0,0 +1,64 @@
+# EthoGrid_App/core/video_index.py
+
+import os
+import queue
+import sqlite3
+import threading
+import subprocess
+from concurrent.futures import Future
+
+# --- Video Index Configuration ---
+# Probed metadata and keyframe scans are kept in one small SQLite database shared by the GUI, the
+# dialogs and every worker process. Set ETHOGRID_VIDEO_INDEX to move it (or to "" to keep results in memory only).
+INDEX_PATH = os.environ.get("ETHOGRID_VIDEO_INDEX", os.path.join(os.path.expanduser("~"), ".ethogrid", "video_index.sqlite"))
+
+_SCHEMA = (
+    "CREATE TABLE IF NOT EXISTS videos (path TEXT PRIMARY KEY, size INTEGER, mtime_ns INTEGER, width INTEGER, height INTEGER, fps REAL, "
+    "frame_count INTEGER, duration REAL, codec TEXT, keyframe_interval REAL, exact INTEGER, probed_at REAL)",
+    "CREATE TABLE IF NOT EXISTS keyframes (path TEXT PRIMARY KEY, size INTEGER, mtime_ns INTEGER, frame_count INTEGER, keyframes BLOB, scanned_at REAL)",
+)
+
+def file_key(video_path):
+    """(absolute path, size, mtime_ns): the key under which a file version is indexed. Raises OSError for missing files."""
+    stat = os.stat(video_path)
+    return (os.path.abspath(video_path), stat.st_size, stat.st_mtime_ns)
+
+def connect():
+    """Opens the index database in WAL mode (several processes read and write it), creating the tables on first use."""
+    os.makedirs(os.path.dirname(INDEX_PATH) or ".", exist_ok=True)
+    conn = sqlite3.connect(INDEX_PATH, timeout=30)
+    conn.execute("PRAGMA journal_mode=WAL")
+    for statement in _SCHEMA: conn.execute(statement)
+    return conn
+
+def subprocess_kwargs():
+    """Extra subprocess.run arguments for ffprobe/ffmpeg calls: on Windows, no console window pops up."""
+    if os.name != 'nt': return {}
+    startupinfo = subprocess.STARTUPINFO(); startupinfo.dwFlags |= subprocess.STARTF_USESHOWWINDOW
+    return {'startupinfo': startupinfo}
+
+class BackgroundPool:
+    """
+    Runs probes and scans on up to `max_workers` daemon threads and returns Futures. Unlike a
+    ThreadPoolExecutor, whose threads are joined at interpreter exit, pending work never delays
+    closing the app.
+    """
+    def __init__(self, max_workers, name):
+        self.max_workers = max_workers; self.name = name
+        self._queue = queue.Queue(); self._threads = []; self._lock = threading.Lock()
+
+    def submit(self, fn, *args):
+        with self._lock:
+            if len(self._threads) < self.max_workers:
+                thread = threading.Thread(target=self._work, name=f"{self.name}-{len(self._threads)}", daemon=True); thread.start(); self._threads.append(thread)
+        future = Future(); self._queue.put((future, fn, args))
+        return future
+
+    def _work(self):
+        while True:
+            future, fn, args = self._queue.get()
+            if not future.set_running_or_notify_cancel(): continue
+            try:
+                future.set_result(fn(*args))
+            except BaseException as e:
+                future.set_exception(e)
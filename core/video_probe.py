@@ -0,0 +1,155 @@
+# EthoGrid_App/core/video_probe.py
+
+import json
+import time
+import shutil
+import sqlite3
+import threading
+import subprocess
+import traceback
+import numpy as np
+import cv2
+
+from core import video_index
+from core.video_index import file_key, subprocess_kwargs, BackgroundPool
+
+PROBE_WORKERS = 4
+KEYFRAME_SCAN_PACKETS = 500  # packets read from the start of the file to estimate the keyframe interval
+
+_COLUMNS = ['width', 'height', 'fps', 'frame_count', 'duration', 'codec', 'keyframe_interval', 'exact']
+_probe_cache = {}
+_probe_lock = threading.Lock()
+_prober_pool = BackgroundPool(PROBE_WORKERS, "video-probe")
+
+def _fourcc_to_str(fourcc):
+    return "".join(chr((fourcc >> (8 * i)) & 0xFF) for i in range(4)).strip("\x00 ") if fourcc > 0 else ""
+
+def _parse_rate(rate):
+    try:
+        num, den = (float(x) for x in rate.split('/'))
+        return num / den if den else 0.0
+    except (ValueError, AttributeError):
+        return 0.0
+
+def _probe_with_opencv(video_path):
+    cap = cv2.VideoCapture(video_path)
+    if not cap.isOpened(): return None
+    try:
+        width, height = int(cap.get(cv2.CAP_PROP_FRAME_WIDTH)), int(cap.get(cv2.CAP_PROP_FRAME_HEIGHT))
+        fps, frame_count = cap.get(cv2.CAP_PROP_FPS), int(cap.get(cv2.CAP_PROP_FRAME_COUNT))
+        return {'width': width, 'height': height, 'fps': fps, 'frame_count': frame_count,
+                'duration': frame_count / fps if fps > 0 else 0.0, 'codec': _fourcc_to_str(int(cap.get(cv2.CAP_PROP_FOURCC))),
+                'keyframe_interval': None, 'exact': False}
+    finally:
+        cap.release()
+
+def _to_number(value, kind=float):
+    try:
+        return kind(value)
+    except (ValueError, TypeError):
+        return None
+
+def _probe_with_ffprobe(video_path, ffprobe):
+    """
+    Reads the stream and container headers plus the flags of the first KEYFRAME_SCAN_PACKETS
+    packets, so a probe costs about the same regardless of the file length. The frame count is
+    exact when the container records it (nb_frames); otherwise it is estimated from the duration.
+    """
+    cmd = [ffprobe, "-v", "error", "-select_streams", "v:0", "-read_intervals", f"%+#{KEYFRAME_SCAN_PACKETS}",
+           "-show_entries", "stream=codec_name,width,height,avg_frame_rate,r_frame_rate,nb_frames,duration:format=duration:packet=flags", "-of", "json", video_path]
+    result = subprocess.run(cmd, stdout=subprocess.PIPE, stderr=subprocess.PIPE, text=True, check=True, **subprocess_kwargs())
+    data = json.loads(result.stdout); streams = data.get('streams') or []
+    if not streams: return None
+    stream = streams[0]; fps = _parse_rate(stream.get('avg_frame_rate')) or _parse_rate(stream.get('r_frame_rate'))
+    keyframes = np.flatnonzero([packet.get('flags', '').startswith('K') for packet in data.get('packets') or []])
+    keyframe_interval = float(np.median(np.diff(keyframes))) if len(keyframes) > 1 else None
+    duration = _to_number(stream.get('duration')) or _to_number(data.get('format', {}).get('duration')) or 0.0
+    frame_count = _to_number(stream.get('nb_frames'), int)
+    exact = bool(frame_count)
+    if not exact: frame_count = int(round(duration * fps))
+    return {'width': int(stream.get('width') or 0), 'height': int(stream.get('height') or 0), 'fps': fps, 'frame_count': frame_count,
+            'duration': duration or (frame_count / fps if fps > 0 else 0.0), 'codec': stream.get('codec_name', ""), 'keyframe_interval': keyframe_interval, 'exact': exact}
+
+def _probe_file(video_path):
+    ffprobe = shutil.which("ffprobe")
+    if ffprobe:
+        try:
+            info = _probe_with_ffprobe(video_path, ffprobe)
+            if info is not None: return info
+        except (subprocess.CalledProcessError, ValueError, OSError):
+            print(f"Warning: ffprobe failed for '{video_path}', falling back to OpenCV.")
+    return _probe_with_opencv(video_path)
+
+def _index_lookup(key):
+    if not video_index.INDEX_PATH: return None
+    try:
+        conn = video_index.connect()
+        try:
+            row = conn.execute(f"SELECT {', '.join(_COLUMNS)} FROM videos WHERE path = ? AND size = ? AND mtime_ns = ?", key).fetchone()
+        finally:
+            conn.close()
+    except (sqlite3.Error, OSError):
+        print(f"Warning: could not read the video index '{video_index.INDEX_PATH}'."); return None
+    if row is None: return None
+    info = dict(zip(_COLUMNS, row)); info['exact'] = bool(info['exact'])
+    return info
+
+def _index_store(key, info):
+    if not video_index.INDEX_PATH: return
+    try:
+        conn = video_index.connect()
+        try:
+            with conn:
+                conn.execute(f"INSERT OR REPLACE INTO videos (path, size, mtime_ns, {', '.join(_COLUMNS)}, probed_at) VALUES ({', '.join('?' * (len(_COLUMNS) + 4))})",
+                             key + tuple(info[c] for c in _COLUMNS) + (time.time(),))
+        finally:
+            conn.close()
+    except (sqlite3.Error, OSError):
+        print(f"Warning: could not update the video index '{video_index.INDEX_PATH}'."); print(traceback.format_exc())
+
+def probe_video(video_path):
+    """
+    Returns {'width', 'height', 'fps', 'frame_count', 'duration', 'codec', 'keyframe_interval', 'exact'}
+    for a video, or None if it cannot be opened.
+
+    Results are kept in memory and in the persistent index, keyed by path, size and mtime, so a
+    file is only probed once. With ffprobe available the keyframe interval is known and the frame
+    count is exact when the container stores it; otherwise estimates are used and `exact` is False.
+    """
+    try:
+        key = file_key(video_path)
+    except OSError:
+        return None
+    with _probe_lock:
+        if key in _probe_cache: return dict(_probe_cache[key])
+    info = _index_lookup(key)
+    if info is None:
+        info = _probe_file(video_path)
+        if info is None: return None
+        _index_store(key, info)
+    with _probe_lock: _probe_cache[key] = info
+    return dict(info)
+
+def record_exact_frame_count(key, frame_count):
+    """Stores a frame count counted elsewhere (the keyframe scan) for an indexed file version, marking it exact."""
+    with _probe_lock:
+        if key in _probe_cache: _probe_cache[key] = dict(_probe_cache[key], frame_count=frame_count, exact=True)
+    if not video_index.INDEX_PATH: return
+    try:
+        conn = video_index.connect()
+        try:
+            with conn: conn.execute("UPDATE videos SET frame_count = ?, exact = 1 WHERE path = ? AND size = ? AND mtime_ns = ?", (frame_count,) + key)
+        finally:
+            conn.close()
+    except (sqlite3.Error, OSError):
+        print(f"Warning: could not update the video index '{video_index.INDEX_PATH}'.")
+
+def prefetch_video_info(video_paths):
+    """Probes videos on background daemon threads so their metadata is indexed before a worker needs it; pending probes never delay app exit. Returns the futures."""
+    return [_prober_pool.submit(_safe_probe, video_path) for video_path in video_paths]
+
+def _safe_probe(video_path):
+    try:
+        return probe_video(video_path)
+    except Exception:
+        print(f"Warning: could not probe '{video_path}'."); print(traceback.format_exc()); return None
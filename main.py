@@ -3,6 +3,7 @@
 import sys
 import os
 import time
+import multiprocessing
 from PyQt5 import QtWidgets, QtCore, QtGui
 
 # This is crucial: it adds the application's folder to the Python path
@@ -55,6 +56,8 @@ class GlobalScrollFilter(QtCore.QObject):
 
 
 if __name__ == "__main__":
+    # Required for the batch worker processes in frozen (PyInstaller) builds
+    multiprocessing.freeze_support()
     os.environ['KMP_DUPLICATE_LIB_OK'] = 'TRUE'
     
     if hasattr(QtCore.Qt, 'AA_EnableHighDpiScaling'):
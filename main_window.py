@@ -11,11 +11,16 @@ from PyQt5.QtCore import QPointF
 from PyQt5.QtGui import QImage, QPixmap
 
 # Local imports
-from workers.video_loader import VideoLoader
+from workers.video_loader import VideoLoader, PLAYBACK_SPEEDS
+from workers.shm_video_loader import SharedMemoryVideoLoader, DECODER_PROCESS_ENABLED
 from workers.video_saver import VideoSaver
 from workers.detection_processor import DetectionProcessor
 from widgets.timeline_widget import TimelineWidget
 from core.grid_manager import GridManager
+from core.detection_ops import BehaviorTimeline, polygon_points
+from core.detection_cache import load_detections_csv
+from workers.frame_index_loader import FrameIndexLoader
+from workers.timeline_summary_processor import TimelineSummaryProcessor
 from widgets.batch_dialog import BatchProcessDialog
 from widgets.yolo_inference_dialog import YoloInferenceDialog
 from widgets.yolo_segmentation_dialog import YoloSegmentationDialog
@@ -27,6 +32,12 @@ from widgets.stats_dialog import StatsDialog
 from widgets.updater_dialog import UpdaterDialog
 from widgets.video_resizer_dialog import VideoResizerDialog
 
+# Detection files at least this large are loaded lazily: only a window of frames around the
+# current position is parsed and processed, while a coarse summary feeds the timeline.
+WINDOWED_DETECTIONS_MIN_BYTES = 256 * 1024 * 1024
+DETECTION_WINDOW_FRAMES = 3000
+DETECTION_WINDOW_MARGIN = 500
+
 def resource_path(relative_path):
     """ Get absolute path to resource, works for dev and for PyInstaller """
     try:
@@ -49,9 +60,10 @@ class VideoPlayer(QtWidgets.QWidget):
         self.video_size = (0, 0); self.behavior_colors = {}
         self.predefined_colors = [(31,119,180),(255,127,14),(44,160,44),(214,39,40),(148,103,189),(140,86,75),(227,119,194),(127,127,127),(188,189,34),(23,190,207)]
         self.grid_settings = {'cols': 5, 'rows': 2}; self.selected_cells = set(); self.line_thickness = 2
-        self.dragging_mode, self.last_mouse_pos = None, None
+        self.dragging_mode, self.last_mouse_pos = None, None; self._display_scale_cache = (None, 1.0); self._grid_layer = None; self._presented_frame = None
         self.grid_manager = GridManager(); self.video_loader, self.video_saver, self.detection_processor = None, None, None
         self.timeline_widget, self.legend_group_box = None, None
+        self.detection_index, self.detection_window, self.pending_window, self.summary_processor = None, None, None, None; self.stale_summary_processors = []; self.frame_index_loader = None
         
         self.setup_ui()
         self.setup_connections()
@@ -77,6 +89,9 @@ class VideoPlayer(QtWidgets.QWidget):
         self.status_label = QtWidgets.QLabel(""); self.status_label.setObjectName("statusLabel"); self.status_label.setAlignment(QtCore.Qt.AlignCenter)
         self.play_btn, self.pause_btn, self.stop_btn = QtWidgets.QPushButton("▶ Play"), QtWidgets.QPushButton("⏸ Pause"), QtWidgets.QPushButton("⏹ Stop")
         self.frame_slider = QtWidgets.QSlider(QtCore.Qt.Horizontal); self.frame_slider.setEnabled(False)
+        self.speed_combo = QtWidgets.QComboBox(); self.speed_combo.setToolTip("Playback speed")
+        for speed in PLAYBACK_SPEEDS: self.speed_combo.addItem(f"{speed:g}×", speed)
+        self.speed_combo.setCurrentIndex(PLAYBACK_SPEEDS.index(1.0))
         self.frame_label = QtWidgets.QLabel("Frame: 0/0"); self.timeline_widget = TimelineWidget(self)
         self.progress_bar = QtWidgets.QProgressBar(); self.progress_bar.setRange(0, 100); self.progress_bar.setTextVisible(False)
         self.legend_group_box = QtWidgets.QGroupBox("Behavior Legend"); self.legend_layout = QtWidgets.QVBoxLayout(); self.legend_layout.setAlignment(QtCore.Qt.AlignTop); self.legend_group_box.setLayout(self.legend_layout)
@@ -120,7 +135,7 @@ class VideoPlayer(QtWidgets.QWidget):
         processing_toolbar.addStretch()
 
         main_h_layout = QtWidgets.QHBoxLayout(); left_pane_layout = QtWidgets.QVBoxLayout(); left_pane_layout.addWidget(self.video_label, stretch=1); left_pane_layout.addWidget(self.status_label)
-        controls_layout = QtWidgets.QHBoxLayout(); controls_layout.addWidget(self.play_btn); controls_layout.addWidget(self.pause_btn); controls_layout.addWidget(self.stop_btn); controls_layout.addWidget(self.frame_slider, stretch=1); controls_layout.addWidget(self.frame_label)
+        controls_layout = QtWidgets.QHBoxLayout(); controls_layout.addWidget(self.play_btn); controls_layout.addWidget(self.pause_btn); controls_layout.addWidget(self.stop_btn); controls_layout.addWidget(self.speed_combo); controls_layout.addWidget(self.frame_slider, stretch=1); controls_layout.addWidget(self.frame_label)
         left_pane_layout.addLayout(controls_layout); left_pane_layout.addWidget(self.timeline_widget); left_pane_layout.addWidget(self.progress_bar)
         right_pane_widget = QtWidgets.QWidget(); right_pane_widget.setFixedWidth(280); right_pane_layout = QtWidgets.QVBoxLayout(right_pane_widget); right_pane_layout.addWidget(self.legend_group_box)
         grid_config_layout = QtWidgets.QGridLayout(grid_config_group); grid_config_layout.addWidget(QtWidgets.QLabel("Columns:"), 0, 0); grid_config_layout.addWidget(self.grid_cols_spin, 0, 1); grid_config_layout.addWidget(QtWidgets.QLabel("Rows:"), 1, 0); grid_config_layout.addWidget(self.grid_rows_spin, 1, 1); grid_config_layout.addWidget(QtWidgets.QLabel("Line Thickness:"), 2, 0); grid_config_layout.addWidget(self.line_thickness_spin, 2, 1); grid_config_layout.addWidget(QtWidgets.QLabel("Rotation:"), 3, 0); grid_config_layout.addWidget(self.rotate_slider, 3, 1); grid_config_layout.addWidget(QtWidgets.QLabel("Scale X:"), 4, 0); grid_config_layout.addWidget(self.scale_x_slider, 4, 1); grid_config_layout.addWidget(QtWidgets.QLabel("Scale Y:"), 5, 0); grid_config_layout.addWidget(self.scale_y_slider, 5, 1); grid_config_layout.addWidget(QtWidgets.QLabel("Move X:"), 6, 0); grid_config_layout.addWidget(self.move_x_slider, 6, 1); grid_config_layout.addWidget(QtWidgets.QLabel("Move Y:"), 7, 0); grid_config_layout.addWidget(self.move_y_slider, 7, 1); grid_config_layout.addWidget(self.reset_grid_btn, 8, 0, 1, 2)
@@ -136,12 +151,13 @@ class VideoPlayer(QtWidgets.QWidget):
     def setup_connections(self):
         self.inference_btn.clicked.connect(self.open_yolo_dialog); self.segmentation_btn.clicked.connect(self.open_yolo_segmentation_dialog); self.batch_process_btn.clicked.connect(self.open_batch_dialog)
         self.load_video_btn.clicked.connect(self.load_video); self.load_csv_btn.clicked.connect(self.load_detections); self.save_csv_btn.clicked.connect(self.save_detections_with_tanks); self.export_video_btn.clicked.connect(self.export_video); self.save_centroid_csv_btn.clicked.connect(self.save_centroid_csv); self.save_excel_btn.clicked.connect(self.save_to_excel); self.save_settings_btn.clicked.connect(self.save_settings); self.load_settings_btn.clicked.connect(self.load_settings)
-        self.play_btn.clicked.connect(self.start_playback); self.pause_btn.clicked.connect(self.pause_playback); self.stop_btn.clicked.connect(self.stop_playback); self.frame_slider.sliderMoved.connect(self.seek_frame)
+        self.play_btn.clicked.connect(self.start_playback); self.pause_btn.clicked.connect(self.pause_playback); self.stop_btn.clicked.connect(self.stop_playback); self.speed_combo.currentIndexChanged.connect(self.set_playback_speed); self.frame_slider.sliderMoved.connect(self.seek_frame)
         self.grid_cols_spin.valueChanged.connect(self.update_grid_settings); self.grid_rows_spin.valueChanged.connect(self.update_grid_settings); self.line_thickness_spin.valueChanged.connect(self.update_line_thickness); self.reset_grid_btn.clicked.connect(self.reset_grid_transform_and_ui)
         self.rotate_slider.valueChanged.connect(self.update_grid_rotation); self.scale_x_slider.valueChanged.connect(self.update_grid_scale); self.scale_y_slider.valueChanged.connect(self.update_grid_scale); self.move_x_slider.valueChanged.connect(self.update_grid_position); self.move_y_slider.valueChanged.connect(self.update_grid_position)
         self.rotate_slider.sliderReleased.connect(self.start_detection_processing); self.scale_x_slider.sliderReleased.connect(self.start_detection_processing); self.scale_y_slider.sliderReleased.connect(self.start_detection_processing); self.move_x_slider.sliderReleased.connect(self.start_detection_processing); self.move_y_slider.sliderReleased.connect(self.start_detection_processing)
         self.select_all_btn.clicked.connect(self.select_all_tanks); self.clear_selection_btn.clicked.connect(self.clear_tank_selection); self.apply_filter_btn.clicked.connect(self.start_detection_processing)
-        self.grid_manager.transform_updated.connect(self.update_display)
+        self.timeline_widget.frame_clicked.connect(self.seek_frame)
+        self.grid_manager.transform_updated.connect(self.invalidate_grid_layer); self.grid_manager.transform_updated.connect(self.update_display)
         self.video_label.mousePressEvent = self.handle_mouse_press; self.video_label.mouseMoveEvent = self.handle_mouse_move; self.video_label.mouseReleaseEvent = self.handle_mouse_release
         self.analysis_btn.clicked.connect(self.open_analysis_dialog)
         self.video_splitter_btn.clicked.connect(self.open_video_splitter_dialog)
@@ -162,24 +178,50 @@ class VideoPlayer(QtWidgets.QWidget):
         file_path, _ = QtWidgets.QFileDialog.getOpenFileName(self, "Select Detection CSV", "", "CSV Files (*.csv)");
         if file_path:
             try:
-                detections = {};
-                with open(file_path, newline="", encoding='utf-8') as f:
-                    reader = csv.DictReader(f); self.csv_headers = reader.fieldnames[:]
-                    coord_cols = ['x1', 'y1', 'x2', 'y2', 'cx', 'cy', 'conf']
-                    for row in reader:
-                        idx = int(float(row["frame_idx"]))
-                        for col in coord_cols:
-                            if col in row and row[col]:
-                                try: row[col] = float(row[col])
-                                except (ValueError, TypeError): row[col] = None
-                        detections.setdefault(idx, []).append(row)
-                self.raw_detections = detections; self.processed_detections = {}; self.behavior_colors.clear()
-                all_behaviors = sorted(list(set(det['class_name'] for dets in self.raw_detections.values() for det in dets)))
-                for behavior in all_behaviors: self.get_color_for_behavior(behavior)
-                self.update_legend_widget(); self.start_detection_processing(); QtWidgets.QMessageBox.information(self, "Success", f"Loaded {len(detections)} frames of detections.")
+                self.stop_timeline_summary(); self.detection_index, self.detection_window = None, None
+                if os.path.getsize(file_path) >= WINDOWED_DETECTIONS_MIN_BYTES: self.start_frame_index_loading(file_path); return
+                self.load_detections_full(file_path)
+            except Exception as e: self.show_error(f"Error loading detections: {str(e)}")
+
+    def load_detections_full(self, file_path):
+        detections, self.csv_headers = load_detections_csv(file_path)
+        self.raw_detections = detections; self.processed_detections = {}; self.behavior_colors.clear()
+        all_behaviors = sorted(list(set(det['class_name'] for dets in self.raw_detections.values() for det in dets)))
+        for behavior in all_behaviors: self.get_color_for_behavior(behavior)
+        self.update_legend_widget(); self.start_detection_processing(); QtWidgets.QMessageBox.information(self, "Success", f"Loaded {len(detections)} frames of detections.")
+
+    def start_frame_index_loading(self, file_path):
+        # Indexing scans the whole file, so it runs in the background; windowed mode starts once the index is ready
+        self.status_label.setText("Indexing large detection file...")
+        self.frame_index_loader = FrameIndexLoader(file_path)
+        self.frame_index_loader.progress_updated.connect(lambda percent: self.status_label.setText(f"Indexing large detection file... {percent}%")); self.frame_index_loader.index_ready.connect(self.on_frame_index_ready); self.frame_index_loader.error_occurred.connect(self.on_frame_index_error); self.frame_index_loader.finished.connect(self.frame_index_loader.deleteLater); self.frame_index_loader.finished.connect(self.on_frame_index_loader_finished)
+        self.frame_index_loader.start(); self._update_button_states()
+    def on_frame_index_loader_finished(self):
+        if self.sender() is self.frame_index_loader: self.frame_index_loader = None
+        self._update_button_states()
+    def on_frame_index_error(self, error_message):
+        self.status_label.setText(""); self.show_error(error_message)
+
+    def on_frame_index_ready(self, index):
+        self.status_label.setText("")
+        if not index.is_sorted:
+            # Window reads need frames in file order; unsorted files are loaded in full instead
+            try: self.load_detections_full(index.csv_path)
             except Exception as e: self.show_error(f"Error loading detections: {str(e)}")
+            return
+        self.detection_index, self.csv_headers = index, index.headers
+        self.raw_detections = {}; self.processed_detections = {}; self.behavior_colors.clear(); self.update_legend_widget()
+        self.start_detection_processing()
+        QtWidgets.QMessageBox.information(self, "Success", f"Indexed {index.last_frame + 1} frames of detections.\nThis file is large, so detections are loaded around the current frame only. Use Batch Process for full-file exports.")
+
+    def windowed_export_unavailable(self):
+        # Windowed mode only holds the detections around the playhead, so an export from here would silently cover a fraction of the file
+        if not self.detection_index: return False
+        QtWidgets.QMessageBox.information(self, "Export Unavailable", "This detection file is large, so only the frames around the current position are loaded and an export from here would be incomplete.\nUse Batch Process to export enriched CSVs, centroid CSVs, Excel files and annotated videos for the whole file.")
+        return True
 
     def save_detections_with_tanks(self):
+        if self.windowed_export_unavailable(): return
         if not self.processed_detections: self.show_error("Please load and process detections before saving."); return
         file_path, _ = QtWidgets.QFileDialog.getSaveFileName(self, "Save Detections with Tank Info", "detections_with_tanks.csv", "CSV Files (*.csv)")
         if not file_path: return
@@ -200,6 +242,7 @@ class VideoPlayer(QtWidgets.QWidget):
         except Exception as e: self.show_error(f"Failed to save file: {str(e)}")
 
     def save_centroid_csv(self):
+        if self.windowed_export_unavailable(): return
         if not self.processed_detections: self.show_error("Please load and process detections before saving."); return
         default_name = "output_centroids_wide.csv"
         if self.video_loader and self.video_loader.video_path: default_name = f"{os.path.splitext(os.path.basename(self.video_loader.video_path))[0]}_centroids_wide.csv"
@@ -237,6 +280,7 @@ class VideoPlayer(QtWidgets.QWidget):
         dialog = FrameExtractorDialog(self)
         dialog.exec_()
     def save_to_excel(self):
+        if self.windowed_export_unavailable(): return
         if not self.processed_detections: self.show_error("Please load and process detections before exporting to Excel."); return
         default_name = "output_by_tank.xlsx"
         if self.video_loader and self.video_loader.video_path: default_name = f"{os.path.splitext(os.path.basename(self.video_loader.video_path))[0]}_by_tank.xlsx"
@@ -249,52 +293,106 @@ class VideoPlayer(QtWidgets.QWidget):
         else: QtWidgets.QMessageBox.information(self, "Success", f"Data saved successfully to:\n{file_path}")
 
     def export_video(self):
+        if self.windowed_export_unavailable(): return
         if not self.video_loader or not self.video_loader.video_path or not self.processed_detections: self.show_error("Please load a video and detections first."); return
         dialog = QtWidgets.QDialog(self); dialog.setWindowTitle("Export Video Options"); layout = QtWidgets.QVBoxLayout(dialog)
         checkbox = QtWidgets.QCheckBox("Include Overlays (Legend and Timeline)"); checkbox.setChecked(True); layout.addWidget(checkbox)
+        processes_layout = QtWidgets.QHBoxLayout(); processes_spinbox = QtWidgets.QSpinBox(); processes_spinbox.setRange(1, max(1, os.cpu_count() or 1)); processes_spinbox.setValue(1); processes_spinbox.setToolTip("Splits the video at keyframes and renders the parts in parallel processes, then joins them without re-encoding (requires FFmpeg)."); processes_layout.addWidget(QtWidgets.QLabel("Render Processes:")); processes_layout.addWidget(processes_spinbox); layout.addLayout(processes_layout)
+        summary_group = QtWidgets.QGroupBox("Summary (Timelapse) Export"); summary_group.setCheckable(True); summary_group.setChecked(False); summary_group.setToolTip("Writes a short review video: only every Nth frame is decoded and rendered, the timeline still covers the whole recording."); summary_layout = QtWidgets.QFormLayout(summary_group)
+        stride_spinbox = QtWidgets.QSpinBox(); stride_spinbox.setRange(1, 100000); stride_spinbox.setValue(30); summary_layout.addRow("Keep 1 of every N frames:", stride_spinbox)
+        scale_combo = QtWidgets.QComboBox()
+        for scale in (1.0, 0.75, 0.5, 0.25): scale_combo.addItem(f"{int(scale * 100)}%", scale)
+        summary_layout.addRow("Output resolution:", scale_combo)
+        montage_checkbox = QtWidgets.QCheckBox("Tile tanks in a per-tank montage"); summary_layout.addRow(montage_checkbox); layout.addWidget(summary_group)
         button_box = QtWidgets.QDialogButtonBox(QtWidgets.QDialogButtonBox.Ok | QtWidgets.QDialogButtonBox.Cancel); button_box.accepted.connect(dialog.accept); button_box.rejected.connect(dialog.reject); layout.addWidget(button_box)
         if not dialog.exec_() == QtWidgets.QDialog.Accepted: return
-        draw_overlays_option = checkbox.isChecked()
-        default_name = os.path.splitext(os.path.basename(self.video_loader.video_path))[0] + "_annotated.mp4"
+        draw_overlays_option = checkbox.isChecked(); is_summary = summary_group.isChecked()
+        summary_options = {'frame_stride': stride_spinbox.value(), 'output_scale': scale_combo.currentData(), 'montage': montage_checkbox.isChecked()} if is_summary else {}
+        default_name = os.path.splitext(os.path.basename(self.video_loader.video_path))[0] + ("_summary.mp4" if is_summary else "_annotated.mp4")
         file_path, _ = QtWidgets.QFileDialog.getSaveFileName(self, "Save Annotated Video", default_name, "MP4 Video Files (*.mp4);;AVI Video Files (*.avi)")
         if not file_path: return
         self.toggle_controls(False); self.progress_bar.setValue(0); self.progress_bar.setFormat("Exporting video... %p%"); self.progress_bar.setTextVisible(True)
-        self.video_saver = VideoSaver(source_video_path=self.video_loader.video_path, output_video_path=file_path, detections=self.processed_detections, grid_settings=self.grid_settings, grid_transform=self.grid_manager.transform, behavior_colors=self.behavior_colors, video_size=self.video_size, fps=self.video_loader.fps, line_thickness=self.line_thickness, selected_cells=self.selected_cells, timeline_segments=self.timeline_widget.timeline_segments, draw_grid=False, draw_overlays=draw_overlays_option, parent=self)
-        self.video_saver.progress_updated.connect(self.progress_bar.setValue); self.video_saver.finished.connect(self.on_video_export_finished); self.video_saver.error_occurred.connect(self.on_video_export_error); self.video_saver.start()
+        self.video_saver = VideoSaver(source_video_path=self.video_loader.video_path, output_video_path=file_path, detections=self.processed_detections, grid_settings=self.grid_settings, grid_transform=self.grid_manager.transform, behavior_colors=self.behavior_colors, video_size=self.video_size, fps=self.video_loader.fps, line_thickness=self.line_thickness, selected_cells=self.selected_cells, timeline_segments=self.timeline_widget.timeline_segments, draw_grid=False, draw_overlays=draw_overlays_option, export_processes=processes_spinbox.value(), **summary_options, parent=self)
+        self.video_saver.progress_updated.connect(self.progress_bar.setValue); self.video_saver.finished.connect(self.on_video_export_finished); self.video_saver.error_occurred.connect(self.on_video_export_error); self.video_saver.speed_updated.connect(lambda fps: self.progress_bar.setFormat(f"Exporting video... %p% ({fps:.1f} FPS)")); self.video_saver.start()
+
+    def _is_blocking_processing(self):
+        # Window reloads in windowed mode run in the background and must not lock the playback controls
+        if self.frame_index_loader is not None and self.frame_index_loader.isRunning(): return True
+        return self.detection_processor is not None and self.detection_processor.isRunning() and self.detection_index is None
 
     def _update_button_states(self):
-        is_processing = self.detection_processor is not None and self.detection_processor.isRunning()
+        is_processing = self._is_blocking_processing()
         self.load_video_btn.setEnabled(not is_processing); self.load_csv_btn.setEnabled(not is_processing); self.batch_process_btn.setEnabled(not is_processing); self.inference_btn.setEnabled(not is_processing); self.segmentation_btn.setEnabled(not is_processing)
         can_save = self.total_frames > 0 and bool(self.processed_detections) and not is_processing
         self.save_csv_btn.setEnabled(can_save); self.export_video_btn.setEnabled(can_save); self.save_centroid_csv_btn.setEnabled(can_save and PANDAS_AVAILABLE); self.save_excel_btn.setEnabled(can_save and PANDAS_AVAILABLE); self.save_settings_btn.setEnabled(True); self.toggle_controls(not is_processing)
 
+    def _display_scale(self, w, h):
+        """Scale from video pixels to the video label (fit to the label, never above 1), cached per label and frame size."""
+        key = (self.video_label.width(), self.video_label.height(), w, h)
+        if self._display_scale_cache[0] != key: self._display_scale_cache = (key, min(1.0, key[0] / w, key[1] / h))
+        return self._display_scale_cache[1]
+
+    def invalidate_grid_layer(self): self._grid_layer = None
+
+    def _get_grid_layer(self, w, h, dw, dh, scale):
+        """
+        Grid lines, selected-tank outlines and the center marker drawn once at display size, as a BGR
+        image plus a coverage mask. Rebuilt only when the transform changes (invalidate_grid_layer) or
+        the grid size, line thickness, tank selection or display size differ from the cached key.
+        """
+        key = (w, h, dw, dh, self.grid_settings['cols'], self.grid_settings['rows'], self.line_thickness, frozenset(self.selected_cells))
+        if self._grid_layer is not None and self._grid_layer[0] == key: return self._grid_layer[1:]
+        cols, rows = self.grid_settings['cols'], self.grid_settings['rows']; sx, sy = dw / w, dh / h; current_transform = self.grid_manager.transform
+        def transform_point(x, y): p = current_transform.map(QPointF(x, y)); return int(p.x() * sx), int(p.y() * sy)
+        layer, mask = np.zeros((dh, dw, 3), np.uint8), np.zeros((dh, dw), np.uint8); thickness = max(1, int(round(self.line_thickness * scale)))
+        for i in range(cols + 1):
+            p1, p2 = transform_point(w*i/cols, 0), transform_point(w*i/cols, h); cv2.line(layer, p1, p2, (0,255,0), thickness); cv2.line(mask, p1, p2, 255, thickness)
+        for i in range(rows + 1):
+            p1, p2 = transform_point(0, h*i/rows), transform_point(w, h*i/rows); cv2.line(layer, p1, p2, (0,255,0), thickness); cv2.line(mask, p1, p2, 255, thickness)
+        for tank in self.selected_cells:
+            r, c = divmod(int(tank) - 1, cols)
+            if r >= rows: continue
+            cell = np.array([transform_point(w*x/cols, h*y/rows) for x, y in ((c, r), (c + 1, r), (c + 1, r + 1), (c, r + 1))], np.int32)
+            cv2.polylines(layer, [cell], True, (0,255,255), thickness + 1); cv2.polylines(mask, [cell], True, 255, thickness + 1)
+        center = (int(self.grid_manager.center.x() * w * sx), int(self.grid_manager.center.y() * h * sy)); radius = max(3, int(round(8 * scale)))
+        cv2.circle(layer, center, radius, (0, 0, 255), -1); cv2.circle(mask, center, radius, 255, -1)
+        self._grid_layer = (key, layer, mask)
+        return layer, mask
+
     def update_display(self):
         if self.current_frame is None: return
         try:
-            frame = self.current_frame.copy(); overlay = frame.copy(); h, w, _ = frame.shape; current_transform = self.grid_manager.transform
-            def transform_point(x, y): p = current_transform.map(QPointF(x, y)); return int(p.x()), int(p.y())
-            for i in range(self.grid_settings['cols'] + 1): cv2.line(frame, transform_point(w*i/self.grid_settings['cols'],0), transform_point(w*i/self.grid_settings['cols'],h), (0,255,0), self.line_thickness)
-            for i in range(self.grid_settings['rows'] + 1): cv2.line(frame, transform_point(0,h*i/self.grid_settings['rows']), transform_point(w,h*i/self.grid_settings['rows']), (0,255,0), self.line_thickness)
-            center_px = self.grid_manager.center.x() * w, self.grid_manager.center.y() * h; cv2.circle(frame, (int(center_px[0]), int(center_px[1])), 8, (0, 0, 255), -1)
-            has_drawn_mask = False
-            if self.current_frame_idx in self.processed_detections:
-                for det in self.processed_detections[self.current_frame_idx]:
-                    if det.get('tank_number') is not None and (not self.selected_cells or str(det['tank_number']) in self.selected_cells):
-                        color_bgr = self.behavior_colors.get(det["class_name"], (128,128,128))[::-1]; x1, y1 = float(det["x1"]), float(det["y1"])
-                        if 'polygon' in det and det['polygon']:
-                            try:
-                                poly_points = np.array([list(map(int, p.split(','))) for p in det['polygon'].split(';')], dtype=np.int32)
-                                cv2.fillPoly(overlay, [poly_points], color_bgr); has_drawn_mask = True
-                            except: 
-                                x2, y2 = float(det["x2"]), float(det["y2"]); cv2.rectangle(frame, (int(x1), int(y1)), (int(x2), int(y2)), color_bgr, 2)
-                        else:
-                            x2, y2 = float(det["x2"]), float(det["y2"]); cv2.rectangle(frame, (int(x1), int(y1)), (int(x2), int(y2)), color_bgr, 2)
-                        if det.get('cx') is not None and det.get('cy') is not None:
-                            cx_float, cy_float = float(det['cx']), float(det['cy']); cv2.circle(frame, (int(round(cx_float)), int(round(cy_float))), 8, (0, 0, 255), -1)
-                        label = f"{det['tank_number']}"; font_face, f_scale, f_thick = cv2.FONT_HERSHEY_SIMPLEX, 0.7, 2; (t_w, t_h), _ = cv2.getTextSize(label, font_face, f_scale, f_thick)
-                        cv2.rectangle(frame, (int(x1), int(y1) - t_h - 12), (int(x1) + t_w, int(y1)), color_bgr, -1); cv2.putText(frame, label, (int(x1), int(y1) - 7), font_face, f_scale, (0,0,0), f_thick, cv2.LINE_AA)
-            if has_drawn_mask: frame = cv2.addWeighted(overlay, 0.4, frame, 0.6, 0)
-            rgb = cv2.cvtColor(frame, cv2.COLOR_BGR2RGB); qimg = QImage(rgb.data, w, h, w * 3, QImage.Format_RGB888); pixmap = QPixmap.fromImage(qimg).scaled(self.video_label.size(), QtCore.Qt.KeepAspectRatio, QtCore.Qt.SmoothTransformation); self.video_label.setPixmap(pixmap)
+            # The frame is shrunk to the label first and the overlays are drawn there in scaled coordinates,
+            # so a 4K frame costs one INTER_AREA resize instead of full-resolution copies, drawing and scaling.
+            # Only videos smaller than the label are drawn at full resolution and enlarged as a pixmap.
+            # The resized frame is drawn on directly (the loader's frame is read-only and only copied at
+            # native size), the mask layer is copied only when masks are drawn, and the BGR result is
+            # wrapped by the QImage without a colour conversion.
+            h, w = self.current_frame.shape[:2]; scale = self._display_scale(w, h)
+            if scale < 1: dw, dh = max(1, round(w * scale)), max(1, round(h * scale)); frame = cv2.resize(self.current_frame, (dw, dh), interpolation=cv2.INTER_AREA)
+            else: dw, dh = w, h; frame = self.current_frame.copy()
+            visible = [det for det in self.processed_detections.get(self.current_frame_idx, ()) if det.get('tank_number') is not None and (not self.selected_cells or str(det['tank_number']) in self.selected_cells)]
+            sx, sy = dw / w, dh / h; overlay = frame.copy() if any(polygon_points(det) is not None for det in visible) else None
+            grid_layer, grid_mask = self._get_grid_layer(w, h, dw, dh, scale); cv2.copyTo(grid_layer, grid_mask, frame)  # cached grid, composited in one pass
+            def scaled(x, y): return int(x * sx), int(y * sy)
+            def size(value, minimum=1): return max(minimum, int(round(value * scale)))
+            font_face, f_scale, f_thick = cv2.FONT_HERSHEY_SIMPLEX, max(0.35, 0.7 * scale), size(2)
+            for det in visible:
+                color_bgr = self.behavior_colors.get(det["class_name"], (128,128,128))[::-1]; x1, y1 = scaled(float(det["x1"]), float(det["y1"]))
+                poly_points = polygon_points(det)  # parsed once at load time
+                if poly_points is not None:
+                    cv2.fillPoly(overlay, [np.rint(poly_points * (sx, sy)).astype(np.int32)], color_bgr)
+                else:
+                    cv2.rectangle(frame, (x1, y1), scaled(float(det["x2"]), float(det["y2"])), color_bgr, size(2))
+                if det.get('cx') is not None and det.get('cy') is not None:
+                    cv2.circle(frame, (int(round(float(det['cx']) * sx)), int(round(float(det['cy']) * sy))), size(8, 3), (0, 0, 255), -1)
+                label = f"{det['tank_number']}"; (t_w, t_h), _ = cv2.getTextSize(label, font_face, f_scale, f_thick)
+                cv2.rectangle(frame, (x1, y1 - t_h - size(12, 4)), (x1 + t_w, y1), color_bgr, -1); cv2.putText(frame, label, (x1, y1 - size(7, 2)), font_face, f_scale, (0,0,0), f_thick, cv2.LINE_AA)
+            if overlay is not None: cv2.addWeighted(overlay, 0.4, frame, 0.6, 0, dst=frame)
+            self._presented_frame = frame  # the QImage borrows this buffer; keep it alive past the pixmap conversion
+            pixmap = QPixmap.fromImage(QImage(frame.data, dw, dh, frame.strides[0], QImage.Format_BGR888))
+            if scale >= 1: pixmap = pixmap.scaled(self.video_label.size(), QtCore.Qt.KeepAspectRatio, QtCore.Qt.SmoothTransformation)
+            self.video_label.setPixmap(pixmap)
         except Exception as e: print(f"Error updating display: {e}")
 
     def get_color_for_behavior(self, behavior_name):
@@ -316,43 +414,85 @@ class VideoPlayer(QtWidgets.QWidget):
         if self.video_loader: self.video_loader.set_playing(False)
     def stop_playback(self):
         if self.video_loader: self.video_loader.set_playing(False); self.video_loader.seek(0)
+    def set_playback_speed(self):
+        if self.video_loader: self.video_loader.set_speed(self.speed_combo.currentData())
     def seek_frame(self, pos):
         if self.video_loader: self.video_loader.set_playing(False); self.video_loader.seek(pos)
     def reset_playback(self):
         if self.video_loader: self.video_loader.stop()
         self.current_frame, self.current_frame_idx, self.total_frames = None, 0, 0; self.frame_slider.setValue(0); self.frame_slider.setEnabled(False); self.frame_label.setText("Frame: 0/0"); self.progress_bar.setValue(0); self.video_label.clear(); self.behavior_colors.clear(); self.raw_detections.clear(); self.processed_detections.clear()
+        self.stop_timeline_summary(); self.detection_index, self.detection_window = None, None
         self.update_legend_widget();
-        if self.timeline_widget: self.timeline_widget.setData({}, {}, 0, 0)
+        if self.timeline_widget: self.timeline_widget.setData(BehaviorTimeline(), {}, 0, 0)
         self._update_button_states()
     def load_video(self):
         file_path, _ = QtWidgets.QFileDialog.getOpenFileName(self, "Select Video File", "", "Video Files (*.mp4 *.avi *.mov *.mkv);;All Files (*)");
         if file_path:
-            self.reset_playback(); self.video_loader = VideoLoader(file_path)
+            self.reset_playback(); self.video_loader = (SharedMemoryVideoLoader if DECODER_PROCESS_ENABLED else VideoLoader)(file_path); self.video_loader.set_speed(self.speed_combo.currentData())
             self.video_loader.video_loaded.connect(self.on_video_loaded); self.video_loader.frame_loaded.connect(self.on_frame_loaded); self.video_loader.error_occurred.connect(self.show_error); self.video_loader.finished.connect(self.video_loader.deleteLater)
             self.video_loader.start(); self.progress_bar.setRange(0, 0); self.video_label.setText("Loading video...")
     def on_video_loaded(self, width, height, fps):
         self.video_size = (width, height); self.total_frames = self.video_loader.total_frames; self.frame_slider.setRange(0, self.total_frames - 1); self.frame_slider.setEnabled(True)
         self.frame_label.setText(f"Frame: 0/{self.total_frames - 1}"); self.progress_bar.setRange(0, 100); self.grid_manager.set_video_size(width, height); self._update_button_states()
         self.video_loader.seek(0)
-        if self.raw_detections: self.start_detection_processing()
+        if self.raw_detections or self.detection_index: self.start_detection_processing()
     def on_frame_loaded(self, frame_idx, frame):
         self.current_frame_idx, self.current_frame = frame_idx, frame; self.update_display(); self.frame_slider.blockSignals(True); self.frame_slider.setValue(frame_idx); self.frame_slider.blockSignals(False)
         self.frame_label.setText(f"Frame: {frame_idx}/{self.total_frames - 1}")
         if self.total_frames > 0 and self.progress_bar.value() != int((frame_idx + 1) * 100 / self.total_frames): self.progress_bar.setValue(int((frame_idx + 1) * 100 / self.total_frames))
         if self.timeline_widget: self.timeline_widget.setCurrentFrame(frame_idx)
+        if self.sender() is self.video_loader: self.video_loader.frame_displayed()  # lets the loader pace against what is actually shown
+        if self.detection_index and self._needs_new_window(frame_idx) and not (self.detection_processor and self.detection_processor.isRunning()): self.start_window_processing()
+    def _needs_new_window(self, frame_idx):
+        if self.detection_window is None: return self.pending_window is None or not (self.pending_window[0] <= frame_idx <= self.pending_window[1])
+        start, end = self.detection_window
+        return (frame_idx < start + DETECTION_WINDOW_MARGIN and start > 0) or (frame_idx > end - DETECTION_WINDOW_MARGIN and end < self.detection_index.last_frame)
     def start_detection_processing(self):
-        if not self.raw_detections or self.video_size[0] == 0: return
+        if (not self.raw_detections and not self.detection_index) or self.video_size[0] == 0: return
+        if self.detection_index:
+            self.start_window_processing(); self.start_timeline_summary(); return
         if self.detection_processor and self.detection_processor.isRunning(): self.detection_processor.stop(); self.detection_processor.wait()
         self.status_label.setText("Processing detections...")
         self.detection_processor = DetectionProcessor(self.raw_detections, self.grid_manager.transform, self.grid_settings, self.video_size, self.max_animals_spinbox.value())
+        self._start_detection_processor()
+    def start_window_processing(self):
+        if self.detection_processor and self.detection_processor.isRunning(): self.detection_processor.stop(); self.detection_processor.wait()
+        half = DETECTION_WINDOW_FRAMES // 2; start = max(0, self.current_frame_idx - half)
+        self.pending_window = (start, start + DETECTION_WINDOW_FRAMES - 1)
+        self.detection_processor = DetectionProcessor(None, self.grid_manager.transform, self.grid_settings, self.video_size, self.max_animals_spinbox.value(), frame_index=self.detection_index, frame_range=self.pending_window)
+        self._start_detection_processor()
+    def _start_detection_processor(self):
         self.detection_processor.processing_finished.connect(self.on_processing_complete); self.detection_processor.error_occurred.connect(self.on_processing_error); self.detection_processor.finished.connect(self.detection_processor.deleteLater); self.detection_processor.finished.connect(self.on_processor_thread_finished)
         self.detection_processor.start(); self._update_button_states()
     def on_processor_thread_finished(self):
-        self.detection_processor = None; self._update_button_states()
+        if self.sender() is self.detection_processor: self.detection_processor = None
+        self._update_button_states()
+    def start_timeline_summary(self):
+        self.stop_timeline_summary()
+        self.summary_processor = TimelineSummaryProcessor(self.detection_index, self.grid_manager.transform, self.grid_settings, self.video_size, self.max_animals_spinbox.value(), self.total_frames)
+        self.summary_processor.summary_ready.connect(self.on_timeline_summary_ready); self.summary_processor.error_occurred.connect(self.on_processing_error); self.summary_processor.finished.connect(self.summary_processor.deleteLater); self.summary_processor.finished.connect(self.on_summary_thread_finished)
+        self.status_label.setText("Summarising detections for the timeline..."); self.summary_processor.start()
+    def stop_timeline_summary(self):
+        # Not waited for: the stale thread stops at its next chunk, and its results are no longer connected
+        if self.summary_processor and self.summary_processor.isRunning():
+            self.summary_processor.stop(); self.summary_processor.summary_ready.disconnect(); self.summary_processor.error_occurred.disconnect(); self.stale_summary_processors.append(self.summary_processor)
+        self.summary_processor = None
+    def on_summary_thread_finished(self):
+        if self.sender() is self.summary_processor: self.summary_processor = None
+        self.stale_summary_processors = [worker for worker in self.stale_summary_processors if worker is not self.sender()]
+    def on_timeline_summary_ready(self, timeline):
+        for behavior in timeline.names: self.get_color_for_behavior(behavior)
+        self.update_legend_widget(); self.status_label.setText("")
+        if self.timeline_widget: self.timeline_widget.setData(timeline, self.behavior_colors, self.total_frames, self.grid_settings['cols'] * self.grid_settings['rows'])
     def on_processing_complete(self, processed_detections, timeline_segments):
         self.processed_detections = processed_detections
-        if self.timeline_widget: self.timeline_widget.setData(timeline_segments, self.behavior_colors, self.total_frames, self.grid_settings['cols'] * self.grid_settings['rows'])
-        self.status_label.setText(""); self._update_button_states(); self.update_display()
+        if self.detection_index:
+            self.detection_window = self.pending_window; known_behaviors = len(self.behavior_colors)
+            for behavior in sorted({det['class_name'] for dets in processed_detections.values() for det in dets}): self.get_color_for_behavior(behavior)
+            if len(self.behavior_colors) != known_behaviors: self.update_legend_widget()
+        elif self.timeline_widget: self.timeline_widget.setData(timeline_segments, self.behavior_colors, self.total_frames, self.grid_settings['cols'] * self.grid_settings['rows'])
+        if not (self.summary_processor and self.summary_processor.isRunning()): self.status_label.setText("")
+        self._update_button_states(); self.update_display()
     def on_processing_error(self, message):
         self.status_label.setText(""); self.show_error(message); self._update_button_states()
     def on_video_export_finished(self):
@@ -446,12 +586,12 @@ class VideoPlayer(QtWidgets.QWidget):
         widgets = [self.grid_cols_spin, self.grid_rows_spin, self.line_thickness_spin, self.rotate_slider, self.scale_x_slider, self.scale_y_slider, self.move_x_slider, self.move_y_slider, self.reset_grid_btn]
         for widget in widgets: widget.blockSignals(should_block)
     def toggle_controls(self, enabled):
-        final_state = enabled and not (self.detection_processor and self.detection_processor.isRunning())
-        self.play_btn.setEnabled(final_state); self.pause_btn.setEnabled(final_state); self.stop_btn.setEnabled(final_state)
+        final_state = enabled and not self._is_blocking_processing()
+        self.play_btn.setEnabled(final_state); self.pause_btn.setEnabled(final_state); self.stop_btn.setEnabled(final_state); self.speed_combo.setEnabled(final_state)
         self.frame_slider.setEnabled(final_state and self.total_frames > 0)
     def show_error(self, message):
         QtWidgets.QMessageBox.critical(self, "Error", message)
     def closeEvent(self, event):
-        for worker in [self.video_loader, self.video_saver, self.detection_processor]:
+        for worker in [self.video_loader, self.video_saver, self.detection_processor, self.summary_processor, self.frame_index_loader, *self.stale_summary_processors]:
             if worker: worker.stop(); worker.wait()
         event.accept()
\ No newline at end of file
@@ -0,0 +1,63 @@
+# EthoGrid_App/tests/test_detection_cache.py
+
+import csv
+import pytest
+
+from core import detection_cache
+from core.csv_frame_index import load_frame_index
+
+pd = pytest.importorskip("pandas")
+
+CSV_TEXT = (
+    "frame_idx,class_name,conf,x1,y1,x2,y2,cx,cy,tank_number,track_id,note,polygon\n"
+    "0,1,0.5,10,20,30,40,,,1,7,,\"1,2;3,4;5,6\"\n"
+    "0,walk,0.9,11,21,31,41,21.5,31,2,8,NA,\n"
+    "1,2,,12,22,32,42,22,32,,9,late,\"7,8;9,10;11,12\"\n"
+    "2,walk,0.7,13,23,33,43,23,33,1,10,x,\n"
+)
+# frame_idx written as floats and a coordinate column with an unparsable value
+FLOAT_FRAMES_CSV_TEXT = CSV_TEXT.replace("\n0,", "\n0.0,").replace("\n2,walk,0.7,13,", "\n2.0,walk,0.7,n/a,")
+
+@pytest.fixture(params=[CSV_TEXT, FLOAT_FRAMES_CSV_TEXT], ids=["int_frames", "float_frames"])
+def detection_csv(tmp_path, request):
+    detection_cache.configure_cache(cache_dir=str(tmp_path / "cache"))
+    path = tmp_path / "detections.csv"; path.write_text(request.param, encoding="utf-8")
+    yield str(path)
+    detection_cache.configure_cache()
+
+def _dict_reader_load(csv_path):
+    """The row-dict load the cache replaces."""
+    detections = {}
+    with open(csv_path, newline="", encoding='utf-8') as f:
+        for row in csv.DictReader(f):
+            idx = int(float(row["frame_idx"]))
+            for col in detection_cache.COORD_COLS:
+                if col in row and row[col]:
+                    try: row[col] = float(row[col])
+                    except (ValueError, TypeError): row[col] = None
+            detections.setdefault(idx, []).append(row)
+    return detections
+
+def _without_parsed_polygons(detections):
+    return {frame: [{k: v for k, v in det.items() if k != 'polygon_points'} for det in dets] for frame, dets in detections.items()}
+
+@pytest.mark.parametrize("use_cache", [False, True])
+def test_dataframe_matches_read_csv(detection_csv, use_cache):
+    expected = pd.read_csv(detection_csv)
+    for _ in range(2):  # the second load reads the sidecar
+        df = detection_cache.load_detection_dataframe(detection_csv, use_cache=use_cache)
+        assert list(df.columns) == list(expected.columns)
+        assert df.dtypes.to_dict() == expected.dtypes.to_dict()
+        pd.testing.assert_frame_equal(df, expected)
+
+@pytest.mark.parametrize("use_cache", [False, True])
+def test_rows_match_dict_reader(detection_csv, use_cache):
+    expected = _dict_reader_load(detection_csv)
+    for _ in range(2):
+        detections, headers = detection_cache.load_detections_csv(detection_csv, use_cache=use_cache)
+        assert headers == list(expected[0][0].keys())
+        assert _without_parsed_polygons(detections) == expected
+    assert isinstance(detections[0][0]['frame_idx'], str) and detections[0][0]['class_name'] == "1" and detections[0][0]['cx'] == ''
+
+def test_frame_index_rows_match_dict_reader(detection_csv):
+    assert _without_parsed_polygons(load_frame_index(detection_csv).read_range(0, 2)) == _dict_reader_load(detection_csv)
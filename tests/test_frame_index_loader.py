@@ -0,0 +1,48 @@
+# EthoGrid_App/tests/test_frame_index_loader.py
+
+import time
+import pytest
+from PyQt5 import QtCore, QtWidgets
+
+from core import detection_cache, csv_frame_index
+from workers.frame_index_loader import FrameIndexLoader
+
+ROWS = 200000
+
+@pytest.fixture
+def large_csv(tmp_path, monkeypatch):
+    detection_cache.configure_cache(cache_dir=str(tmp_path / "cache"))
+    monkeypatch.setattr(csv_frame_index, "PROGRESS_INTERVAL_BYTES", 64 * 1024)
+    path = tmp_path / "detections.csv"
+    with open(path, "w", encoding="utf-8") as f:
+        f.write("frame_idx,class_name,conf,x1,y1,x2,y2\n")
+        for i in range(ROWS): f.write(f"{i // 4},walk,0.9,10,20,30,40\n")
+    yield str(path)
+    detection_cache.configure_cache()
+
+@pytest.fixture(scope="module")
+def app():
+    return QtWidgets.QApplication.instance() or QtWidgets.QApplication([])
+
+def test_index_build_does_not_block_event_loop(app, large_csv):
+    loader = FrameIndexLoader(large_csv); events = {'ticks_while_indexing': 0, 'progress': [], 'index': None}
+    timer = QtCore.QTimer(); timer.setInterval(5)
+    timer.timeout.connect(lambda: events.__setitem__('ticks_while_indexing', events['ticks_while_indexing'] + (events['index'] is None and loader.isRunning())))
+    loader.progress_updated.connect(events['progress'].append); loader.index_ready.connect(lambda index: events.__setitem__('index', index))
+    timer.start(); loader.start()
+    deadline = time.monotonic() + 60
+    while (loader.isRunning() or events['index'] is None) and time.monotonic() < deadline:
+        app.processEvents(QtCore.QEventLoop.AllEvents, 20)
+    timer.stop(); loader.wait()
+    assert events['index'] is not None
+    # The GUI thread kept handling timer events and queued progress updates while the CSV was scanned
+    assert events['ticks_while_indexing'] > 0
+    assert len(events['progress']) > 1 and events['progress'][-1] == 100
+    expected = csv_frame_index.build_frame_index(large_csv)
+    assert (events['index'].block_offsets == expected.block_offsets).all() and events['index'].last_frame == ROWS // 4 - 1
+
+def test_stopped_loader_emits_nothing(app, large_csv):
+    loader = FrameIndexLoader(large_csv); results = []
+    loader.index_ready.connect(results.append); loader.error_occurred.connect(results.append)
+    loader.stop(); loader.start(); loader.wait(); app.processEvents()
+    assert results == []
@@ -19,7 +19,7 @@ class AnalysisDialog(BaseDialog):
         self.csv_files, self.analysis_thread, self.analysis_worker = [], None, None
         self.grid_settings, self.grid_transform, self.video_size = {}, None, (0,0)
         self.geometric_centers, self.adjusted_centers, self.tank_corners = {}, {}, {}
-        self.side_view_tank_configs = {}
+        self.side_view_tank_configs = {}; self.sample_frame = (None, None)  # (video path, QImage of its first frame)
         
         main_layout = QtWidgets.QVBoxLayout(self)
         top_splitter = QtWidgets.QSplitter(QtCore.Qt.Horizontal)
@@ -201,9 +201,11 @@ class AnalysisDialog(BaseDialog):
         video_path = self.video_line_edit.text()
         if not video_path or not os.path.exists(video_path) or not self.grid_transform:
             self.video_display.setText("Load a sample video and settings file to see the grid"); return
-        cap = cv2.VideoCapture(video_path); ret, frame = cap.read(); cap.release()
-        if not ret: return
-        pixmap = QPixmap.fromImage(QImage(frame.data, frame.shape[1], frame.shape[0], QImage.Format_BGR888)); painter = QPainter(pixmap)
+        if self.sample_frame[0] != video_path:  # decoded once per video, not on every slider move
+            cap = cv2.VideoCapture(video_path); ret, frame = cap.read(); cap.release()
+            if not ret: return
+            self.sample_frame = (video_path, QImage(frame.data, frame.shape[1], frame.shape[0], frame.strides[0], QImage.Format_BGR888).copy())
+        pixmap = QPixmap.fromImage(self.sample_frame[1]); painter = QPainter(pixmap)
         rows, cols = self.grid_settings['rows'], self.grid_settings['cols']; w, h = self.video_size
         painter.setPen(QPen(QColor(0, 255, 0, 150), 2))
         for r in range(rows + 1): p1 = self.grid_transform.map(QPointF(0, r * h / rows)); p2 = self.grid_transform.map(QPointF(w, r * h / rows)); painter.drawLine(p1, p2)
@@ -5,6 +5,7 @@ from PyQt5 import QtWidgets, QtCore
 from PyQt5.QtCore import QThread
 from workers.batch_processor import BatchProcessor
 from widgets.base_dialog import BaseDialog 
+from core.video_probe import prefetch_video_info
 
 class BatchProcessDialog(BaseDialog):
     def __init__(self, parent=None):
@@ -12,6 +13,7 @@ class BatchProcessDialog(BaseDialog):
         self.setWindowTitle("Batch Processing (Grid Annotation)")
         self.setMinimumSize(700, 650)
         self.video_files, self.batch_thread, self.batch_worker = [], None, None
+        self.lane_labels, self.lane_bars = [], []
         self.setStyleSheet(""" QDoubleSpinBox { padding: 4px; min-height: 20px; } QSpinBox { padding: 4px; min-height: 20px; } """)
         
         main_options_widget = QtWidgets.QWidget()
@@ -26,6 +28,9 @@ class BatchProcessDialog(BaseDialog):
         
         self.max_animals_spinbox = QtWidgets.QSpinBox(); self.max_animals_spinbox.setToolTip("Enforce a maximum number of animals per tank."); self.max_animals_spinbox.setRange(1, 10); self.max_animals_spinbox.setValue(1)
         self.frame_sample_rate_spinbox = QtWidgets.QSpinBox(); self.frame_sample_rate_spinbox.setToolTip("Use data from every Nth frame for trajectories and heatmaps (e.g., 30 = 1 point per second for a 30 FPS video)."); self.frame_sample_rate_spinbox.setRange(1, 10000); self.frame_sample_rate_spinbox.setValue(30)
+        self.workers_spinbox = QtWidgets.QSpinBox(); self.workers_spinbox.setToolTip("Number of videos processed at the same time, each in its own process."); self.workers_spinbox.setRange(1, max(1, os.cpu_count() or 1)); self.workers_spinbox.setValue(1)
+        self.video_processes_spinbox = QtWidgets.QSpinBox(); self.video_processes_spinbox.setToolTip("Splits each annotated video at keyframes and renders the parts in parallel processes, then joins them without re-encoding.\nRequires FFmpeg; only used when one video is processed at a time."); self.video_processes_spinbox.setRange(1, max(1, os.cpu_count() or 1)); self.video_processes_spinbox.setValue(1)
+        self.incremental_checkbox = QtWidgets.QCheckBox("Skip outputs that are already up to date"); self.incremental_checkbox.setToolTip("Uses the manifest in the output folder to regenerate only outputs whose video, CSV, settings or options changed."); self.incremental_checkbox.setChecked(True)
         self.time_gap_spinbox = QtWidgets.QDoubleSpinBox(); self.time_gap_spinbox.setToolTip("Max time gap in seconds for trajectories."); self.time_gap_spinbox.setRange(0.1, 99999.0); self.time_gap_spinbox.setValue(1.0); self.time_gap_spinbox.setSingleStep(0.1)
         
         self.save_video_checkbox = QtWidgets.QCheckBox("Save Annotated Video"); self.save_video_checkbox.setChecked(True)
@@ -52,6 +57,9 @@ class BatchProcessDialog(BaseDialog):
         processing_options_group = QtWidgets.QGroupBox("Processing Options"); processing_layout = QtWidgets.QFormLayout(processing_options_group)
         processing_layout.addRow("Max Animals per Tank:", self.max_animals_spinbox)
         processing_layout.addRow("Image Sample Rate (every Nth frame):", self.frame_sample_rate_spinbox)
+        processing_layout.addRow("Parallel Workers (videos at once):", self.workers_spinbox)
+        processing_layout.addRow("Processes per Annotated Video:", self.video_processes_spinbox)
+        processing_layout.addRow(self.incremental_checkbox)
         form_layout.addWidget(processing_options_group, 8, 0, 1, 3)
 
         output_options_group = QtWidgets.QGroupBox("Output Options"); output_options_layout = QtWidgets.QVBoxLayout(output_options_group)
@@ -67,7 +75,8 @@ class BatchProcessDialog(BaseDialog):
         progress_group = QtWidgets.QGroupBox("Progress"); progress_layout = QtWidgets.QVBoxLayout(progress_group)
         progress_layout.addWidget(self.overall_progress_label); progress_layout.addWidget(self.overall_progress_bar)
         file_progress_layout = QtWidgets.QHBoxLayout(); file_progress_layout.addWidget(QtWidgets.QLabel("Current File Progress:")); file_progress_layout.addWidget(self.file_progress_label); file_progress_layout.addStretch(); file_progress_layout.addWidget(self.speed_label); file_progress_layout.addWidget(self.elapsed_time_label); file_progress_layout.addWidget(self.etr_label)
-        progress_layout.addLayout(file_progress_layout); progress_layout.addWidget(self.file_progress_bar); main_dialog_layout.addWidget(progress_group)
+        progress_layout.addLayout(file_progress_layout); progress_layout.addWidget(self.file_progress_bar)
+        self.lanes_layout = QtWidgets.QGridLayout(); progress_layout.addLayout(self.lanes_layout); main_dialog_layout.addWidget(progress_group)
         log_group = QtWidgets.QGroupBox("Log"); log_layout = QtWidgets.QVBoxLayout(log_group); log_layout.addWidget(self.log_text_edit)
         main_dialog_layout.addWidget(log_group)
         button_layout = QtWidgets.QHBoxLayout(); button_layout.addStretch(); button_layout.addWidget(self.cancel_btn); button_layout.addWidget(self.start_btn)
@@ -89,7 +98,7 @@ class BatchProcessDialog(BaseDialog):
             newly_added = []
             for f in files:
                 if f not in self.video_files: self.video_files.append(f); newly_added.append(os.path.basename(f))
-            if newly_added: self.video_list_widget.addItems(newly_added)
+            if newly_added: self.video_list_widget.addItems(newly_added); prefetch_video_info(self.video_files[-len(newly_added):])
     def add_directory(self):
         directory = QtWidgets.QFileDialog.getExistingDirectory(self, "Select Directory Containing Videos")
         if directory:
@@ -99,7 +108,7 @@ class BatchProcessDialog(BaseDialog):
                     if file.lower().endswith(video_extensions):
                         full_path = os.path.join(root, file)
                         if full_path not in self.video_files: self.video_files.append(full_path); newly_found.append(os.path.basename(full_path))
-            if newly_found: self.video_list_widget.addItems(newly_found)
+            if newly_found: self.video_list_widget.addItems(newly_found); prefetch_video_info(self.video_files[-len(newly_found):])
             else: QtWidgets.QMessageBox.information(self, "No New Videos Found", f"No new video files were found in:\n{directory}")
     def remove_selected(self):
         selected_items = self.video_list_widget.selectedItems()
@@ -125,6 +134,8 @@ class BatchProcessDialog(BaseDialog):
         if not any([self.save_video_checkbox.isChecked(), self.save_csv_checkbox.isChecked(), self.save_centroid_csv_checkbox.isChecked(), self.save_excel_checkbox.isChecked(), self.save_trajectory_img_checkbox.isChecked(), self.save_heatmap_img_checkbox.isChecked()]):
             QtWidgets.QMessageBox.warning(self, "Input Error", "Please select at least one output option."); return
         self.toggle_controls(False); self.log_text_edit.clear()
+        num_workers = min(self.workers_spinbox.value(), len(self.video_files)); self.setup_lanes(num_workers if num_workers > 1 else 0)
+        self.file_progress_label.setText("Videos: 0 / 0" if num_workers > 1 else "Frame: 0 / 0")
         self.batch_worker = BatchProcessor(
             self.video_files, self.settings_line_edit.text(), self.output_dir_line_edit.text(),
             csv_dir=self.csv_dir_line_edit.text(),
@@ -137,10 +148,13 @@ class BatchProcessDialog(BaseDialog):
             save_trajectory_img=self.save_trajectory_img_checkbox.isChecked(),
             save_heatmap_img=self.save_heatmap_img_checkbox.isChecked(),
             time_gap_seconds=self.time_gap_spinbox.value(),
-            draw_overlays=self.show_overlays_checkbox.isChecked()
+            draw_overlays=self.show_overlays_checkbox.isChecked(),
+            num_workers=num_workers,
+            incremental=self.incremental_checkbox.isChecked(),
+            video_processes=self.video_processes_spinbox.value()
         )
         self.batch_thread = QThread(); self.batch_worker.moveToThread(self.batch_thread)
-        self.batch_worker.overall_progress.connect(self.update_overall_progress); self.batch_worker.file_progress.connect(self.update_file_progress); self.batch_worker.log_message.connect(self.log_text_edit.append); self.batch_worker.finished.connect(self.on_processing_finished); self.batch_worker.time_updated.connect(self.update_time_labels); self.batch_worker.speed_updated.connect(self.update_speed_label); self.batch_thread.started.connect(self.batch_worker.run)
+        self.batch_worker.overall_progress.connect(self.update_overall_progress); self.batch_worker.file_progress.connect(self.update_file_progress); self.batch_worker.log_message.connect(self.log_text_edit.append); self.batch_worker.finished.connect(self.on_processing_finished); self.batch_worker.time_updated.connect(self.update_time_labels); self.batch_worker.speed_updated.connect(self.update_speed_label); self.batch_worker.lane_progress.connect(self.update_lane_progress); self.batch_thread.started.connect(self.batch_worker.run)
         self.batch_thread.start()
     def cancel_processing(self):
         if self.batch_worker: self.batch_worker.stop(); self.cancel_btn.setEnabled(False)
@@ -150,15 +164,25 @@ class BatchProcessDialog(BaseDialog):
         if self.batch_worker and self.batch_worker.is_running: QtWidgets.QMessageBox.information(self, "Finished", "Batch processing has completed.")
     def update_overall_progress(self, current_num, total, filename):
         self.overall_progress_bar.setValue(int(current_num * 100 / total)); self.overall_progress_label.setText(f"Processing file {current_num} of {total}: {filename}")
+        if self.lane_bars: return
         self.file_progress_bar.setValue(0); self.file_progress_label.setText("Frame: 0 / 0"); self.elapsed_time_label.setText("Elapsed: 00:00:00"); self.etr_label.setText("ETR: --:--:--"); self.speed_label.setText("Speed: 0.00 FPS")
     def update_file_progress(self, percentage, current_frame, total_frames):
-        self.file_progress_bar.setValue(percentage); self.file_progress_label.setText(f"Frame: {current_frame} / {total_frames}")
+        self.file_progress_bar.setValue(percentage); self.file_progress_label.setText(f"{'Videos' if self.lane_bars else 'Frame'}: {current_frame} / {total_frames}")
+    def setup_lanes(self, count):
+        for widget in self.lane_labels + self.lane_bars: self.lanes_layout.removeWidget(widget); widget.deleteLater()
+        self.lane_labels, self.lane_bars = [], []
+        for lane in range(count):
+            label = QtWidgets.QLabel(f"Worker {lane + 1}: idle"); bar = QtWidgets.QProgressBar()
+            self.lanes_layout.addWidget(label, lane, 0); self.lanes_layout.addWidget(bar, lane, 1); self.lane_labels.append(label); self.lane_bars.append(bar)
+    def update_lane_progress(self, lane, percentage, status):
+        if lane >= len(self.lane_bars): return
+        self.lane_bars[lane].setValue(percentage); self.lane_labels[lane].setText(f"Worker {lane + 1}: {status}")
     def update_time_labels(self, elapsed, etr):
         self.elapsed_time_label.setText(f"Elapsed: {elapsed}"); self.etr_label.setText(f"ETR: {etr}")
     def update_speed_label(self, fps):
         self.speed_label.setText(f"Speed: {fps:.2f} FPS")
     def toggle_controls(self, enabled):
-        self.start_btn.setEnabled(enabled); self.add_videos_btn.setEnabled(enabled); self.browse_settings_btn.setEnabled(enabled); self.browse_output_btn.setEnabled(enabled); self.browse_csv_dir_btn.setEnabled(enabled); self.add_directory_btn.setEnabled(enabled); self.remove_video_btn.setEnabled(enabled); self.clear_videos_btn.setEnabled(enabled)
+        self.start_btn.setEnabled(enabled); self.add_videos_btn.setEnabled(enabled); self.browse_settings_btn.setEnabled(enabled); self.browse_output_btn.setEnabled(enabled); self.browse_csv_dir_btn.setEnabled(enabled); self.add_directory_btn.setEnabled(enabled); self.remove_video_btn.setEnabled(enabled); self.clear_videos_btn.setEnabled(enabled); self.workers_spinbox.setEnabled(enabled); self.video_processes_spinbox.setEnabled(enabled)
         self.cancel_btn.setEnabled(not enabled)
     def closeEvent(self, event):
         if self.batch_thread and self.batch_thread.isRunning():
@@ -5,6 +5,7 @@ from PyQt5 import QtWidgets, QtCore
 from PyQt5.QtCore import QThread
 from workers.frame_extractor import FrameExtractor
 from widgets.base_dialog import BaseDialog 
+from core.video_probe import prefetch_video_info
 
 class FrameExtractorDialog(BaseDialog):
     def __init__(self, parent=None):
@@ -64,7 +65,7 @@ class FrameExtractorDialog(BaseDialog):
             newly_added = []
             for f in files:
                 if f not in self.video_files: self.video_files.append(f); newly_added.append(os.path.basename(f))
-            if newly_added: self.video_list_widget.addItems(newly_added)
+            if newly_added: self.video_list_widget.addItems(newly_added); prefetch_video_info(self.video_files[-len(newly_added):])
 
     def add_directory(self):
         directory = QtWidgets.QFileDialog.getExistingDirectory(self, "Select Directory Containing Videos")
@@ -76,7 +77,7 @@ class FrameExtractorDialog(BaseDialog):
                     if file.lower().endswith(video_extensions):
                         full_path = os.path.join(root, file)
                         if full_path not in self.video_files: self.video_files.append(full_path); newly_found.append(os.path.basename(full_path))
-            if newly_found: self.video_list_widget.addItems(newly_found)
+            if newly_found: self.video_list_widget.addItems(newly_found); prefetch_video_info(self.video_files[-len(newly_found):])
             else: QtWidgets.QMessageBox.information(self, "No New Videos Found", f"No new video files were found in:\n{directory}")
 
     def remove_selected(self):
@@ -1,48 +1,143 @@
 # EthoGrid_App/widgets/timeline_widget.py
 
+import numpy as np
 from PyQt5 import QtWidgets, QtGui, QtCore
 
+from core.detection_ops import BehaviorTimeline
+from core.timeline_pyramid import TimelinePyramid
+
 class TimelineWidget(QtWidgets.QWidget):
     """
     A custom widget to display behavior timelines for multiple tanks.
+
+    The tank bars and labels are rendered once into a cached QPixmap, rebuilt only when the data,
+    the colors, the view or the widget size change. Moving the playback cursor repaints just the
+    strips under its old and new positions.
+
+    Bars are drawn per pixel from a TimelinePyramid: each pixel shows the dominant behavior of its
+    frames, fading towards the background as fewer of them have a detection. The mouse wheel zooms
+    around the pointer, dragging pans, double-clicking shows the whole video and clicking emits
+    frame_clicked with the frame under the pointer.
     """
+    frame_clicked = QtCore.pyqtSignal(int)
+    CURSOR_MARGIN = 3  # pixels repainted on either side of the cursor line
+    MIN_VIEW_FRAMES = 50  # deepest zoom
+    ZOOM_STEP = 1.25  # view span factor per wheel notch
+    DRAG_THRESHOLD = 3  # pixels the pointer must move before a press becomes a pan instead of a click
+
     def __init__(self, parent=None):
         super().__init__(parent)
         self.setMinimumHeight(80)
-        self.timeline_segments = {}
+        self.timeline_segments = BehaviorTimeline()
         self.behavior_colors = {}
         self.total_frames = 0
         self.current_frame = 0
         self.num_tanks = 0
+        self._bars_cache = None  # (cache key, QPixmap of the bars and labels)
+        self.pyramid = None; self.view_start, self.view_end = 0.0, 0.0  # an empty view shows the whole video
+        self._drag = None  # (press x, view start, view end, panned) while the left button is down
 
     def setData(self, timeline_segments, behavior_colors, total_frames, num_tanks):
         self.timeline_segments = timeline_segments
         self.behavior_colors = behavior_colors
+        if total_frames != self.total_frames: self.view_start, self.view_end = 0.0, 0.0
         self.total_frames = total_frames
         self.num_tanks = num_tanks
+        self.pyramid = TimelinePyramid(timeline_segments, total_frames) if timeline_segments and total_frames > 0 else None
         if self.num_tanks > 0:
             self.setMinimumHeight(max(40, self.num_tanks * 12 + 20))
             self.setMaximumHeight(self.num_tanks * 12 + 20)
         else:
             self.setMinimumHeight(0)
+        self._bars_cache = None
         self.update()
 
     def setCurrentFrame(self, frame_idx):
-        if self.current_frame != frame_idx:
-            self.current_frame = frame_idx
-            self.update()
+        if self.current_frame == frame_idx: return
+        old_x = self._cursor_x(); self.current_frame = frame_idx; new_x = self._cursor_x()
+        if old_x is None or new_x is None: self.update(); return
+        if int(old_x) == int(new_x): return
+        self.update(self._cursor_rect(old_x)); self.update(self._cursor_rect(new_x))
 
-    def paintEvent(self, event):
-        super().paintEvent(event)
-        if self.total_frames <= 1 or self.num_tanks == 0: return
+    def resizeEvent(self, event):
+        self._bars_cache = None
+        super().resizeEvent(event)
 
-        painter = QtGui.QPainter(self)
-        painter.setRenderHint(QtGui.QPainter.Antialiasing)
-        rect = self.rect().adjusted(30, 10, -10, -10)
-        if not rect.isValid(): return
+    def _bars_rect(self):
+        return self.rect().adjusted(30, 10, -10, -10)
+
+    def view(self):
+        """The visible frame range (start, end) as floats."""
+        return (self.view_start, self.view_end) if self.view_end > self.view_start else (0.0, float(self.total_frames))
+
+    def setView(self, start, end):
+        """Shows frames start..end, clamped to the video and to at least MIN_VIEW_FRAMES."""
+        if self.total_frames <= 1: return
+        span = min(float(self.total_frames), max(min(self.MIN_VIEW_FRAMES, self.total_frames), end - start))
+        start = min(max(0.0, start), self.total_frames - span)
+        if (start, start + span) != self.view(): self.view_start, self.view_end = start, start + span; self.update()
+
+    def _frame_at(self, x):
+        rect = self._bars_rect(); view_start, view_end = self.view()
+        return view_start + (x - rect.left()) / max(1, rect.width()) * (view_end - view_start)
+
+    def _cursor_x(self):
+        rect = self._bars_rect()
+        if self.total_frames <= 1 or self.num_tanks == 0 or not rect.isValid(): return None
+        view_start, view_end = self.view()
+        return rect.left() + (self.current_frame - view_start) / (view_end - view_start) * rect.width()
+
+    def wheelEvent(self, event):
+        notches = event.angleDelta().y() / 120
+        if not notches or self.total_frames <= 1: return super().wheelEvent(event)
+        view_start, view_end = self.view(); anchor = min(max(self._frame_at(event.pos().x()), view_start), view_end); factor = self.ZOOM_STEP ** -notches
+        self.setView(anchor - (anchor - view_start) * factor, anchor + (view_end - anchor) * factor); event.accept()
+
+    def mousePressEvent(self, event):
+        if event.button() == QtCore.Qt.LeftButton and self.total_frames > 1: self._drag = (event.pos().x(), *self.view(), False)
+        super().mousePressEvent(event)
 
+    def mouseMoveEvent(self, event):
+        if self._drag is not None:
+            press_x, view_start, view_end, panned = self._drag; dx = event.pos().x() - press_x
+            if panned or abs(dx) >= self.DRAG_THRESHOLD:
+                self._drag = (press_x, view_start, view_end, True); shift = -dx / max(1, self._bars_rect().width()) * (view_end - view_start)
+                self.setView(view_start + shift, view_end + shift); self.setCursor(QtCore.Qt.ClosedHandCursor)
+        super().mouseMoveEvent(event)
+
+    def mouseReleaseEvent(self, event):
+        if self._drag is not None and event.button() == QtCore.Qt.LeftButton:
+            panned = self._drag[3]; self._drag = None; self.unsetCursor()
+            if not panned and self._bars_rect().contains(event.pos()): self.frame_clicked.emit(int(min(max(self._frame_at(event.pos().x()), 0), self.total_frames - 1)))
+        super().mouseReleaseEvent(event)
+
+    def mouseDoubleClickEvent(self, event):
+        self.view_start, self.view_end = 0.0, 0.0; self.update()
+        super().mouseDoubleClickEvent(event)
+
+    def _cursor_rect(self, x):
+        rect = self._bars_rect()
+        return QtCore.QRect(int(x) - self.CURSOR_MARGIN, rect.top() - 1, 2 * self.CURSOR_MARGIN + 1, rect.height() + 2)
+
+    def _bars_pixmap(self):
+        """The cached bars and labels; the key includes the colors because the color dict is shared and can grow."""
+        key = (self.size(), self.devicePixelRatioF(), self.view(), tuple(tuple(self.behavior_colors.get(name, (100, 100, 100))) for name in self.timeline_segments.names))
+        if self._bars_cache is None or self._bars_cache[0] != key:
+            ratio = self.devicePixelRatioF(); pixmap = QtGui.QPixmap(int(self.width() * ratio), int(self.height() * ratio)); pixmap.setDevicePixelRatio(ratio); pixmap.fill(QtCore.Qt.transparent)
+            painter = QtGui.QPainter(pixmap); self._paint_bars(painter, self._bars_rect()); painter.end()
+            self._bars_cache = (key, pixmap)
+        return self._bars_cache[1]
+
+    def _paint_bars(self, painter, rect):
+        painter.setRenderHint(QtGui.QPainter.Antialiasing)
         bar_height_total = rect.height() / self.num_tanks
         bar_height_visible = bar_height_total * 0.8
+        background = np.array([0x4a, 0x4a, 0x4a], dtype=np.float64)
+        palette = np.array([self.behavior_colors.get(name, (100, 100, 100)) for name in self.timeline_segments.names] or [(100, 100, 100)], dtype=np.float64)
+        # Pixel columns (at device resolution) as frame intervals [lo, hi), at least one frame wide
+        view_start, view_end = self.view(); columns = max(1, int(round(rect.width() * self.devicePixelRatioF())))
+        edges = view_start + (view_end - view_start) * np.arange(columns + 1) / columns
+        lo = np.floor(edges[:-1]).astype(np.int64); hi = np.maximum(lo + 1, np.floor(edges[1:]).astype(np.int64))
 
         for i in range(self.num_tanks):
             tank_id = i + 1
@@ -50,23 +145,30 @@ class TimelineWidget(QtWidgets.QWidget):
             painter.setPen(QtCore.Qt.NoPen)
             painter.setBrush(QtGui.QBrush(QtGui.QColor("#4a4a4a")))
             painter.drawRect(QtCore.QRectF(rect.left(), y_pos, rect.width(), bar_height_visible))
-            if tank_id in self.timeline_segments:
-                for start_frame, end_frame, behavior in self.timeline_segments[tank_id]:
-                    color_tuple = self.behavior_colors.get(behavior, (100, 100, 100))
-                    color = QtGui.QColor(*color_tuple)
-                    x_start = rect.left() + (start_frame / self.total_frames) * rect.width()
-                    x_end = rect.left() + ((end_frame + 1) / self.total_frames) * rect.width()
-                    segment_width = max(1.0, x_end - x_start)
-                    painter.setBrush(QtGui.QBrush(color))
-                    painter.drawRect(QtCore.QRectF(x_start, y_pos, segment_width, bar_height_visible))
+            if self.pyramid is not None and tank_id in self.timeline_segments:
+                counts = self.pyramid.summarize(tank_id, lo, hi); detected = counts.sum(axis=1)
+                if detected.any():
+                    alpha = np.where(detected > 0, 0.5 + 0.5 * np.minimum(1.0, detected / (hi - lo)), 0.0)[:, None]
+                    row = np.ascontiguousarray((background * (1 - alpha) + palette[counts.argmax(axis=1)] * alpha).astype(np.uint8)[None])
+                    painter.drawImage(QtCore.QRectF(rect.left(), y_pos, rect.width(), bar_height_visible), QtGui.QImage(row.data, columns, 1, row.strides[0], QtGui.QImage.Format_RGB888))
             painter.setPen(QtGui.QColor("#e0e0e0"))
             font = painter.font()
             font.setPointSize(7)
             painter.setFont(font)
             label_rect = QtCore.QRectF(rect.left() - 25, y_pos, 20, bar_height_visible)
             painter.drawText(label_rect, QtCore.Qt.AlignVCenter | QtCore.Qt.AlignRight, f"T{tank_id}")
-        
-        if self.total_frames > 0:
-            indicator_x = rect.left() + (self.current_frame / self.total_frames) * rect.width()
-            painter.setPen(QtGui.QPen(QtGui.QColor(255, 80, 80, 220), 2))
-            painter.drawLine(QtCore.QPointF(indicator_x, rect.top()), QtCore.QPointF(indicator_x, rect.bottom()))
\ No newline at end of file
+
+    def paintEvent(self, event):
+        super().paintEvent(event)
+        if self.total_frames <= 1 or self.num_tanks == 0: return
+        rect = self._bars_rect()
+        if not rect.isValid(): return
+
+        painter = QtGui.QPainter(self)
+        painter.drawPixmap(0, 0, self._bars_pixmap())  # clipped by Qt to the update region, so cursor moves blit two narrow strips
+
+        indicator_x = self._cursor_x()
+        if not rect.left() <= indicator_x <= rect.right(): return
+        painter.setRenderHint(QtGui.QPainter.Antialiasing)
+        painter.setPen(QtGui.QPen(QtGui.QColor(255, 80, 80, 220), 2))
+        painter.drawLine(QtCore.QPointF(indicator_x, rect.top()), QtCore.QPointF(indicator_x, rect.bottom()))
@@ -10,6 +10,7 @@ from PyQt5.QtCore import QThread, pyqtSignal
 from PyQt5.QtGui import QTransform
 
 from core.endpoints_analyzer import EndpointsAnalyzer
+from core.detection_cache import load_detection_dataframe
 
 def find_common_prefix(filenames):
     """Finds the longest common starting string from a list of filenames."""
@@ -56,7 +57,7 @@ class AnalysisProcessor(QThread):
                     self.log.emit(f"\nAnalyzing file {i+1}/{total_files}: {filename}")
 
                     try:
-                        df = pd.read_csv(file_path)
+                        df = load_detection_dataframe(file_path)
                         required_cols = ['frame_idx', 'cx', 'cy', 'tank_number']
                         if not all(col in df.columns for col in required_cols):
                             self.log.emit(f"[WARNING] Skipping {filename}: missing required columns."); continue
@@ -1,24 +1,239 @@
 # EthoGrid_App/workers/batch_processor.py
 
-import os, csv, json, traceback
-from collections import defaultdict
+import os, csv, json, time, queue, traceback, multiprocessing
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor, as_completed
+from functools import partial
 from PyQt5.QtCore import QThread, pyqtSignal, QPointF
 from PyQt5.QtGui import QTransform
 import cv2
 
-from .video_saver import VideoSaver
+from .video_saver import VideoSaver, export_video_in_segments
 from core.data_exporter import export_centroid_csv, export_to_excel_sheets, export_trajectory_image, export_heatmap_image
 from core.stopwatch import Stopwatch
+from core.detection_cache import load_detections_csv
+from core.detection_ops import filter_top_k_per_tank, build_behavior_timeline, BehaviorTimeline
+from core.batch_manifest import BatchManifest, input_fingerprints, output_inputs, is_up_to_date
+from core.frame_bus import FrameBus, FrameConsumer, FrameGrabber
+from core.video_probe import probe_video
+from core.render_pool import OrderedRenderPool, RENDER_THREADS
+from core.segmented_export import segmented_export_available
+
+# (BatchProcessor option, output file suffix) for every export a video can produce
+OUTPUT_FLAGS = [('save_csv', "with_tanks.csv"), ('save_centroid_csv', "centroids_wide.csv"), ('save_excel', "by_tank.xlsx"), ('save_trajectory_img', "trajectory.png"), ('save_heatmap_img', "heatmap.png"), ('save_video', "annotated.mp4")]
+EVENT_INTERVAL_SECONDS = 0.25  # minimum spacing of per-frame progress events sent from worker processes
+
+def _get_tank_for_point(x, y, w, h, cols, rows, inverse_transform):
+    transformed_point = inverse_transform.map(QPointF(x, y)); tx, ty = transformed_point.x(), transformed_point.y()
+    if not (0 <= tx < w and 0 <= ty < h): return None
+    cell_width, cell_height = w / cols, h / rows; col = min(cols - 1, max(0, int(tx / cell_width))); row = min(rows - 1, max(0, int(ty / cell_height)))
+    return row * cols + col + 1
+
+def _write_enriched_csv(detections, csv_headers, output_csv_path):
+    all_processed_detections = [det for frame_dets in detections.values() for det in frame_dets]; new_headers = csv_headers[:]
+    new_headers.extend(k for k in ['tank_number', 'cx', 'cy'] if k not in new_headers)
+    with open(output_csv_path, 'w', newline='', encoding='utf-8') as f:
+        writer = csv.DictWriter(f, fieldnames=new_headers, extrasaction='ignore'); writer.writeheader()
+        for det in all_processed_detections:
+            row_to_write = det.copy()
+            for key in ['x1', 'y1', 'x2', 'y2', 'cx', 'cy']:
+                if key in row_to_write and isinstance(row_to_write[key], float): row_to_write[key] = f"{row_to_write[key]:.4f}"
+            writer.writerow(row_to_write)
+    return None
+
+def _annotated_saver_kwargs(video_path, output_video_path, detections, grid_settings, final_transform, video_size, video_fps, draw_overlays):
+    """VideoSaver arguments for a batch annotated video (behavior colors from the default palette)."""
+    all_behaviors = sorted(list(set(det['class_name'] for dets in detections.values() for det in dets))); predefined_colors = [(31,119,180),(255,127,14),(44,160,44),(214,39,40),(148,103,189),(140,86,75),(227,119,194),(127,127,127),(188,189,34),(23,190,207)]; behavior_colors = {name: predefined_colors[i % len(predefined_colors)] for i, name in enumerate(all_behaviors)}
+    timeline_segments = build_behavior_timeline(detections) if draw_overlays else BehaviorTimeline()
+    return dict(source_video_path=video_path, output_video_path=output_video_path, detections=detections, grid_settings=grid_settings, grid_transform=final_transform, behavior_colors=behavior_colors, video_size=video_size, fps=video_fps, line_thickness=grid_settings.get('line_thickness', 2), selected_cells=set(), timeline_segments=timeline_segments, draw_grid=False, draw_overlays=draw_overlays)
+
+class _AnnotatedVideoWriter(FrameConsumer):
+    """FrameBus consumer that draws the annotations on a render pool and encodes the annotated frames in order."""
+    def __init__(self, saver_kwargs, total_frames, emit, render_threads=RENDER_THREADS):
+        self.video_exporter = VideoSaver(**saver_kwargs); output_video_path = saver_kwargs['output_video_path']
+        fourcc = cv2.VideoWriter_fourcc(*'mp4v'); self.writer = cv2.VideoWriter(output_video_path, fourcc, self.video_exporter.fps, self.video_exporter.final_video_size)
+        self.total_frames = total_frames; self.emit = emit; self.video_exporter.prepare(total_frames)
+        self.render_pool = OrderedRenderPool(partial(self.video_exporter.process_frame, total_frames=total_frames), self._write_frame, render_threads)
+        self.file_stopwatch = Stopwatch(); self.file_stopwatch.start(); self.frame_count_for_fps = 0; self.fps_check_time = 0
+
+    def wants(self, frame_idx):
+        return frame_idx < self.total_frames
+
+    def consume(self, frame_idx, frame):
+        self.render_pool.submit(frame_idx, frame)
+
+    def _write_frame(self, frame_idx, processed_frame):
+        self.writer.write(processed_frame)
+        self.frame_count_for_fps += 1
+        current_time = self.file_stopwatch.get_elapsed_time(as_float=True)
+        if current_time > self.fps_check_time + 1:
+            processing_fps = self.frame_count_for_fps / (current_time - self.fps_check_time); self.emit('speed', processing_fps)
+            self.frame_count_for_fps = 0; self.fps_check_time = current_time
+        progress = int((frame_idx + 1) * 100 / self.total_frames); self.emit('file_progress', progress, frame_idx + 1, self.total_frames)
+        self.emit('time', self.file_stopwatch.get_elapsed_time(), self.file_stopwatch.get_etr(frame_idx + 1, self.total_frames))
+
+    def finish(self):
+        try:
+            self.render_pool.close()
+        finally:
+            self.writer.release()
+
+def _export_video_in_segments(saver_kwargs, total_frames, num_processes, emit, is_running):
+    stopwatch = Stopwatch(); stopwatch.start()
+    def on_progress(frames_done):
+        emit('file_progress', int(frames_done * 100 / total_frames), frames_done, total_frames); emit('time', stopwatch.get_elapsed_time(), stopwatch.get_etr(frames_done, total_frames))
+    return export_video_in_segments(saver_kwargs, total_frames, num_processes, on_progress, is_running, log=lambda message: emit('log', message))
+
+def _run_frame_bus(bus, is_running):
+    bus.run(is_running)
+    return None
+
+def _export_heatmap_from_bus(background, detections, video_path, output_img_path, time_gap_seconds, video_fps, frame_sample_rate):
+    base_image = background.wait()
+    if base_image is None: return f"Could not read the first frame of video: {video_path}"
+    return export_heatmap_image(detections, video_path, output_img_path, time_gap_seconds, video_fps, frame_sample_rate, base_image=base_image)
+
+def _timed_stage(func):
+    start = time.perf_counter()
+    try:
+        error_msg = func()
+    except Exception as e:
+        error_msg = f"{e}\n{traceback.format_exc()}"
+    return error_msg, time.perf_counter() - start
+
+def _run_export_stages(stages, emit, report_progress, total_frames):
+    """
+    Runs the export stages of one video concurrently on a thread pool. The stages only read the
+    filtered detections, so they share one copy instead of pickling it to other processes.
+    Errors and per-stage timings are logged as each stage completes; with `report_progress`
+    (no annotated video to report frames) the file progress advances per finished stage.
+    Returns the output paths of the stages that succeeded.
+    """
+    stopwatch = Stopwatch(); stopwatch.start(); stage_seconds = 0.0; succeeded = []
+    with ThreadPoolExecutor(max_workers=len(stages), thread_name_prefix="export") as pool:
+        futures = {pool.submit(_timed_stage, func): (name, output_path) for name, output_path, func in stages}
+        for completed, future in enumerate(as_completed(futures), 1):
+            (name, output_path), (error_msg, seconds) = futures[future], future.result(); stage_seconds += seconds
+            if error_msg: emit('log', f"[ERROR] {name} export failed: {error_msg}")
+            else: succeeded.append(output_path)
+            emit('log', f"{name} stage took {seconds:.2f} s")
+            if report_progress: emit('file_progress', int(completed * 100 / len(stages)), total_frames, total_frames); emit('time', stopwatch.get_elapsed_time(), "--:--:--")
+    emit('log', f"Export stages finished in {stopwatch.get_elapsed_time(as_float=True):.2f} s ({stage_seconds:.2f} s of stage time)")
+    return succeeded
+
+def process_video(video_path, options, grid_settings, transform_settings, emit, is_running):
+    """
+    Runs the full annotation/export pipeline for one video.
+
+    `options` holds the BatchProcessor settings (output_dir, csv_dir, save_* flags, ...) and
+    `previous_outputs`, the {filename: key} map of the output folder's manifest.
+    Progress is reported through `emit(kind, *args)` with kind 'log', 'file_progress', 'time'
+    or 'speed', every output written is reported as 'output' (filename, key, inputs), and
+    `is_running()` is polled so the job can be cancelled between frames.
+    Module level so that it can run in the GUI thread or in a worker process.
+    """
+    video_filename = os.path.basename(video_path)
+    base_name = os.path.splitext(video_filename)[0]; search_dir = options['csv_dir'] if options['csv_dir'] and os.path.isdir(options['csv_dir']) else os.path.dirname(video_path)
+    csv_path = os.path.join(search_dir, base_name + ".csv")
+    if not os.path.exists(csv_path):
+        csv_path = os.path.join(search_dir, base_name + "_detections.csv")
+        if not os.path.exists(csv_path): csv_path = os.path.join(search_dir, base_name + "_segmentations.csv")
+        if not os.path.exists(csv_path): emit('log', f"[WARNING] Skipping '{video_filename}': Matching CSV file not found in '{search_dir}'."); return
+
+    emit('log', f"Found matching detection file: {os.path.basename(csv_path)}")
+    try:
+        fingerprints = input_fingerprints(video_path, csv_path, grid_settings, transform_settings); pending = {}
+        for flag, suffix in OUTPUT_FLAGS:
+            if not options[flag]: continue
+            output_path = os.path.join(options['output_dir'], f"{base_name}_{suffix}"); key, inputs = output_inputs(suffix, fingerprints, options)
+            if options['incremental'] and is_up_to_date(options['previous_outputs'], output_path, key): emit('log', f"Up to date, skipping: {os.path.basename(output_path)}")
+            else: pending[suffix] = (output_path, key, inputs)
+        if not pending: emit('log', f"✓ All outputs are up to date for: {video_filename}"); return
+
+        detections, csv_headers = load_detections_csv(csv_path)
+
+        emit('log', "Assigning detections to tanks based on centroid...")
+        video_info = probe_video(video_path)
+        if video_info is None: emit('log', f"[ERROR] Could not open video: {video_filename}"); return
+        video_w, video_h = video_info['width'], video_info['height']; video_fps, total_frames = video_info['fps'] or 30.0, video_info['frame_count']; video_size = (video_w, video_h)
+        final_transform = QTransform(); final_transform.translate(video_w * transform_settings['center_x'], video_h * transform_settings['center_y']); final_transform.rotate(transform_settings['angle']); final_transform.scale(transform_settings['scale_x'], transform_settings['scale_y']); final_transform.translate(-video_w / 2, -video_h / 2)
+        inverse_transform, _ = final_transform.inverted()
+        for dets in detections.values():
+            for det in dets:
+                if 'cx' not in det or det['cx'] is None: det['cx'], det['cy'] = (det["x1"] + det["x2"]) / 2.0, (det["y1"] + det["y2"]) / 2.0
+                det['tank_number'] = _get_tank_for_point(det['cx'], det['cy'], video_w, video_h, grid_settings['cols'], grid_settings['rows'], inverse_transform)
+
+        emit('log', f"Filtering to max {options['max_animals_per_tank']} animal(s) per tank by confidence...")
+        filtered_detections = filter_top_k_per_tank(detections, options['max_animals_per_tank'])
+        detections = filtered_detections; emit('log', "Filtering complete.")
+
+        stages = []  # (name, output path, callable returning an error message or None)
+        # The video is decoded once; the heatmap background and the annotated writer subscribe to the same pass.
+        # A long annotated video can be rendered in keyframe-aligned segments by several processes instead of on the shared frame bus
+        segmented_video = "annotated.mp4" in pending and options['video_processes'] > 1 and segmented_export_available()
+        frame_bus = FrameBus(video_path, total_frames) if "heatmap.png" in pending or ("annotated.mp4" in pending and not segmented_video) else None
+        if "with_tanks.csv" in pending:
+            output_csv_path = pending["with_tanks.csv"][0]; emit('log', f"Saving enriched CSV to: {os.path.basename(output_csv_path)}")
+            stages.append(("Enriched CSV", output_csv_path, partial(_write_enriched_csv, detections, csv_headers, output_csv_path)))
+        if "centroids_wide.csv" in pending:
+            output_centroid_path = pending["centroids_wide.csv"][0]; emit('log', f"Saving centroid CSV to: {os.path.basename(output_centroid_path)}")
+            stages.append(("Centroid CSV", output_centroid_path, partial(export_centroid_csv, detections, grid_settings['cols'] * grid_settings['rows'], output_centroid_path)))
+        if "by_tank.xlsx" in pending:
+            output_excel_path = pending["by_tank.xlsx"][0]; emit('log', f"Saving Excel file to: {os.path.basename(output_excel_path)}")
+            stages.append(("Excel", output_excel_path, partial(export_to_excel_sheets, detections, output_excel_path)))
+        if "trajectory.png" in pending:
+            output_img_path = pending["trajectory.png"][0]; emit('log', f"Saving Trajectory Image to: {os.path.basename(output_img_path)}")
+            stages.append(("Trajectory image", output_img_path, partial(export_trajectory_image, detections, grid_settings, video_size, final_transform, output_img_path, options['time_gap_seconds'], video_fps, options['frame_sample_rate'])))
+        if "heatmap.png" in pending:
+            output_img_path = pending["heatmap.png"][0]; emit('log', f"Saving Heatmap Image to: {os.path.basename(output_img_path)}")
+            heatmap_background = frame_bus.subscribe(FrameGrabber(0))
+            stages.append(("Heatmap image", output_img_path, partial(_export_heatmap_from_bus, heatmap_background, detections, video_path, output_img_path, options['time_gap_seconds'], video_fps, options['frame_sample_rate'])))
+        if "annotated.mp4" in pending:
+            output_video_path = pending["annotated.mp4"][0]; emit('log', f"Exporting annotated video to: {os.path.basename(output_video_path)}")
+            saver_kwargs = _annotated_saver_kwargs(video_path, output_video_path, detections, grid_settings, final_transform, video_size, video_fps, options['draw_overlays'])
+            if segmented_video: stages.append(("Annotated video", output_video_path, partial(_export_video_in_segments, saver_kwargs, total_frames, options['video_processes'], emit, is_running)))
+            else:
+                frame_bus.subscribe(_AnnotatedVideoWriter(saver_kwargs, total_frames, emit, options['render_threads']))
+                stages.append(("Annotated video", output_video_path, partial(_run_frame_bus, frame_bus, is_running)))
+        if frame_bus is not None and ("annotated.mp4" not in pending or segmented_video):
+            stages.append(("Video decode", None, partial(_run_frame_bus, frame_bus, is_running)))
+
+        succeeded = _run_export_stages(stages, emit, report_progress="annotated.mp4" not in pending, total_frames=total_frames)
+        if is_running():
+            for output_path, key, inputs in pending.values():
+                if output_path in succeeded: emit('output', os.path.basename(output_path), key, inputs)
+        emit('log', f"✓ Finished processing {'video' if 'annotated.mp4' in pending else 'data'} for: {video_filename}")
+    except Exception as e:
+        emit('log', f"[ERROR] Failed to process {video_filename}: {e}"); emit('log', traceback.format_exc()); return
+
+class _QueueEmitter:
+    """Forwards events from a worker process to the parent queue, throttling per-frame updates."""
+    def __init__(self, event_queue, video_path):
+        self.event_queue = event_queue; self.video_path = video_path; self.pid = os.getpid(); self.last_sent = {}
+
+    def __call__(self, kind, *args):
+        if kind in ('file_progress', 'time'):
+            now = time.monotonic(); is_last = kind == 'file_progress' and args[1] >= args[2]
+            if not is_last and now - self.last_sent.get(kind, 0.0) < EVENT_INTERVAL_SECONDS: return
+            self.last_sent[kind] = now
+        self.event_queue.put((self.pid, self.video_path, kind, args))
+
+def _process_video_in_worker(video_path, options, grid_settings, transform_settings, event_queue, cancel_event):
+    emit = _QueueEmitter(event_queue, video_path); emit('started')
+    try:
+        if not cancel_event.is_set(): process_video(video_path, options, grid_settings, transform_settings, emit, lambda: not cancel_event.is_set())
+    finally:
+        emit('done')
 
 class BatchProcessor(QThread):
     overall_progress = pyqtSignal(int, int, str)
     file_progress = pyqtSignal(int, int, int)
+    lane_progress = pyqtSignal(int, int, str)  # worker lane, percentage, status text (parallel mode only)
     log_message = pyqtSignal(str)
     finished = pyqtSignal()
     time_updated = pyqtSignal(str, str)
     speed_updated = pyqtSignal(float)
 
-    def __init__(self, video_files, settings_file, output_dir, csv_dir, max_animals_per_tank, frame_sample_rate, save_video, save_csv, save_centroid_csv, save_excel, save_trajectory_img, save_heatmap_img, time_gap_seconds, draw_overlays, parent=None):
+    def __init__(self, video_files, settings_file, output_dir, csv_dir, max_animals_per_tank, frame_sample_rate, save_video, save_csv, save_centroid_csv, save_excel, save_trajectory_img, save_heatmap_img, time_gap_seconds, draw_overlays, num_workers=1, incremental=True, video_processes=1, parent=None):
         super().__init__(parent)
         self.video_files = video_files; self.settings_file = settings_file; self.output_dir = output_dir; self.csv_dir = csv_dir
         self.max_animals_per_tank = max_animals_per_tank
@@ -26,142 +241,80 @@ class BatchProcessor(QThread):
         self.save_video = save_video; self.save_csv = save_csv; self.save_centroid_csv = save_centroid_csv; self.save_excel = save_excel
         self.save_trajectory_img = save_trajectory_img; self.save_heatmap_img = save_heatmap_img
         self.time_gap_seconds = time_gap_seconds
-        self.draw_overlays = draw_overlays; self.is_running = True
+        self.draw_overlays = draw_overlays; self.num_workers = max(1, int(num_workers)); self.incremental = incremental; self.video_processes = max(1, int(video_processes)); self.manifest = None; self.is_running = True
 
     def stop(self):
         self.log_message.emit("Stopping batch process..."); self.is_running = False
 
-    def _get_tank_for_point(self, x, y, w, h, cols, rows, inverse_transform):
-        transformed_point = inverse_transform.map(QPointF(x, y)); tx, ty = transformed_point.x(), transformed_point.y()
-        if not (0 <= tx < w and 0 <= ty < h): return None
-        cell_width, cell_height = w / cols, h / rows; col = min(cols - 1, max(0, int(tx / cell_width))); row = min(rows - 1, max(0, int(ty / cell_height)))
-        return row * cols + col + 1
+    def _options(self):
+        return {'output_dir': self.output_dir, 'csv_dir': self.csv_dir, 'max_animals_per_tank': self.max_animals_per_tank, 'frame_sample_rate': self.frame_sample_rate,
+                'save_video': self.save_video, 'save_csv': self.save_csv, 'save_centroid_csv': self.save_centroid_csv, 'save_excel': self.save_excel,
+                'save_trajectory_img': self.save_trajectory_img, 'save_heatmap_img': self.save_heatmap_img, 'time_gap_seconds': self.time_gap_seconds, 'draw_overlays': self.draw_overlays,
+                'incremental': self.incremental, 'previous_outputs': self.manifest.keys(),
+                'render_threads': max(1, RENDER_THREADS // self.num_workers), 'video_processes': self.video_processes}  # parallel videos share the cores
+
+    def _emit_event(self, kind, *args):
+        if kind == 'log': self.log_message.emit(args[0])
+        elif kind == 'file_progress': self.file_progress.emit(*args)
+        elif kind == 'time': self.time_updated.emit(*args)
+        elif kind == 'speed': self.speed_updated.emit(args[0])
+        elif kind == 'output': self.manifest.record(*args)
 
     def run(self):
         try:
             with open(self.settings_file, 'r') as f: settings_data = json.load(f)
             grid_settings = settings_data['grid_settings']; transform_settings = settings_data['grid_transform']
         except Exception as e: self.log_message.emit(f"[ERROR] Failed to load settings file: {e}"); return
+        self.manifest = BatchManifest(self.output_dir)
+
+        if self.num_workers > 1 and len(self.video_files) > 1: self._run_parallel(grid_settings, transform_settings)
+        else: self._run_serial(grid_settings, transform_settings)
+        if self.is_running: self.log_message.emit("\nBatch processing complete!")
+        else: self.log_message.emit("\nBatch processing cancelled.")
+        self.finished.emit()
 
+    def _run_serial(self, grid_settings, transform_settings):
+        options = self._options()
         for idx, video_path in enumerate(self.video_files):
             if not self.is_running: break
             video_filename = os.path.basename(video_path); self.overall_progress.emit(idx + 1, len(self.video_files), video_filename); self.file_progress.emit(0, 0, 0); self.time_updated.emit("00:00:00", "--:--:--")
             self.speed_updated.emit(0.0)
-            base_name = os.path.splitext(video_filename)[0]; search_dir = self.csv_dir if self.csv_dir and os.path.isdir(self.csv_dir) else os.path.dirname(video_path)
-            csv_path = os.path.join(search_dir, base_name + ".csv")
-            if not os.path.exists(csv_path):
-                csv_path = os.path.join(search_dir, base_name + "_detections.csv")
-                if not os.path.exists(csv_path): csv_path = os.path.join(search_dir, base_name + "_segmentations.csv")
-                if not os.path.exists(csv_path): self.log_message.emit(f"[WARNING] Skipping '{video_filename}': Matching CSV file not found in '{search_dir}'."); continue
-            
-            self.log_message.emit(f"Found matching detection file: {os.path.basename(csv_path)}")
-            try:
-                detections, csv_headers = {}, []
-                with open(csv_path, newline="", encoding='utf-8') as f:
-                    reader = csv.DictReader(f); csv_headers = reader.fieldnames[:]
-                    coord_cols = ['x1', 'y1', 'x2', 'y2', 'cx', 'cy', 'conf']
-                    for row in reader:
-                        frame_idx = int(float(row["frame_idx"]))
-                        for col in coord_cols:
-                            if col in row and row[col]:
-                                try: row[col] = float(row[col])
-                                except (ValueError, TypeError): row[col] = None
-                        detections.setdefault(frame_idx, []).append(row)
-                
-                self.log_message.emit("Assigning detections to tanks based on centroid...")
-                cap = cv2.VideoCapture(video_path)
-                if not cap.isOpened(): self.log_message.emit(f"[ERROR] Could not open video: {video_filename}"); continue
-                video_w, video_h = int(cap.get(cv2.CAP_PROP_FRAME_WIDTH)), int(cap.get(cv2.CAP_PROP_FRAME_HEIGHT)); video_fps, total_frames = cap.get(cv2.CAP_PROP_FPS) or 30.0, int(cap.get(cv2.CAP_PROP_FRAME_COUNT)); video_size = (video_w, video_h); cap.release()
-                final_transform = QTransform(); final_transform.translate(video_w * transform_settings['center_x'], video_h * transform_settings['center_y']); final_transform.rotate(transform_settings['angle']); final_transform.scale(transform_settings['scale_x'], transform_settings['scale_y']); final_transform.translate(-video_w / 2, -video_h / 2)
-                inverse_transform, _ = final_transform.inverted()
-                for dets in detections.values():
-                    for det in dets:
-                        if 'cx' not in det or det['cx'] is None: det['cx'], det['cy'] = (det["x1"] + det["x2"]) / 2.0, (det["y1"] + det["y2"]) / 2.0
-                        det['tank_number'] = self._get_tank_for_point(det['cx'], det['cy'], video_w, video_h, grid_settings['cols'], grid_settings['rows'], inverse_transform)
-
-                self.log_message.emit(f"Filtering to max {self.max_animals_per_tank} animal(s) per tank by confidence...")
-                filtered_detections = defaultdict(list)
-                for frame_idx, dets_in_frame in detections.items():
-                    dets_by_tank = defaultdict(list)
-                    for det in dets_in_frame:
-                        if det.get('tank_number') is not None: dets_by_tank[det['tank_number']].append(det)
-                    for tank_num, dets_in_tank in dets_by_tank.items():
-                        dets_in_tank.sort(key=lambda d: d.get('conf', 0.0), reverse=True)
-                        filtered_detections[frame_idx].extend(dets_in_tank[:self.max_animals_per_tank])
-                detections = filtered_detections; self.log_message.emit("Filtering complete.")
-
-                if self.save_csv:
-                    output_csv_path = os.path.join(self.output_dir, f"{base_name}_with_tanks.csv"); self.log_message.emit(f"Saving enriched CSV to: {os.path.basename(output_csv_path)}")
-                    all_processed_detections = [det for frame_dets in detections.values() for det in frame_dets]; new_headers = csv_headers[:]
-                    new_headers.extend(k for k in ['tank_number', 'cx', 'cy'] if k not in new_headers)
-                    with open(output_csv_path, 'w', newline='', encoding='utf-8') as f:
-                        writer = csv.DictWriter(f, fieldnames=new_headers, extrasaction='ignore'); writer.writeheader()
-                        for det in all_processed_detections:
-                            row_to_write = det.copy()
-                            for key in ['x1', 'y1', 'x2', 'y2', 'cx', 'cy']:
-                                if key in row_to_write and isinstance(row_to_write[key], float): row_to_write[key] = f"{row_to_write[key]:.4f}"
-                            writer.writerow(row_to_write)
-                if self.save_centroid_csv:
-                    output_centroid_path = os.path.join(self.output_dir, f"{base_name}_centroids_wide.csv"); self.log_message.emit(f"Saving centroid CSV to: {os.path.basename(output_centroid_path)}")
-                    error_msg = export_centroid_csv(detections, grid_settings['cols'] * grid_settings['rows'], output_centroid_path)
-                    if error_msg: self.log_message.emit(f"[ERROR] Centroid CSV export failed: {error_msg}")
-                if self.save_excel:
-                    output_excel_path = os.path.join(self.output_dir, f"{base_name}_by_tank.xlsx"); self.log_message.emit(f"Saving Excel file to: {os.path.basename(output_excel_path)}")
-                    error_msg = export_to_excel_sheets(detections, output_excel_path)
-                    if error_msg: self.log_message.emit(f"[ERROR] Excel export failed: {error_msg}")
-                if self.save_trajectory_img:
-                    output_img_path = os.path.join(self.output_dir, f"{base_name}_trajectory.png"); self.log_message.emit(f"Saving Trajectory Image to: {os.path.basename(output_img_path)}")
-                    error_msg = export_trajectory_image(detections, grid_settings, video_size, final_transform, output_img_path, self.time_gap_seconds, video_fps, self.frame_sample_rate)
-                    if error_msg: self.log_message.emit(f"[ERROR] Trajectory image export failed: {error_msg}")
-                if self.save_heatmap_img:
-                    output_img_path = os.path.join(self.output_dir, f"{base_name}_heatmap.png"); self.log_message.emit(f"Saving Heatmap Image to: {os.path.basename(output_img_path)}")
-                    error_msg = export_heatmap_image(detections, video_path, output_img_path, self.time_gap_seconds, video_fps, self.frame_sample_rate)
-                    if error_msg: self.log_message.emit(f"[ERROR] Heatmap image export failed: {error_msg}")
-                
-                file_stopwatch = Stopwatch()
-                if self.save_video:
-                    output_video_path = os.path.join(self.output_dir, f"{base_name}_annotated.mp4"); self.log_message.emit(f"Exporting annotated video to: {os.path.basename(output_video_path)}")
-                    all_behaviors = sorted(list(set(det['class_name'] for dets in detections.values() for det in dets))); predefined_colors = [(31,119,180),(255,127,14),(44,160,44),(214,39,40),(148,103,189),(140,86,75),(227,119,194),(127,127,127),(188,189,34),(23,190,207)]; behavior_colors = {name: predefined_colors[i % len(predefined_colors)] for i, name in enumerate(all_behaviors)}
-                    tank_data_for_timeline = defaultdict(dict)
-                    if self.draw_overlays:
-                        for frame_idx_tl, dets in detections.items():
-                            for det in dets:
-                                if det.get('tank_number') is not None: tank_data_for_timeline[det['tank_number']][frame_idx_tl] = det["class_name"]
-                    timeline_segments = {};
-                    for tank_id, frames in tank_data_for_timeline.items():
-                        if not frames: continue
-                        segments, sorted_frames = [], sorted(frames.keys()); start_frame, current_behavior = sorted_frames[0], frames[sorted_frames[0]]
-                        for i in range(1, len(sorted_frames)):
-                            frame, prev_frame, behavior = sorted_frames[i], sorted_frames[i-1], frames[sorted_frames[i]]
-                            if behavior != current_behavior or frame != prev_frame + 1: segments.append((start_frame, prev_frame, current_behavior)); start_frame, current_behavior = frame, behavior
-                        segments.append((start_frame, sorted_frames[-1], current_behavior)); timeline_segments[tank_id] = segments
-                    video_exporter = VideoSaver(source_video_path=video_path, output_video_path=output_video_path, detections=detections, grid_settings=grid_settings, grid_transform=final_transform, behavior_colors=behavior_colors, video_size=video_size, fps=video_fps, line_thickness=grid_settings.get('line_thickness', 2), selected_cells=set(), timeline_segments=timeline_segments, draw_grid=False, draw_overlays=self.draw_overlays)
-                    cap_export = cv2.VideoCapture(video_path); fourcc = cv2.VideoWriter_fourcc(*'mp4v'); writer = cv2.VideoWriter(output_video_path, fourcc, video_fps, video_exporter.final_video_size)
-                    file_stopwatch.start(); frame_count_for_fps = 0; fps_check_time = 0
-                    for frame_idx_export in range(total_frames):
-                        if not self.is_running: break
-                        ret, frame = cap_export.read()
-                        if not ret: break
-                        processed_frame = video_exporter.process_frame(frame, frame_idx_export, total_frames); writer.write(processed_frame)
-                        frame_count_for_fps += 1
-                        current_time = file_stopwatch.get_elapsed_time(as_float=True)
-                        if current_time > fps_check_time + 1:
-                            processing_fps = frame_count_for_fps / (current_time - fps_check_time); self.speed_updated.emit(processing_fps)
-                            frame_count_for_fps = 0; fps_check_time = current_time
-                        progress = int((frame_idx_export + 1) * 100 / total_frames); self.file_progress.emit(progress, frame_idx_export + 1, total_frames)
-                        self.time_updated.emit(file_stopwatch.get_elapsed_time(), file_stopwatch.get_etr(frame_idx_export + 1, total_frames))
-                    cap_export.release(); writer.release()
-                    self.log_message.emit(f"✓ Finished processing video for: {video_filename}")
-                else:
-                    if any([self.save_csv, self.save_centroid_csv, self.save_excel, self.save_trajectory_img, self.save_heatmap_img]):
-                        file_stopwatch.start();
-                        for i in range(101):
-                            if not self.is_running: break
-                            self.file_progress.emit(i, total_frames, total_frames); self.time_updated.emit(file_stopwatch.get_elapsed_time(), "--:--:--")
-                            QThread.msleep(5)
-                    self.log_message.emit(f"✓ Finished processing data for: {video_filename}")
-            except Exception as e:
-                self.log_message.emit(f"[ERROR] Failed to process {video_filename}: {e}"); self.log_message.emit(traceback.format_exc()); continue
-        if self.is_running: self.log_message.emit("\nBatch processing complete!")
-        else: self.log_message.emit("\nBatch processing cancelled.")
-        self.finished.emit()
\ No newline at end of file
+            process_video(video_path, options, grid_settings, transform_settings, self._emit_event, lambda: self.is_running); self.manifest.save()
+
+    def _run_parallel(self, grid_settings, transform_settings):
+        """
+        Processes whole videos in `num_workers` processes. Workers report through a managed queue;
+        every worker pid gets a lane index so the dialog can show one progress row per worker.
+        """
+        options = dict(self._options(), video_processes=1); total = len(self.video_files); num_workers = min(self.num_workers, total)  # whole videos already run in parallel
+        self.log_message.emit(f"Processing {total} videos with {num_workers} parallel workers...")
+        ctx = multiprocessing.get_context('spawn'); batch_stopwatch = Stopwatch(); batch_stopwatch.start()
+        with ctx.Manager() as manager:
+            event_queue, cancel_event = manager.Queue(), manager.Event()
+            with ProcessPoolExecutor(max_workers=num_workers, mp_context=ctx) as pool:
+                futures = [pool.submit(_process_video_in_worker, video_path, options, grid_settings, transform_settings, event_queue, cancel_event) for video_path in self.video_files]
+                lanes, lane_speeds, started, completed = {}, {}, 0, 0
+                while True:
+                    if not self.is_running and not cancel_event.is_set():
+                        cancel_event.set()
+                        for future in futures: future.cancel()
+                    try:
+                        pid, video_path, kind, args = event_queue.get(timeout=0.1)
+                    except queue.Empty:
+                        if all(future.done() for future in futures): break
+                        continue
+                    lane = lanes.setdefault(pid, len(lanes)); video_filename = os.path.basename(video_path)
+                    if kind == 'started':
+                        started += 1; self.overall_progress.emit(started, total, video_filename); self.lane_progress.emit(lane, 0, f"{video_filename}: starting")
+                    elif kind == 'done':
+                        completed += 1; lane_speeds.pop(lane, None); self.manifest.save(); self.lane_progress.emit(lane, 100, f"{video_filename}: done")
+                        self.file_progress.emit(int(completed * 100 / total), completed, total); self.speed_updated.emit(sum(lane_speeds.values()))
+                        self.time_updated.emit(batch_stopwatch.get_elapsed_time(), batch_stopwatch.get_etr(completed, total))
+                    elif kind == 'log': self.log_message.emit(f"[Worker {lane + 1}] {args[0]}")
+                    elif kind == 'file_progress': self.lane_progress.emit(lane, args[0], f"{video_filename}: frame {args[1]} / {args[2]}")
+                    elif kind == 'speed': lane_speeds[lane] = args[0]; self.speed_updated.emit(sum(lane_speeds.values()))
+                    elif kind == 'output': self.manifest.record(*args)
+                for future in futures:
+                    if future.cancelled(): continue
+                    error = future.exception()
+                    if error is not None: self.log_message.emit(f"[ERROR] Worker process failed: {error}")
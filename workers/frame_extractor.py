@@ -6,6 +6,9 @@ import traceback
 import random
 from PyQt5.QtCore import QThread, pyqtSignal
 
+from core.video_probe import probe_video
+from core.keyframe_index import load_keyframe_index, seek_exact
+
 class FrameExtractor(QThread):
     overall_progress = pyqtSignal(int, int, str)
     file_progress = pyqtSignal(int, int, int)
@@ -41,7 +44,8 @@ class FrameExtractor(QThread):
                     self.log_message.emit(f"[WARNING] Could not open video: {filename}. Skipping.")
                     continue
                 
-                total_frames = int(cap.get(cv2.CAP_PROP_FRAME_COUNT))
+                video_info = probe_video(video_path)
+                total_frames = video_info['frame_count'] if video_info else int(cap.get(cv2.CAP_PROP_FRAME_COUNT))
                 if total_frames <= 0:
                     self.log_message.emit(f"[WARNING] Video has no frames: {filename}. Skipping.")
                     cap.release()
@@ -70,13 +74,16 @@ class FrameExtractor(QThread):
                     rel_path = os.path.basename(video_path)
 
                 video_name_prefix = os.path.splitext(rel_path.replace(os.sep, "_"))[0]
+                keyframe_index = load_keyframe_index(video_path); next_pos = 0  # frame the next read() returns
 
                 for count, frame_idx in enumerate(indices_to_extract):
                     if not self.is_running:
                         break
                     
-                    cap.set(cv2.CAP_PROP_POS_FRAMES, frame_idx)
-                    ret, frame = cap.read()
+                    # Exact seek: jump to the preceding keyframe (or keep decoding within the same GOP) and grab forward
+                    ret = seek_exact(cap, frame_idx, keyframe_index, next_pos)
+                    if ret: ret, frame = cap.read()
+                    next_pos = frame_idx + 1 if ret else -1
                     if ret:
                         output_filename = f"{video_name_prefix}_frame_{frame_idx:06d}.jpg"
                         output_path = os.path.join(self.output_dir, output_filename)
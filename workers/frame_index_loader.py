@@ -0,0 +1,40 @@
+# EthoGrid_App/workers/frame_index_loader.py
+
+import traceback
+from PyQt5.QtCore import QThread, pyqtSignal
+
+from core.csv_frame_index import load_frame_index
+
+class _Cancelled(Exception):
+    pass
+
+class FrameIndexLoader(QThread):
+    """
+    Loads (or builds, on first use) the FrameIndex of a large detection CSV off the GUI
+    thread. Building scans the whole file, which takes seconds to minutes for multi-GB CSVs.
+    """
+    progress_updated = pyqtSignal(int)
+    index_ready = pyqtSignal(object)
+    error_occurred = pyqtSignal(str)
+
+    def __init__(self, csv_path, parent=None):
+        super().__init__(parent)
+        self.csv_path = csv_path
+        self._is_running = True
+
+    def stop(self):
+        self._is_running = False
+
+    def _report_progress(self, bytes_read, total_bytes):
+        if not self._is_running: raise _Cancelled()
+        self.progress_updated.emit(int(100 * bytes_read / total_bytes) if total_bytes else 100)
+
+    def run(self):
+        try:
+            index = load_frame_index(self.csv_path, progress_callback=self._report_progress)
+            if self._is_running: self.index_ready.emit(index)
+        except _Cancelled:
+            pass
+        except Exception as e:
+            print(traceback.format_exc())
+            self.error_occurred.emit(f"Error indexing detection file: {e}")
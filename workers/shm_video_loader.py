@@ -0,0 +1,219 @@
+# EthoGrid_App/workers/shm_video_loader.py
+
+import os
+import time
+import weakref
+import threading
+import multiprocessing
+from multiprocessing import shared_memory
+import cv2
+import numpy as np
+from PyQt5.QtCore import QThread, pyqtSignal
+
+from core.frame_cache import FrameCache, FRAME_CACHE_BYTES
+from core.keyframe_index import load_keyframe_index_async, seek_exact
+from workers.video_loader import PLAYBACK_SPEEDS, MAX_FRAMES_IN_FLIGHT
+
+# Opt in with ETHOGRID_DECODER_PROCESS=1: the player then decodes in a separate process
+DECODER_PROCESS_ENABLED = os.environ.get("ETHOGRID_DECODER_PROCESS", "0") == "1"
+RING_SLOTS = 6  # frame slots in the shared ring; a slot is reused only after the GUI has moved past its frame
+DECODER_START_TIMEOUT = 30.0
+POLL_SECONDS = 0.002
+
+# Control block: int64 fields at the start of the shared segment. Every field has exactly one
+# writer (GUI or decoder), so the channel needs no locks.
+STOP, SEEK_SEQ, SEEK_FRAME, PLAYING, SPEED_MILLI, CONTROL_SEQ, PUBLISHED, DISPLAYED, STATUS, TOTAL_FRAMES = range(10)
+CONTROL_FIELDS = 16  # followed by RING_SLOTS frame numbers, one per slot
+STATUS_STARTING, STATUS_READY, STATUS_OPEN_FAILED, STATUS_BAD_FRAME = 0, 1, 2, 3
+
+# Segments of stopped loaders whose frames may still be referenced (e.g. the player's current frame).
+# Closing a segment unmaps it under any remaining numpy views, so it is only closed once all of them are gone.
+_retired_segments = []  # (SharedMemory, [weakrefs to emitted frames])
+
+def _release_retired_segments():
+    for entry in list(_retired_segments):
+        shm, frame_refs = entry
+        if all(ref() is None for ref in frame_refs): shm.close(); _retired_segments.remove(entry)
+
+def _layout(frame_shape, slots):
+    """(header bytes, bytes per frame slot, total segment size) for frames of `frame_shape`."""
+    header = -(-(CONTROL_FIELDS + slots) * 8 // 64) * 64  # keep frames cache-line aligned
+    frame_bytes = int(np.prod(frame_shape))
+    return header, frame_bytes, header + frame_bytes * slots
+
+def _attach(name):
+    try:
+        return shared_memory.SharedMemory(name=name, track=False)  # Python 3.13+: leave the segment to its creator
+    except TypeError:
+        return shared_memory.SharedMemory(name=name)  # spawned children share the creator's resource tracker, which the creator's unlink() settles
+
+def _decoder_main(video_path, shm_name, frame_shape, slots, cache_bytes):
+    """
+    Decoder process: serves seeks and paced playback from `video_path` into the shared ring.
+    Frame seq p goes to slot p % slots and is published by bumping PUBLISHED; the slot is written
+    only once the GUI has displayed a later frame, so the frame it holds is never overwritten.
+    """
+    shm = _attach(shm_name); header, frame_bytes, _ = _layout(frame_shape, slots)
+    control = np.ndarray((CONTROL_FIELDS + slots,), dtype=np.int64, buffer=shm.buf)
+    ring = [np.ndarray(frame_shape, dtype=np.uint8, buffer=shm.buf, offset=header + slot * frame_bytes) for slot in range(slots)]
+    cap = cv2.VideoCapture(video_path)
+    try:
+        if not cap.isOpened(): control[STATUS] = STATUS_OPEN_FAILED; return
+        total_frames = int(cap.get(cv2.CAP_PROP_FRAME_COUNT)); fps = cap.get(cv2.CAP_PROP_FPS) or 30.0
+        cache = FrameCache(cache_bytes); keyframes = load_keyframe_index_async(video_path); next_decoded = 0
+
+        def get_frame(frame_idx):
+            nonlocal next_decoded
+            frame = cache.get(frame_idx)
+            if frame is not None: return frame
+            index = keyframes.result() if keyframes.done() else None
+            if frame_idx != next_decoded and not seek_exact(cap, frame_idx, index, next_decoded): ret = False
+            else: ret, frame = cap.read()
+            if not ret: next_decoded = -1; return None
+            next_decoded = frame_idx + 1
+            return cache.put(frame_idx, frame)
+
+        def publish(frame_idx, frame, wait):
+            """Copies the frame into the next free slot; returns False if the GUI still holds that slot (after waiting, if asked)."""
+            seq = int(control[PUBLISHED]); deadline = time.monotonic() + (1.0 if wait else 0.0)
+            while seq >= slots and seq - slots >= control[DISPLAYED]:  # the slot's previous frame is still shown or queued
+                if control[STOP] or time.monotonic() >= deadline: return False
+                time.sleep(POLL_SECONDS)
+            if frame.shape != frame_shape: control[STATUS] = STATUS_BAD_FRAME; control[STOP] = 1; return False
+            ring[seq % slots][...] = frame; control[CONTROL_FIELDS + seq % slots] = frame_idx; control[PUBLISHED] = seq + 1
+            return True
+
+        control[TOTAL_FRAMES] = total_frames; control[STATUS] = STATUS_READY
+        seen_seek, seen_control, current_idx, clock, playing = 0, -1, 0, None, False
+        while not control[STOP]:
+            wait = 0.005
+            if control[CONTROL_SEQ] != seen_control:  # play/pause or speed changed: restart the clock
+                seen_control = int(control[CONTROL_SEQ]); clock = None; was_playing, playing = playing, bool(control[PLAYING])
+                speed = min(max(control[SPEED_MILLI] / 1000.0, PLAYBACK_SPEEDS[0]), PLAYBACK_SPEEDS[-1])
+                step = max(1, int(speed)); interval = step / (fps * speed)
+                if playing and not was_playing and current_idx >= total_frames - 1: current_idx = 0
+            if control[SEEK_SEQ] != seen_seek:
+                seen_seek = int(control[SEEK_SEQ]); current_idx = int(control[SEEK_FRAME])
+                frame = get_frame(current_idx)
+                if frame is not None and publish(current_idx, frame, wait=True) and playing:
+                    clock = (time.monotonic(), current_idx); current_idx += step; wait = interval
+            elif playing:
+                now = time.monotonic()
+                if clock is None: clock = (now, current_idx)
+                due_idx = clock[1] + int((now - clock[0]) / interval) * step
+                frame_idx = max(current_idx, due_idx)  # behind schedule: drop to the frame due now
+                if frame_idx >= total_frames: playing = False
+                elif frame_idx == due_idx:
+                    busy = control[PUBLISHED] - 1 - control[DISPLAYED] >= MAX_FRAMES_IN_FLIGHT  # the GUI is still showing earlier frames
+                    frame = None if busy else get_frame(frame_idx)
+                    if not busy and frame is None: playing = False  # the video is shorter than its header claims
+                    elif frame is not None: publish(frame_idx, frame, wait=False)
+                    current_idx = frame_idx + step
+                if playing: wait = clock[0] + (current_idx - clock[1]) / step * interval - time.monotonic()
+            if wait > 0: time.sleep(min(wait, 0.005))
+    finally:
+        cap.release(); del ring, control; shm.close()
+
+class SharedMemoryVideoLoader(QThread):
+    """
+    Drop-in alternative to VideoLoader that decodes in a separate process, so decoding never
+    competes with the GUI for the GIL and seek()/set_playing() never wait on a decode.
+
+    Frames travel through a shared-memory ring of RING_SLOTS slots and are emitted as read-only
+    views into it (no copy). Commands are plain writes to the control block at the start of the
+    segment. A frame stays valid until the GUI reports a later frame through frame_displayed(),
+    so the frame being shown is never overwritten.
+    """
+    video_loaded = pyqtSignal(int, int, float)  # width, height, fps
+    frame_loaded = pyqtSignal(int, np.ndarray)  # frame index, frame
+    error_occurred = pyqtSignal(str)
+
+    def __init__(self, video_path, cache_bytes=FRAME_CACHE_BYTES, slots=RING_SLOTS):
+        super().__init__()
+        self.video_path = video_path; self.cache_bytes = cache_bytes; self.slots = slots
+        self.running = True
+        self.total_frames = 0
+        self.fps = 30.0
+        self.shm, self.control, self.process = None, None, None
+        self._ring = []; self._emitted = []  # seqs emitted but not yet displayed, in order
+        self._frame_refs = []  # weakrefs to the emitted views; the segment is closed only after they are all gone
+        self._pending_commands = []; self._command_lock = threading.Lock()  # commands issued before the shared segment exists
+
+    def run(self):
+        _release_retired_segments()
+        try: self._serve()
+        finally: self._shutdown()  # also on error returns, after which the loader is usually deleted without stop()
+
+    def _serve(self):
+        try:
+            cap = cv2.VideoCapture(self.video_path)
+            if not cap.isOpened(): self.error_occurred.emit("Failed to open video file"); return
+            width, height = int(cap.get(cv2.CAP_PROP_FRAME_WIDTH)), int(cap.get(cv2.CAP_PROP_FRAME_HEIGHT)); self.fps = cap.get(cv2.CAP_PROP_FPS) or 30.0; cap.release()
+            frame_shape = (height, width, 3); header, frame_bytes, size = _layout(frame_shape, self.slots)
+            self.shm = shared_memory.SharedMemory(create=True, size=size)
+            control = np.ndarray((CONTROL_FIELDS + self.slots,), dtype=np.int64, buffer=self.shm.buf); control[:] = 0; control[DISPLAYED] = -1; control[SPEED_MILLI] = 1000
+            self._ring = [np.ndarray(frame_shape, dtype=np.uint8, buffer=self.shm.buf, offset=header + slot * frame_bytes) for slot in range(self.slots)]
+            with self._command_lock:
+                self.control = control
+                for command in self._pending_commands: command()
+            self.process = multiprocessing.get_context('spawn').Process(target=_decoder_main, args=(self.video_path, self.shm.name, frame_shape, self.slots, self.cache_bytes), daemon=True, name="video-decoder")
+            self.process.start()
+            deadline = time.monotonic() + DECODER_START_TIMEOUT
+            while self.running and self.control[STATUS] == STATUS_STARTING:
+                if not self.process.is_alive() or time.monotonic() > deadline: self.error_occurred.emit("Video decoder process failed to start"); return
+                self.msleep(5)
+            if self.control[STATUS] == STATUS_OPEN_FAILED: self.error_occurred.emit("Failed to open video file"); return
+            self.total_frames = int(self.control[TOTAL_FRAMES])
+            self.video_loaded.emit(width, height, self.fps)
+        except Exception as e:
+            self.error_occurred.emit(f"Video loading error: {str(e)}"); return
+
+        last_seq = 0
+        while self.running:
+            published = int(self.control[PUBLISHED])
+            if published > last_seq:  # only the newest frame is shown; skipped ones are released with it
+                seq = published - 1; last_seq = published
+                frame = self._ring[seq % self.slots].view(); frame.setflags(write=False)
+                self._frame_refs = [ref for ref in self._frame_refs if ref() is not None] + [weakref.ref(frame)]
+                self._emitted.append(seq); self.frame_loaded.emit(int(self.control[CONTROL_FIELDS + seq % self.slots]), frame)
+            elif self.control[STATUS] == STATUS_BAD_FRAME:
+                self.error_occurred.emit("Frame loading error: decoded frame size does not match the video header"); return
+            else: self.msleep(2)
+
+    def _command(self, command):
+        with self._command_lock:
+            if self.control is None: self._pending_commands.append(command)
+            else: command()
+
+    def frame_displayed(self):
+        """Called by the GUI once it has shown a frame from frame_loaded; releases the slots of earlier frames."""
+        with self._command_lock:
+            if self._emitted and self.control is not None: self.control[DISPLAYED] = self._emitted.pop(0)
+
+    def seek(self, frame_idx):
+        def command(): self.control[SEEK_FRAME] = frame_idx; self.control[SEEK_SEQ] += 1
+        self._command(command)
+
+    def set_playing(self, playing_state):
+        def command(): self.control[PLAYING] = int(playing_state); self.control[CONTROL_SEQ] += 1
+        self._command(command)
+
+    def set_speed(self, speed):
+        def command(): self.control[SPEED_MILLI] = int(round(float(speed) * 1000)); self.control[CONTROL_SEQ] += 1
+        self._command(command)
+
+    def stop(self):
+        self.running = False
+        self.wait()
+
+    def _shutdown(self):
+        """Stops the decoder process and retires the shared segment; runs on the loader thread as it exits."""
+        with self._command_lock:
+            if self.control is not None: self.control[STOP] = 1
+        if self.process is not None:
+            self.process.join(5)
+            if self.process.is_alive(): self.process.terminate(); self.process.join()
+        if self.shm is not None:
+            with self._command_lock: self.control, self._ring = None, []
+            self.shm.unlink(); _retired_segments.append((self.shm, self._frame_refs)); self.shm, self._frame_refs = None, []
+            _release_retired_segments()
@@ -0,0 +1,70 @@
+# EthoGrid_App/workers/timeline_summary_processor.py
+
+import math
+import traceback
+import numpy as np
+from PyQt5.QtCore import QThread, pyqtSignal
+
+from core.detection_ops import assign_tanks, top_k_order, encode_behavior_runs, expand_timeline
+
+SUMMARY_CHUNK_BYTES = 32 * 1024 * 1024  # CSV bytes parsed per step; bounds memory and how long stop() takes to be noticed
+
+class TimelineSummaryProcessor(QThread):
+    """
+    Builds a coarse per-tank behavior timeline for a whole detection file without
+    materialising per-detection dicts. The file is read in frame ranges of about
+    SUMMARY_CHUNK_BYTES through its FrameIndex, and frames are grouped into at most
+    `max_bins` bins per tank, so memory stays bounded by the chunk size and the bin count.
+    """
+    summary_ready = pyqtSignal(object)
+    error_occurred = pyqtSignal(str)
+
+    def __init__(self, frame_index, grid_transform, grid_settings, video_size, max_animals_per_tank, total_frames, max_bins=20000, parent=None):
+        super().__init__(parent)
+        self.frame_index = frame_index
+        self.grid_transform = grid_transform
+        self.grid_settings = grid_settings
+        self.video_size = video_size
+        self.max_animals_per_tank = max_animals_per_tank
+        self.total_frames = total_frames
+        self.max_bins = max_bins
+        self._is_running = True
+
+    def stop(self):
+        self._is_running = False
+
+    def run(self):
+        try:
+            inverse_transform, invertible = self.grid_transform.inverted()
+            if not invertible:
+                self.error_occurred.emit("Grid transform is not invertible. Cannot summarise detections.")
+                return
+            inverse_affine = (inverse_transform.m11(), inverse_transform.m12(), inverse_transform.m21(), inverse_transform.m22(), inverse_transform.dx(), inverse_transform.dy())
+            index = self.frame_index
+            last_frame = max(self.total_frames - 1, index.last_frame)
+            stride = max(1, math.ceil((last_frame + 1) / self.max_bins))
+            parts = max(1, math.ceil((index.end_offset - (index.block_offsets[0] if len(index.block_offsets) else 0)) / SUMMARY_CHUNK_BYTES))
+            bins, tanks, names = [], [], []
+            for start_frame, end_frame in index.split(parts):
+                if not self._is_running: return
+                columns = index.read_columns(start_frame, end_frame, ['x1', 'y1', 'x2', 'y2', 'cx', 'cy', 'conf', 'class_name'])
+                frame_arr = columns['frame_idx'].astype(np.int64)
+                if len(frame_arr) == 0: continue
+                x1, y1, x2, y2 = (columns[c] for c in ('x1', 'y1', 'x2', 'y2'))
+                cx = columns.get('cx', np.full(len(frame_arr), np.nan)); cy = columns.get('cy', np.full(len(frame_arr), np.nan))
+                cx = np.where(np.isnan(cx), (x1 + x2) / 2.0, cx); cy = np.where(np.isnan(cy), (y1 + y2) / 2.0, cy)
+                tank_arr = assign_tanks(cx, cy, inverse_affine, self.video_size, self.grid_settings['cols'], self.grid_settings['rows'])
+                conf_arr = np.nan_to_num(columns['conf']) if 'conf' in columns else np.zeros(len(frame_arr))
+                kept = top_k_order(frame_arr, tank_arr, conf_arr, self.max_animals_per_tank)
+                # Only the first kept detection of every (bin, tank) is used by the encoder; chunks cover
+                # increasing frames, so keeping the first per chunk preserves which detection wins overall.
+                bin_arr, kept_tanks, kept_names = frame_arr[kept] // stride, tank_arr[kept], np.asarray(columns['class_name'], dtype=object)[kept]
+                order = np.lexsort((bin_arr, kept_tanks)); first = np.ones(len(order), dtype=bool)
+                first[1:] = (bin_arr[order][1:] != bin_arr[order][:-1]) | (kept_tanks[order][1:] != kept_tanks[order][:-1])
+                bins.append(bin_arr[order][first]); tanks.append(kept_tanks[order][first]); names.append(kept_names[order][first])
+            if not self._is_running: return
+            timeline = encode_behavior_runs(np.concatenate(bins) if bins else [], np.concatenate(tanks) if tanks else [], np.concatenate(names) if names else [])
+            self.summary_ready.emit(expand_timeline(timeline, stride, last_frame))
+        except Exception as e:
+            print(traceback.format_exc())
+            self.error_occurred.emit(f"Error while summarising detections: {e}")
@@ -1,19 +1,91 @@
 # EthoGrid_App/workers/video_loader.py
 
+import time
+import threading
 import cv2
 import numpy as np
 from PyQt5.QtCore import QThread, pyqtSignal, QMutex
 
+from core.frame_cache import FrameCache, FRAME_CACHE_BYTES
+from core.keyframe_index import load_keyframe_index_async, seek_exact
+
+READ_AHEAD_FRAMES = 60  # frames decoded ahead of (or, after stepping back, behind) the current position, at most half the frame cache
+PLAYBACK_SPEEDS = (0.25, 0.5, 1.0, 2.0, 4.0, 8.0, 16.0)
+MAX_FRAMES_IN_FLIGHT = 2  # frames emitted but not yet shown by the GUI; playback drops frames rather than queueing more
+
+def _read_ahead_window(cache, frame_bytes, max_frames=READ_AHEAD_FRAMES):
+    """
+    Frames the read-ahead may decode for frames of `frame_bytes`: max_frames, but no more than half
+    the cache budget (a 4K frame is ~25 MB), so read-ahead frames are not evicted before they are shown.
+    """
+    return max(1, min(max_frames, cache.max_bytes // max(1, frame_bytes) // 2))
+
+class _ReadAhead(threading.Thread):
+    """
+    Fills the frame cache around the playback position with its own decoder. After a forward move
+    it decodes the next READ_AHEAD_FRAMES frames (every `step`-th frame during fast playback); after
+    a backward move it decodes the frames just before the position, so stepping back through an
+    event is served from the cache.
+    """
+    def __init__(self, video_path, cache, total_frames, keyframe_index, window=READ_AHEAD_FRAMES):
+        super().__init__(name="video-read-ahead", daemon=True)
+        self.video_path = video_path; self.cache = cache; self.total_frames = total_frames; self.keyframe_index = keyframe_index; self.window = window
+        self.position, self.direction, self.step, self.generation = 0, 1, 1, 0; self.running = True
+        self._lock = threading.Lock(); self._wakeup = threading.Event()
+
+    def follow(self, frame_idx, direction, step=1):
+        with self._lock:
+            self.position = frame_idx; self.direction = direction if direction else self.direction; self.step = step; self.generation += 1
+        self._wakeup.set()
+
+    def stop(self):
+        self.running = False; self._wakeup.set()
+
+    def _plan(self):
+        with self._lock:
+            position, direction, step, generation = self.position, self.direction, self.step, self.generation
+        if direction > 0: wanted = range(position + step, min(self.total_frames, position + 1 + self.window * step), step)
+        else: wanted = range(max(0, position - self.window), position)
+        return self.cache.missing(wanted), generation
+
+    def run(self):
+        cap = cv2.VideoCapture(self.video_path); next_pos = 0
+        try:
+            while self.running:
+                self._wakeup.wait(0.2); self._wakeup.clear()
+                missing, generation = self._plan()
+                for frame_idx in missing:
+                    if not self.running: break
+                    if generation != self.generation: self._wakeup.set(); break  # the position moved: plan again
+                    if frame_idx in self.cache: continue
+                    if not seek_exact(cap, frame_idx, self.keyframe_index(), next_pos): ret = False
+                    else: ret, frame = cap.read()
+                    if not ret: self.total_frames = min(self.total_frames, frame_idx); break  # shorter than its header claims
+                    self.cache.put(frame_idx, frame); next_pos = frame_idx + 1
+        finally:
+            cap.release()
+
 class VideoLoader(QThread):
     """
     Loads a video file in a background thread, emitting frames as they are read.
     Handles playback state (playing, paused, seeking).
+
+    Decoded frames are kept in a byte-budgeted LRU FrameCache and a read-ahead thread decodes
+    the frames around the current position, so replays and small back-and-forth seeks are
+    served without touching the decoder. Emitted frames are read-only.
+
+    Playback is paced against a monotonic clock: frame k of a run is due at start + k * interval,
+    and a frame that is late is dropped in favour of the one due now instead of slowing playback
+    down. Above 1x the presentation rate stays at the video fps and `int(speed)` source frames are
+    advanced per presented frame, skipping the others with grab(). The GUI acknowledges each
+    frame with frame_displayed(); while MAX_FRAMES_IN_FLIGHT are unacknowledged, due frames are
+    dropped rather than queued.
     """
     video_loaded = pyqtSignal(int, int, float)  # width, height, fps
     frame_loaded = pyqtSignal(int, np.ndarray)  # frame index, frame
     error_occurred = pyqtSignal(str)
 
-    def __init__(self, video_path):
+    def __init__(self, video_path, cache_bytes=FRAME_CACHE_BYTES):
         super().__init__()
         self.video_path = video_path
         self.running = True
@@ -25,6 +97,12 @@ class VideoLoader(QThread):
         self.seek_frame = 0
         self.playing = False
         self.fps = 30.0
+        self.speed = 1.0; self.dropped_frames = 0
+        self._clock = None  # (monotonic start, first frame) of the current playback run
+        self._frames_in_flight = 0; self._in_flight_lock = threading.Lock()
+        self.frame_cache = FrameCache(cache_bytes); self.read_ahead = None
+        self._next_decoded_idx = 0  # frame the decoder returns on the next read()
+        self._keyframe_future = None  # KeyframeIndex built in the background; plain seeks are used until it is ready
 
     def run(self):
         self.mutex.lock()
@@ -39,48 +117,77 @@ class VideoLoader(QThread):
             height = int(self.cap.get(cv2.CAP_PROP_FRAME_HEIGHT))
             self.fps = self.cap.get(cv2.CAP_PROP_FPS) or 30.0
             if self.fps == 0: self.fps = 30.0
+            self._keyframe_future = load_keyframe_index_async(self.video_path)
+            self.read_ahead = _ReadAhead(self.video_path, self.frame_cache, self.total_frames, self._keyframe_index, _read_ahead_window(self.frame_cache, width * height * 3)); self.read_ahead.start()
             self.video_loaded.emit(width, height, self.fps)
         except Exception as e:
             self.error_occurred.emit(f"Video loading error: {str(e)}")
         finally:
             self.mutex.unlock()
 
-        frame_duration_ms = int(1000 / self.fps if self.fps > 0 else 33)
         while self.running:
+            wait = 0.02
             self.mutex.lock()
             try:
                 if self.seek_requested:
+                    direction = (self.seek_frame > self.current_frame_idx) - (self.seek_frame < self.current_frame_idx)
                     self.current_frame_idx = self.seek_frame
-                    self.cap.set(cv2.CAP_PROP_POS_FRAMES, self.current_frame_idx)
                     self.seek_requested = False
-                    ret, frame = self.cap.read()
-                    if ret:
-                        self.frame_loaded.emit(self.current_frame_idx, frame.copy())
-                        if self.playing: self.current_frame_idx += 1
-                
+                    frame = self._get_frame(self.current_frame_idx)
+                    if frame is not None:
+                        self._emit_frame(self.current_frame_idx, frame); self.read_ahead.follow(self.current_frame_idx, direction)
+                        if self.playing:
+                            step, interval = self._playback_step(); self._clock = (time.monotonic(), self.current_frame_idx); self.current_frame_idx += step; wait = interval
+
                 elif self.playing:
-                    if self.current_frame_idx >= self.total_frames:
-                        self.playing = False
-                        self.mutex.unlock()
-                        continue
-                    
-                    ret, frame = self.cap.read()
-                    if not ret:
-                        self.playing = False
-                        self.mutex.unlock()
-                        continue
-
-                    self.frame_loaded.emit(self.current_frame_idx, frame.copy())
-                    self.current_frame_idx += 1
+                    step, interval = self._playback_step(); now = time.monotonic()
+                    if self._clock is None: self._clock = (now, self.current_frame_idx)
+                    start_time, start_frame = self._clock
+                    due_idx = start_frame + int((now - start_time) / interval) * step
+                    frame_idx = max(self.current_frame_idx, due_idx)  # behind schedule: drop to the frame due now
+                    if frame_idx >= self.total_frames: self.playing = False
+                    elif frame_idx == due_idx:
+                        self.dropped_frames += (frame_idx - self.current_frame_idx) // step
+                        busy = self._frames_in_flight >= MAX_FRAMES_IN_FLIGHT  # the GUI is still showing earlier frames
+                        frame = None if busy else self._get_frame(frame_idx)
+                        if busy: self.dropped_frames += 1
+                        elif frame is None: self.playing = False  # the video is shorter than its header claims
+                        else: self._emit_frame(frame_idx, frame); self.read_ahead.follow(frame_idx, 1, step)
+                        self.current_frame_idx = frame_idx + step
+                    if self.playing: wait = start_time + (self.current_frame_idx - start_frame) / step * interval - time.monotonic()
             except Exception as e:
                 self.error_occurred.emit(f"Frame loading error: {str(e)}")
             finally:
                 self.mutex.unlock()
-            
-            if self.playing:
-                self.msleep(frame_duration_ms)
-            else:
-                self.msleep(20)
+
+            if wait > 0: self.msleep(max(1, int(min(wait, 0.02) * 1000)))  # wake at least every 20 ms for seeks
+
+    def _playback_step(self):
+        """(source frames advanced per presented frame, seconds between presented frames) at the current speed."""
+        step = max(1, int(self.speed))
+        return step, step / (self.fps * self.speed)
+
+    def _emit_frame(self, frame_idx, frame):
+        with self._in_flight_lock: self._frames_in_flight += 1
+        self.frame_loaded.emit(frame_idx, frame)
+
+    def frame_displayed(self):
+        """Called by the GUI once it has shown a frame from frame_loaded."""
+        with self._in_flight_lock: self._frames_in_flight = max(0, self._frames_in_flight - 1)
+
+    def _keyframe_index(self):
+        future = self._keyframe_future
+        return future.result() if future is not None and future.done() else None
+
+    def _get_frame(self, frame_idx):
+        """Returns the frame from the cache, or decodes it (seeking exactly via the keyframe index if the decoder is elsewhere) and caches it. None at the end of the video."""
+        frame = self.frame_cache.get(frame_idx)
+        if frame is not None: return frame
+        if frame_idx != self._next_decoded_idx and not seek_exact(self.cap, frame_idx, self._keyframe_index(), self._next_decoded_idx): ret = False
+        else: ret, frame = self.cap.read()
+        if not ret: self._next_decoded_idx = -1; return None
+        self._next_decoded_idx = frame_idx + 1
+        return self.frame_cache.put(frame_idx, frame)
 
     def seek(self, frame_idx):
         self.mutex.lock()
@@ -90,17 +197,25 @@ class VideoLoader(QThread):
 
     def set_playing(self, playing_state):
         self.mutex.lock()
-        self.playing = playing_state
+        self.playing = playing_state; self._clock = None
         if playing_state:
             if self.current_frame_idx >= self.total_frames -1:
                 self.seek_requested = True
                 self.seek_frame = 0
         self.mutex.unlock()
 
+    def set_speed(self, speed):
+        """Sets the playback speed multiplier, clamped to PLAYBACK_SPEEDS[0]..PLAYBACK_SPEEDS[-1]."""
+        self.mutex.lock()
+        self.speed = min(max(float(speed), PLAYBACK_SPEEDS[0]), PLAYBACK_SPEEDS[-1]); self._clock = None
+        self.mutex.unlock()
+
     def stop(self):
         self.mutex.lock()
         self.running = False
+        if self.read_ahead is not None: self.read_ahead.stop()
         if self.cap and self.cap.isOpened():
             self.cap.release()
         self.mutex.unlock()
-        self.wait()
\ No newline at end of file
+        self.wait()
+        if self.read_ahead is not None: self.read_ahead.join(); self.frame_cache.clear()
\ No newline at end of file
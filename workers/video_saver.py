@@ -2,22 +2,40 @@
 
 import cv2
 import numpy as np
+from functools import partial
 from PyQt5.QtCore import QThread, pyqtSignal, QPointF
 
+from core.render_pool import OrderedRenderPool, RENDER_THREADS
+from core.segmented_export import segmented_export_available, export_in_segments
+from core.keyframe_index import load_keyframe_index, seek_exact
+from core.detection_ops import polygon_points
+from core.stopwatch import Stopwatch
+
 class VideoSaver(QThread):
     progress_updated = pyqtSignal(int)
     finished = pyqtSignal()
     error_occurred = pyqtSignal(str)
+    speed_updated = pyqtSignal(float)
 
     def __init__(self, source_video_path, output_video_path, detections, 
                  grid_settings, grid_transform, behavior_colors, 
                  video_size, fps, line_thickness, selected_cells, 
-                 timeline_segments, draw_grid=False, draw_overlays=True, parent=None):
+                 timeline_segments, draw_grid=False, draw_overlays=True, render_threads=RENDER_THREADS, export_processes=1,
+                 frame_stride=1, output_scale=1.0, montage=False, parent=None):
         super().__init__(parent)
+        # Everything a segment process needs to build an identical saver, see render_video_segment
+        self.saver_kwargs = dict(source_video_path=source_video_path, output_video_path=output_video_path, detections=detections, grid_settings=grid_settings, grid_transform=grid_transform, behavior_colors=behavior_colors,
+                                 video_size=video_size, fps=fps, line_thickness=line_thickness, selected_cells=selected_cells, timeline_segments=timeline_segments, draw_grid=draw_grid, draw_overlays=draw_overlays,
+                                 frame_stride=frame_stride, output_scale=output_scale, montage=montage)
         self.source_path = source_video_path; self.output_path = output_video_path; self.detections = detections
         self.grid_settings = grid_settings; self.grid_transform = grid_transform; self.behavior_colors = behavior_colors
         self.video_size = video_size; self.fps = fps; self.line_thickness = line_thickness; self.selected_cells = selected_cells
         self.timeline_segments = timeline_segments; self.draw_grid = draw_grid; self.draw_overlays = draw_overlays; self.is_running = True
+        self.render_threads = render_threads; self.export_processes = max(1, int(export_processes))
+        # Summary (timelapse) mode: keep every Nth frame, optionally downscale and/or tile the tanks side by side
+        self.frame_stride = max(1, int(frame_stride)); self.output_scale = float(output_scale); self.montage = montage; self._montage_tiles = None
+        self._tank_masks = None  # built on the first segmented detection
+        self._static_overlay = None  # (total_frames, canvas, legend, timeline area), see _build_static_overlay
 
         original_w, original_h = self.video_size
         if self.draw_overlays:
@@ -29,31 +47,49 @@ class VideoSaver(QThread):
             self.final_video_size = (final_w, final_h)
         else:
             self.final_video_size = self.video_size
+        final_w, final_h = self.final_video_size
+        self.output_size = (final_w, final_h) if self.output_scale == 1.0 else (max(2, int(final_w * self.output_scale) // 2 * 2), max(2, int(final_h * self.output_scale) // 2 * 2))
 
     def stop(self):
         self.is_running = False
 
-    def _get_clipped_mask(self, polygon_str, tank_number):
+    def _build_tank_masks(self):
+        """Rasterises every tank quadrilateral once; returns {tank_number: (x0, y0, mask cropped to the tank's bounding box)}."""
+        rows, cols = self.grid_settings['rows'], self.grid_settings['cols']; w, h = self.video_size
+        full_mask = np.zeros((h, w), dtype=np.uint8); tank_masks = {}
+        for r in range(rows):
+            for c in range(cols):
+                p1 = self.grid_transform.map(QPointF(c * w / cols, r * h / rows))
+                p2 = self.grid_transform.map(QPointF((c + 1) * w / cols, r * h / rows))
+                p3 = self.grid_transform.map(QPointF((c + 1) * w / cols, (r + 1) * h / rows))
+                p4 = self.grid_transform.map(QPointF(c * w / cols, (r + 1) * h / rows))
+                tank_contour = np.array([(p1.x(), p1.y()), (p2.x(), p2.y()), (p3.x(), p3.y()), (p4.x(), p4.y())], dtype=np.int32)
+                bx, by, bw, bh = cv2.boundingRect(tank_contour)
+                x0, y0, x1, y1 = max(0, bx), max(0, by), min(w, bx + bw), min(h, by + bh)
+                if x0 >= x1 or y0 >= y1: continue
+                full_mask[y0:y1, x0:x1] = 0; cv2.fillPoly(full_mask, [tank_contour], 255)
+                tank_masks[r * cols + c + 1] = (x0, y0, full_mask[y0:y1, x0:x1].copy())
+        return tank_masks
+
+    def _get_clipped_mask(self, poly_points, tank_number):
+        """Rasterises a polygon only inside its bounding box, clipped to its tank. Returns (x0, y0, mask) or None."""
         try:
-            seg_mask = np.zeros((self.video_size[1], self.video_size[0]), dtype=np.uint8)
-            poly_points = np.array([list(map(int, p.split(','))) for p in polygon_str.split(';')], dtype=np.int32)
-            cv2.fillPoly(seg_mask, [poly_points], 255)
-
-            tank_mask = np.zeros_like(seg_mask)
-            rows, cols = self.grid_settings['rows'], self.grid_settings['cols']
-            r = (int(tank_number) - 1) // cols
-            c = (int(tank_number) - 1) % cols
-            w, h = self.video_size
-            
-            p1 = self.grid_transform.map(QPointF(c * w / cols, r * h / rows))
-            p2 = self.grid_transform.map(QPointF((c + 1) * w / cols, r * h / rows))
-            p3 = self.grid_transform.map(QPointF((c + 1) * w / cols, (r + 1) * h / rows))
-            p4 = self.grid_transform.map(QPointF(c * w / cols, (r + 1) * h / rows))
-            tank_contour = np.array([(p1.x(), p1.y()), (p2.x(), p2.y()), (p3.x(), p3.y()), (p4.x(), p4.y())], dtype=np.int32)
-            cv2.fillPoly(tank_mask, [tank_contour], 255)
-            
-            clipped_mask = cv2.bitwise_and(seg_mask, tank_mask)
-            return clipped_mask
+            if self._tank_masks is None: self._tank_masks = self._build_tank_masks()
+            tank = self._tank_masks.get(int(tank_number))
+            if tank is None: return None
+            tank_x0, tank_y0, tank_mask = tank
+            bx, by, bw, bh = cv2.boundingRect(poly_points); w, h = self.video_size
+            x0, y0 = max(bx, tank_x0), max(by, tank_y0)
+            x1, y1 = min(bx + bw, tank_x0 + tank_mask.shape[1]), min(by + bh, tank_y0 + tank_mask.shape[0])
+            if x0 >= x1 or y0 >= y1: return None
+            # Rasterise on a canvas holding the whole (on-screen) polygon: a canvas that cuts through
+            # the polygon changes fillPoly's edge clipping, so only crop to the tank afterwards.
+            px0, py0 = max(bx, 0), max(by, 0)
+            seg_mask = np.zeros((min(by + bh, h) - py0, min(bx + bw, w) - px0), dtype=np.uint8)
+            cv2.fillPoly(seg_mask, [poly_points], 255, offset=(-px0, -py0))
+            seg_mask = seg_mask[y0 - py0:y1 - py0, x0 - px0:x1 - px0]
+            seg_mask = cv2.bitwise_and(seg_mask, tank_mask[y0 - tank_y0:y1 - tank_y0, x0 - tank_x0:x1 - tank_x0])
+            return x0, y0, seg_mask
         except:
             return None
 
@@ -66,87 +102,196 @@ class VideoSaver(QThread):
             cv2.putText(frame, behavior, (legend_x_start + 30, y_pos + 16), cv2.FONT_HERSHEY_SIMPLEX, 0.6, (240, 240, 240), 1, cv2.LINE_AA)
             y_offset += 25
 
-    def _draw_timeline_on_frame(self, frame, frame_idx, total_frames, original_video_height):
+    def _draw_timeline_on_frame(self, frame, total_frames, original_video_height):
+        """Draws the timeline strip without the position indicator; returns the draw area (x, y, w, h) or None if nothing was drawn."""
         new_h, new_w, _ = frame.shape; num_tanks = self.grid_settings['cols'] * self.grid_settings['rows']
-        if new_h <= original_video_height or num_tanks == 0 or total_frames <= 1: return
+        if new_h <= original_video_height or num_tanks == 0 or total_frames <= 1: return None
         cv2.rectangle(frame, (0, original_video_height), (new_w, new_h), (10, 10, 10), -1)
         draw_area_x, draw_area_y = 40, original_video_height + 10
         draw_area_w, draw_area_h = new_w - 80, new_h - original_video_height - 20
-        if draw_area_h <= 0 or draw_area_w <= 0: return
+        if draw_area_h <= 0 or draw_area_w <= 0: return None
         bar_h_total = draw_area_h / num_tanks; bar_h_visible = bar_h_total * 0.8
+        colors_bgr = [self.behavior_colors.get(name, (100, 100, 100))[::-1] for name in self.timeline_segments.names]
         for i in range(num_tanks):
             tank_id = i + 1; y_pos = draw_area_y + i * bar_h_total
             cv2.rectangle(frame, (draw_area_x, int(y_pos)), (draw_area_x + draw_area_w, int(y_pos + bar_h_visible)), (74, 74, 74), -1)
             if tank_id in self.timeline_segments:
-                for start_f, end_f, behavior in self.timeline_segments[tank_id]:
-                    color_rgb = self.behavior_colors.get(behavior, (100, 100, 100))
-                    x_start = int(draw_area_x + (start_f / total_frames) * draw_area_w)
-                    x_end = int(draw_area_x + ((end_f + 1) / total_frames) * draw_area_w)
-                    cv2.rectangle(frame, (x_start, int(y_pos)), (x_end, int(y_pos + bar_h_visible)), color_rgb[::-1], -1)
+                starts, ends, codes = self.timeline_segments.runs[tank_id]
+                x_starts = (draw_area_x + (starts / total_frames) * draw_area_w).astype(np.int32)
+                x_ends = (draw_area_x + ((ends + 1) / total_frames) * draw_area_w).astype(np.int32)
+                for x_start, x_end, code in zip(x_starts.tolist(), x_ends.tolist(), codes.tolist()):
+                    cv2.rectangle(frame, (x_start, int(y_pos)), (x_end, int(y_pos + bar_h_visible)), colors_bgr[code], -1)
             cv2.putText(frame, f"T{tank_id}", (draw_area_x - 35, int(y_pos + bar_h_visible / 2 + 5)), cv2.FONT_HERSHEY_SIMPLEX, 0.4, (224, 224, 224), 1, cv2.LINE_AA)
-        indicator_x = int(draw_area_x + (frame_idx / total_frames) * draw_area_w)
-        cv2.line(frame, (indicator_x, draw_area_y), (indicator_x, draw_area_y + draw_area_h), (80, 80, 255), 2)
+        return draw_area_x, draw_area_y, draw_area_w, draw_area_h
+
+    def _build_static_overlay(self, total_frames):
+        """
+        Renders the legend panel and the whole timeline strip once per export. Every frame starts
+        from a copy of the blank canvas and gets the pre-rendered legend band pasted in; only frames
+        where a detection spills into that band draw the legend again (its anti-aliased text has to
+        blend with the detection exactly as before).
+        """
+        (new_w, new_h), (original_w, original_h) = self.final_video_size, self.video_size
+        blank = np.full((new_h, new_w, 3), 43, dtype=np.uint8); canvas = blank.copy()
+        self._draw_legend_on_frame(canvas, original_w)
+        legend_rows = np.flatnonzero(np.any(canvas[:, original_w:] != 43, axis=(1, 2)))
+        timeline_area = self._draw_timeline_on_frame(blank, total_frames, original_h)
+        legend = None
+        if len(legend_rows):
+            y0, y1 = legend_rows[0], legend_rows[-1] + 1
+            if timeline_area is not None: canvas[original_h:] = blank[original_h:]
+            legend = (y0, y1, canvas[y0:y1, original_w:].copy())
+        self._static_overlay = (total_frames, blank, legend, timeline_area)
+
+    def prepare(self, total_frames):
+        """Builds the lazily cached tank masks and static overlay up front, so render threads only read them."""
+        if self._tank_masks is None: self._tank_masks = self._build_tank_masks()
+        if self.montage and self._montage_tiles is None: self._montage_tiles = self._build_montage_tiles()
+        if self.draw_overlays and (self._static_overlay is None or self._static_overlay[0] != total_frames): self._build_static_overlay(total_frames)
 
     def process_frame(self, original_frame, frame_idx, total_frames):
         original_w, original_h = self.video_size
         if self.draw_overlays:
-            new_w, new_h = self.final_video_size
-            processed_frame = np.full((new_h, new_w, 3), 43, dtype=np.uint8)
+            if self._static_overlay is None or self._static_overlay[0] != total_frames: self._build_static_overlay(total_frames)
+            _, canvas, legend, timeline_area = self._static_overlay
+            processed_frame = canvas.copy()
             processed_frame[0:original_h, 0:original_w] = original_frame
         else:
             processed_frame = original_frame.copy()
             
-        overlay = processed_frame.copy()
-        has_drawn_mask = False
-        
+        masks, boxes = [], []  # segmentation masks are blended first, boxes and labels are drawn on top
         if frame_idx in self.detections:
             for det in self.detections[frame_idx]:
                 if det.get('tank_number') is not None and (not self.selected_cells or str(det['tank_number']) in self.selected_cells):
                     color_bgr = self.behavior_colors.get(det["class_name"], (255, 255, 255))[::-1]
-                    
-                    if 'polygon' in det and det['polygon']:
-                        clipped_mask = self._get_clipped_mask(det['polygon'], det['tank_number'])
-                        if clipped_mask is not None:
-                            # ### THE FIX IS HERE ###
-                            # Ensure the mask has the same dimensions as the overlay canvas before applying it
-                            final_mask = np.zeros((overlay.shape[0], overlay.shape[1]), dtype=np.uint8)
-                            final_mask[0:clipped_mask.shape[0], 0:clipped_mask.shape[1]] = clipped_mask
-                            
-                            overlay[final_mask > 0] = color_bgr
-                            has_drawn_mask = True
-                    
-                    x1, y1, x2, y2 = map(float, (det["x1"], det["y1"], det["x2"], det["y2"]))
-                    cx, cy = (x1 + x2) / 2.0, (y1 + y2) / 2.0
-
-                    cv2.rectangle(processed_frame, (int(x1), int(y1)), (int(x2), int(y2)), color_bgr, 2)
-                    cv2.circle(processed_frame, (int(round(cx)), int(round(cy))), 8, (0, 0, 255), -1)
-                    
-                    label = f"T{det['tank_number']}"; font_face, f_scale, f_thick = cv2.FONT_HERSHEY_SIMPLEX, 0.7, 2
-                    (tw, th), _ = cv2.getTextSize(label, font_face, f_scale, f_thick)
-                    cv2.rectangle(processed_frame, (int(x1), int(y1) - th - 12), (int(x1) + tw, int(y1)), color_bgr, -1)
-                    cv2.putText(processed_frame, label, (int(x1), int(y1) - 7), font_face, f_scale, (0,0,0), f_thick, cv2.LINE_AA)
-        
-        if has_drawn_mask:
-            processed_frame = cv2.addWeighted(overlay, 0.4, processed_frame, 0.6, 0)
-        
+                    poly_points = polygon_points(det)
+                    if poly_points is not None:
+                        clipped_mask = self._get_clipped_mask(poly_points, det['tank_number'])
+                        if clipped_mask is not None: masks.append((clipped_mask, color_bgr))
+                    boxes.append((det, color_bgr))
+
+        if masks:
+            # Blend only the region covered by the masks instead of the whole frame
+            rx0 = min(x0 for (x0, _, _), _ in masks); ry0 = min(y0 for (_, y0, _), _ in masks)
+            rx1 = max(x0 + m.shape[1] for (x0, _, m), _ in masks); ry1 = max(y0 + m.shape[0] for (_, y0, m), _ in masks)
+            region = processed_frame[ry0:ry1, rx0:rx1]; overlay = region.copy()
+            for (x0, y0, mask), color_bgr in masks:
+                overlay[y0 - ry0:y0 - ry0 + mask.shape[0], x0 - rx0:x0 - rx0 + mask.shape[1]][mask > 0] = color_bgr
+            cv2.addWeighted(overlay, 0.4, region, 0.6, 0, dst=region)
+
+        for det, color_bgr in boxes:
+            x1, y1, x2, y2 = map(float, (det["x1"], det["y1"], det["x2"], det["y2"]))
+            cx, cy = (x1 + x2) / 2.0, (y1 + y2) / 2.0
+
+            cv2.rectangle(processed_frame, (int(x1), int(y1)), (int(x2), int(y2)), color_bgr, 2)
+            cv2.circle(processed_frame, (int(round(cx)), int(round(cy))), 8, (0, 0, 255), -1)
+
+            label = f"T{det['tank_number']}"; font_face, f_scale, f_thick = cv2.FONT_HERSHEY_SIMPLEX, 0.7, 2
+            (tw, th), _ = cv2.getTextSize(label, font_face, f_scale, f_thick)
+            cv2.rectangle(processed_frame, (int(x1), int(y1) - th - 12), (int(x1) + tw, int(y1)), color_bgr, -1)
+            cv2.putText(processed_frame, label, (int(x1), int(y1) - 7), font_face, f_scale, (0,0,0), f_thick, cv2.LINE_AA)
+
         if self.draw_overlays:
-            self._draw_legend_on_frame(processed_frame, original_w)
-            self._draw_timeline_on_frame(processed_frame, frame_idx, total_frames, original_h)
+            if legend is not None:
+                y0, y1, legend_band = legend; band = processed_frame[y0:y1, original_w:]
+                if np.array_equal(band, canvas[y0:y1, original_w:]): band[:] = legend_band
+                else: self._draw_legend_on_frame(processed_frame, original_w)
+            if timeline_area is not None:
+                processed_frame[original_h:] = canvas[original_h:]
+                draw_area_x, draw_area_y, draw_area_w, draw_area_h = timeline_area
+                indicator_x = int(draw_area_x + (frame_idx / total_frames) * draw_area_w)
+                cv2.line(processed_frame, (indicator_x, draw_area_y), (indicator_x, draw_area_y + draw_area_h), (80, 80, 255), 2)
             
         return processed_frame
 
+    def _build_montage_tiles(self):
+        """Returns [(tank, source rect, destination rect)] placing every tank's bounding box, scaled to fit, in its own grid cell."""
+        rows, cols = self.grid_settings['rows'], self.grid_settings['cols']; w, h = self.video_size; tiles = []
+        if rows <= 0 or cols <= 0: return tiles
+        tile_w, tile_h = w // cols, h // rows
+        for tank, (x0, y0, mask) in sorted(self._tank_masks.items()):
+            src_h, src_w = mask.shape; scale = min(tile_w / src_w, tile_h / src_h)
+            dst_w, dst_h = max(1, int(src_w * scale)), max(1, int(src_h * scale))
+            col, row = (tank - 1) % cols, (tank - 1) // cols
+            dst_x, dst_y = col * tile_w + (tile_w - dst_w) // 2, row * tile_h + (tile_h - dst_h) // 2
+            tiles.append((tank, (x0, y0, src_w, src_h), (dst_x, dst_y, dst_w, dst_h)))
+        return tiles
+
+    def render_output_frame(self, original_frame, frame_idx, total_frames):
+        """process_frame plus the summary-mode steps: the per-tank montage of the video area and the output downscale."""
+        processed_frame = self.process_frame(original_frame, frame_idx, total_frames)
+        if self.montage and self._montage_tiles:
+            w, h = self.video_size; video_area = processed_frame[:h, :w]; montage = np.zeros_like(video_area)
+            for tank, (sx, sy, sw, sh), (dx, dy, dw, dh) in self._montage_tiles:
+                montage[dy:dy + dh, dx:dx + dw] = cv2.resize(video_area[sy:sy + sh, sx:sx + sw], (dw, dh), interpolation=cv2.INTER_AREA)
+                cv2.putText(montage, f"T{tank}", (dx + 5, dy + 20), cv2.FONT_HERSHEY_SIMPLEX, 0.6, (255, 255, 255), 2, cv2.LINE_AA)
+            video_area[:] = montage
+        if self.output_size != self.final_video_size: processed_frame = cv2.resize(processed_frame, self.output_size, interpolation=cv2.INTER_AREA)
+        return processed_frame
+
+    def _report_progress(self, frames_done, total_frames, speed_state):
+        self.progress_updated.emit(int(frames_done * 100 / total_frames)); current_time = speed_state['stopwatch'].get_elapsed_time(as_float=True)
+        if current_time > speed_state['since'] + 1:
+            self.speed_updated.emit((frames_done - speed_state['frames']) / (current_time - speed_state['since'])); speed_state.update(frames=frames_done, since=current_time)
+
     def run(self):
         cap = cv2.VideoCapture(self.source_path)
         if not cap.isOpened(): self.error_occurred.emit(f"Could not open source video: {self.source_path}"); return
-        total_frames = int(cap.get(cv2.CAP_PROP_FRAME_COUNT))
-        fourcc = cv2.VideoWriter_fourcc(*'mp4v'); writer = cv2.VideoWriter(self.output_path, fourcc, self.fps, self.final_video_size)
+        total_frames = int(cap.get(cv2.CAP_PROP_FRAME_COUNT)); stopwatch = Stopwatch(); stopwatch.start(); speed_state = {'stopwatch': stopwatch, 'frames': 0, 'since': 0.0}
+        if self.export_processes > 1:
+            if segmented_export_available():
+                cap.release()
+                try:
+                    error_msg = export_video_in_segments(self.saver_kwargs, total_frames, self.export_processes, lambda frames_done: self._report_progress(frames_done, total_frames, speed_state), lambda: self.is_running)
+                except Exception as e:
+                    error_msg = str(e)
+                if error_msg: self.error_occurred.emit(error_msg); return
+                if self.is_running: self.finished.emit()
+                return
+            print("Warning: FFmpeg/ffprobe not found, exporting the video in a single pass.")
+        fourcc = cv2.VideoWriter_fourcc(*'mp4v'); writer = cv2.VideoWriter(self.output_path, fourcc, self.fps, self.output_size)
         if not writer.isOpened(): self.error_occurred.emit(f"Could not open video writer for: {self.output_path}"); cap.release(); return
-        for frame_idx in range(total_frames):
-            if not self.is_running: break
+        self.prepare(total_frames)
+        def write_frame(frame_idx, processed_frame):
+            writer.write(processed_frame); self._report_progress(frame_idx + 1, total_frames, speed_state)
+        try:
+            with OrderedRenderPool(partial(self.render_output_frame, total_frames=total_frames), write_frame, self.render_threads) as render_pool:
+                for frame_idx in range(total_frames):
+                    if not self.is_running: break
+                    if frame_idx % self.frame_stride:
+                        if not cap.grab(): break  # skipped in summary mode: demuxed but never decoded to BGR
+                        continue
+                    ret, original_frame = cap.read()
+                    if not ret: break
+                    render_pool.submit(frame_idx, original_frame)
+        except Exception as e:
+            self.error_occurred.emit(str(e)); return
+        finally:
+            cap.release(); writer.release()
+        if self.is_running: self.finished.emit()
+
+def render_video_segment(saver_kwargs, total_frames, segment_path, start, end, progress, is_running):
+    """Segment renderer for export_in_segments: decodes frames start..end-1 from their keyframe and encodes them to `segment_path`."""
+    saver = VideoSaver(**saver_kwargs, render_threads=1); saver.prepare(total_frames)
+    cap = cv2.VideoCapture(saver.source_path)
+    if not cap.isOpened(): return f"Could not open source video: {saver.source_path}"
+    writer = cv2.VideoWriter(segment_path, cv2.VideoWriter_fourcc(*'mp4v'), saver.fps, saver.output_size)
+    try:
+        if not writer.isOpened(): return f"Could not open video writer for: {segment_path}"
+        if not seek_exact(cap, start, load_keyframe_index(saver.source_path), 0): return None  # segments start on keyframes, so this is a plain keyframe seek
+        for frame_idx in range(start, end):
+            if not is_running(): return None
+            if frame_idx % saver.frame_stride:
+                if not cap.grab(): break
+                continue
             ret, original_frame = cap.read()
             if not ret: break
-            processed_frame = self.process_frame(original_frame, frame_idx, total_frames)
-            writer.write(processed_frame)
-            self.progress_updated.emit(int((frame_idx + 1) * 100 / total_frames))
+            writer.write(saver.render_output_frame(original_frame, frame_idx, total_frames)); progress(frame_idx + 1 - start)
+        return None
+    finally:
         cap.release(); writer.release()
-        if self.is_running: self.finished.emit()
\ No newline at end of file
+
+def export_video_in_segments(saver_kwargs, total_frames, num_processes, on_progress=None, is_running=lambda: True, log=print):
+    """Exports the annotated video of `saver_kwargs` in keyframe-aligned segments rendered by `num_processes` processes. Returns an error message or None."""
+    return export_in_segments(partial(render_video_segment, saver_kwargs, total_frames), saver_kwargs['source_video_path'], saver_kwargs['output_video_path'],
+                              total_frames, num_processes, on_progress, is_running, log)
@@ -6,6 +6,8 @@ import subprocess
 import traceback
 from PyQt5.QtCore import QThread, pyqtSignal
 
+from core.video_probe import probe_video
+
 class VideoSplitter(QThread):
     overall_progress = pyqtSignal(int, int, str)
     file_progress = pyqtSignal(int, str)
@@ -49,10 +51,10 @@ class VideoSplitter(QThread):
             self.log_message.emit(f"\n--- Starting to process: {filename} ---")
 
             try:
-                # 1. Get video duration using ffprobe
-                cmd = ["ffprobe", "-v", "error", "-show_entries", "format=duration", "-of", "default=noprint_wrappers=1:nokey=1", video_path]
-                result = subprocess.run(cmd, stdout=subprocess.PIPE, stderr=subprocess.PIPE, text=True, check=True)
-                duration = float(result.stdout.strip())
+                # 1. Get video duration from the shared metadata index
+                video_info = probe_video(video_path)
+                if video_info is None: raise IOError(f"Could not read video metadata: {filename}")
+                duration = video_info['duration']
                 self.log_message.emit(f"  - Video duration: {duration:.2f} seconds")
 
                 num_chunks = int(duration // self.chunk_seconds) + (1 if duration % self.chunk_seconds > 1 else 0) # Add chunk if remainder is > 1s